@@ -1,22 +1,29 @@
 # src/api/dependencies.py
-from fastapi import Depends, Security
+import asyncio
+from fastapi import Security, FastAPI
 from src.core.text_generation import TextGenerationService
 from src.core.ollama_client import OllamaClient
+from src.core.model_catalog import ModelCatalog
 from src.core.config import settings
+from src.core.exceptions import ServiceNotReadyError
 from src.api.models.auth import get_current_active_user, User
 from src.rag.vector_store import VectorStoreManager
+from src.rag.query_engine import RAGQueryEngine
 
-async def get_ollama_client() -> OllamaClient:
-    client = OllamaClient()
-    try:
-        yield client
-    finally:
-        await client.close()
+def get_ollama_client() -> OllamaClient:
+    """Get the shared Ollama client created at startup."""
+    from src.main import app
+    return app.state.ollama_client
+
+def get_model_catalog() -> ModelCatalog:
+    """Get the cached catalog of installed models."""
+    from src.main import app
+    return app.state.model_catalog
 
-async def get_text_gen_service(
-    ollama_client: OllamaClient = Depends(get_ollama_client)
-) -> TextGenerationService:
-    return TextGenerationService(ollama_client)
+def get_text_gen_service() -> TextGenerationService:
+    """Get the shared text generation service, so model switches apply app-wide."""
+    from src.main import app
+    return app.state.text_generation_service
 
 def get_auth_dependency():
     """Returns the appropriate dependency based on whether auth is enabled."""
@@ -24,12 +31,29 @@ def get_auth_dependency():
         return Security(get_current_active_user)
     return None
 
+async def wait_until_ready(app: FastAPI) -> None:
+    """Waits for the background warmup, raising ServiceNotReadyError on timeout or failure."""
+    if not app.state.ready.is_set():
+        try:
+            await asyncio.wait_for(app.state.ready.wait(), timeout=settings.ready_timeout)
+        except asyncio.TimeoutError:
+            raise ServiceNotReadyError("Service is still warming up, please retry later")
+    if app.state.warmup_error:
+        raise ServiceNotReadyError(f"Service failed to start: {app.state.warmup_error}")
+
 # Add the get_vector_store function
-def get_vector_store() -> VectorStoreManager:
+async def get_vector_store() -> VectorStoreManager:
     """Get the vector store manager."""
     from src.main import app
+    await wait_until_ready(app)
     return app.state.vector_store
 
+async def get_query_engine() -> RAGQueryEngine:
+    """Get the RAG query engine."""
+    from src.main import app
+    await wait_until_ready(app)
+    return app.state.query_engine
+
 async def get_current_user_optional(token: str = None) -> User:
     """Get current user if authenticated, otherwise return None."""
     if not settings.auth.enabled:
@@ -7,10 +7,18 @@ from src.core.exceptions import (
     ModelError,
     ModelNotFoundError,
     ModelSwitchError,
+    ModelBusyError,
     DocumentProcessingError,
     VectorStoreError,
+    DocumentNotFoundError,
     QueryError,
-    AuthenticationError
+    AuthenticationError,
+    ServiceNotReadyError,
+    UploadError,
+    UploadTooLargeError,
+    UploadLimitError,
+    UploadSessionError,
+    UploadSessionNotFoundError
 )
 
 logger = logging.getLogger(__name__)
@@ -42,6 +50,93 @@ def register_exception_handlers(app: FastAPI):
             },
         )
     
+    @app.exception_handler(ModelBusyError)
+    async def model_busy_exception_handler(request: Request, exc: ModelBusyError):
+        logger.warning(f"Model busy: {exc}")
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={
+                "detail": str(exc),
+                "status_code": status.HTTP_503_SERVICE_UNAVAILABLE,
+                "error_type": "ModelBusyError"
+            },
+            headers={"Retry-After": "5"},
+        )
+    
+    @app.exception_handler(ServiceNotReadyError)
+    async def service_not_ready_exception_handler(request: Request, exc: ServiceNotReadyError):
+        logger.warning(f"Service not ready: {exc}")
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={
+                "detail": str(exc),
+                "status_code": status.HTTP_503_SERVICE_UNAVAILABLE,
+                "error_type": "ServiceNotReadyError"
+            },
+            headers={"Retry-After": "5"},
+        )
+    
+    @app.exception_handler(UploadTooLargeError)
+    async def upload_too_large_exception_handler(request: Request, exc: UploadTooLargeError):
+        logger.warning(f"Upload too large: {exc}")
+        return JSONResponse(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            content={
+                "detail": str(exc),
+                "status_code": status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                "error_type": "UploadTooLargeError"
+            },
+        )
+    
+    @app.exception_handler(UploadLimitError)
+    async def upload_limit_exception_handler(request: Request, exc: UploadLimitError):
+        logger.warning(f"Upload limit reached: {exc}")
+        return JSONResponse(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            content={
+                "detail": str(exc),
+                "status_code": status.HTTP_429_TOO_MANY_REQUESTS,
+                "error_type": "UploadLimitError"
+            },
+            headers={"Retry-After": "5"},
+        )
+    
+    @app.exception_handler(UploadSessionNotFoundError)
+    async def upload_session_not_found_exception_handler(request: Request, exc: UploadSessionNotFoundError):
+        logger.warning(f"Upload session not found: {exc}")
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={
+                "detail": str(exc),
+                "status_code": status.HTTP_404_NOT_FOUND,
+                "error_type": "UploadSessionNotFoundError"
+            },
+        )
+    
+    @app.exception_handler(UploadSessionError)
+    async def upload_session_exception_handler(request: Request, exc: UploadSessionError):
+        logger.warning(f"Upload session error: {exc}")
+        return JSONResponse(
+            status_code=status.HTTP_409_CONFLICT,
+            content={
+                "detail": str(exc),
+                "status_code": status.HTTP_409_CONFLICT,
+                "error_type": "UploadSessionError"
+            },
+        )
+    
+    @app.exception_handler(UploadError)
+    async def upload_exception_handler(request: Request, exc: UploadError):
+        logger.warning(f"Upload error: {exc}")
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={
+                "detail": str(exc),
+                "status_code": status.HTTP_400_BAD_REQUEST,
+                "error_type": "UploadError"
+            },
+        )
+    
     @app.exception_handler(ModelError)
     async def model_exception_handler(request: Request, exc: ModelError):
         logger.error(f"Model error: {exc}")
@@ -66,6 +161,18 @@ def register_exception_handlers(app: FastAPI):
             },
         )
     
+    @app.exception_handler(DocumentNotFoundError)
+    async def document_not_found_exception_handler(request: Request, exc: DocumentNotFoundError):
+        logger.warning(f"Document not found: {exc}")
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={
+                "detail": str(exc),
+                "status_code": status.HTTP_404_NOT_FOUND,
+                "error_type": "DocumentNotFoundError"
+            },
+        )
+    
     @app.exception_handler(VectorStoreError)
     async def vector_store_exception_handler(request: Request, exc: VectorStoreError):
         logger.error(f"Vector store error: {exc}")
@@ -1,5 +1,5 @@
 # src/api/models/requests.py
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Literal
 from pydantic import BaseModel, Field
 
 class QueryRequest(BaseModel):
@@ -8,6 +8,12 @@ class QueryRequest(BaseModel):
     model_name: Optional[str] = Field(None, description="The model to use for generation")
     doc_id: Optional[str] = Field(None, description="Optional document ID to filter by")
     chat_history_id: Optional[str] = Field(None, description="Optional chat history ID for context")
+    search_mode: Optional[Literal["vector", "keyword", "hybrid"]] = Field(None, description="Retrieval mode; defaults to the configured mode")
+    keyword_weight: Optional[float] = Field(None, ge=0.0, le=1.0, description="Share of the BM25 ranking in hybrid search")
+
+class UploadSessionRequest(BaseModel):
+    file_name: str = Field(..., description="Name of the file being uploaded", min_length=1)
+    total_bytes: Optional[int] = Field(None, ge=0, description="Expected file size; completion is refused until it has arrived")
 
 class ModelSwitchRequest(BaseModel):
     model_name: str = Field(..., description="The name of the model to switch to")
@@ -1,5 +1,5 @@
 # src/api/models/responses.py
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from pydantic import BaseModel, Field
 from src.core.ollama_client import ModelInfo
 
@@ -7,6 +7,8 @@ class QueryResponse(BaseModel):
     response: str = Field(..., description="The generated response")
     sources: List[str] = Field(..., description="Sources used in generating the response")
     chat_history_id: str = Field(..., description="ID of the chat history")
+    context_usage: Optional[Dict[str, int]] = Field(None, description="Prompt token budget and how it was used")
+    timings: Optional[Dict[str, float]] = Field(None, description="Per-stage latencies in milliseconds")
 
 class ModelListResponse(BaseModel):
     models: List[ModelInfo]
@@ -19,6 +21,14 @@ class DocumentUploadResponse(BaseModel):
     message: str
     num_processed: int
     document_ids: List[str]
+    job_ids: List[str] = Field(default_factory=list, description="Ingestion job IDs, one per queued file")
+    duplicates: List[str] = Field(default_factory=list, description="Document IDs of uploads whose content is already stored")
+
+class UploadSessionResponse(BaseModel):
+    upload_id: str = Field(..., description="ID of the resumable upload session")
+    file_name: str
+    received_bytes: int = Field(..., description="Bytes received so far; the offset for the next part")
+    total_bytes: Optional[int] = Field(None, description="Expected file size, if given")
 
 class DocumentInfo(BaseModel):
     source: str = Field(..., description="Original document path")
@@ -27,11 +37,15 @@ class DocumentInfo(BaseModel):
     chunk_count: int = Field(..., description="Number of chunks from this document")
     added_at: str = Field(..., description="Timestamp when document was added")
     doc_id: str = Field(..., description="Unique document ID")
+    bytes: Optional[int] = Field(None, description="Size of the original file")
+    content_hash: Optional[str] = Field(None, description="SHA-256 of the original file")
 
 class DocumentListResponse(BaseModel):
-    documents: List[DocumentInfo] = Field(..., description="List of documents")
+    documents: List[DocumentInfo] = Field(..., description="One page of documents")
     total_documents: int = Field(..., description="Total number of unique documents")
     total_chunks: int = Field(..., description="Total number of chunks across all documents")
+    offset: int = Field(0, description="Position of the first document in this page")
+    limit: Optional[int] = Field(None, description="Maximum number of documents per page")
 
 class ErrorResponse(BaseModel):
     detail: str = Field(..., description="Error message")
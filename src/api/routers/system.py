@@ -1,10 +1,12 @@
 # src/api/routers/system.py
-from fastapi import APIRouter, HTTPException, Depends, Security
+from fastapi import APIRouter, HTTPException, Depends, Security, Request
+from fastapi.responses import JSONResponse
 from typing import List, Dict
 import logging
-from src.core.ollama_client import OllamaClient, ModelInfo
+from src.core.ollama_client import ModelInfo
+from src.core.model_catalog import ModelCatalog
 from src.core.text_generation import TextGenerationService
-from src.api.dependencies import get_ollama_client, get_text_gen_service, get_auth_dependency
+from src.api.dependencies import get_model_catalog, get_text_gen_service, get_auth_dependency
 from src.core.exceptions import ModelNotFoundError
 from src.api.models.responses import ModelListResponse, ModelSwitchResponse
 
@@ -12,10 +14,10 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.get("/models", response_model=ModelListResponse)
-async def list_models(ollama_client: OllamaClient = Depends(get_ollama_client)):
-    """Lists available models from Ollama."""
+async def list_models(refresh: bool = False, model_catalog: ModelCatalog = Depends(get_model_catalog)):
+    """Lists available models from the cached catalog; refresh=true bypasses the cache."""
     try:
-        models = await ollama_client.list_models()
+        models = await model_catalog.get_models(refresh=refresh)
         logger.info(f"Listed {len(models)} models")
         return ModelListResponse(models=models)
     except Exception as e:
@@ -48,6 +50,17 @@ async def health_check():
     """Health check endpoint."""
     return {"status": "ok"}
 
+@router.get("/ready")
+async def readiness_check(request: Request):
+    """Readiness endpoint: 200 once warmup has finished, 503 before that or if it failed."""
+    state = request.app.state
+    if getattr(state, "warmup_error", None):
+        return JSONResponse(status_code=503, content={"status": "failed", "detail": state.warmup_error})
+    ready = getattr(state, "ready", None)
+    if ready is None or not ready.is_set():
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready"}
+
 @router.get("/info")
 async def system_info():
     """System information endpoint."""
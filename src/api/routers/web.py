@@ -4,6 +4,7 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.security import OAuth2PasswordRequestForm
 from typing import Optional, List, Dict, Any
+import asyncio
 import os
 import logging
 from pathlib import Path
@@ -12,7 +13,8 @@ from datetime import datetime
 from src.core.config import settings
 from src.api.models.auth import authenticate_user, create_access_token, get_current_active_user, User
 from src.rag.vector_store import VectorStoreManager
-from src.api.dependencies import get_vector_store, get_current_user_optional
+from src.rag.query_engine import RAGQueryEngine
+from src.api.dependencies import get_vector_store, get_query_engine, get_current_user_optional
 
 logger = logging.getLogger(__name__)
 
@@ -127,23 +129,24 @@ async def stats_page(
     request: Request,
     access_token: Optional[str] = Cookie(None),
     user: Optional[User] = Depends(get_current_user_optional),
-    vector_store: VectorStoreManager = Depends(get_vector_store)
+    vector_store: VectorStoreManager = Depends(get_vector_store),
+    query_engine: RAGQueryEngine = Depends(get_query_engine)
 ):
     if settings.auth.enabled and not user:
         return RedirectResponse(url="/login", status_code=status.HTTP_303_SEE_OTHER)
     
     try:
         stats = {
-            "vector_store": vector_store.get_collection_stats(),
+            "vector_store": await asyncio.to_thread(vector_store.get_collection_stats),
             "uploads_dir": Path(settings.uploads_dir),
             "chat_histories_dir": Path(settings.chat_histories_dir)
         }
         
-        # Count files in uploads directory
-        uploads_count = len(list(Path(settings.uploads_dir).glob("*")))
+        # Uploaded documents are counted by the document registry
+        uploads_count = stats["vector_store"]["documents"]["documents"]
         
-        # Count files in chat_histories directory
-        chat_histories_count = len(list(Path(settings.chat_histories_dir).glob("*.json")))
+        # Conversation count is tracked by the chat history store
+        chat_histories_count = query_engine.chat_history_store.count()
         
         return templates.TemplateResponse(
             "stats.html",
@@ -0,0 +1,150 @@
+# src/benchmark_extractors.py
+"""
+Compares the installed text extraction backends.
+
+    python -m src.benchmark_extractors Test_Docs/
+    python -m src.benchmark_extractors manuals/ --page-workers 4 --repeat 3
+
+For every supported file type found, each installed backend extracts every
+file. The report shows throughput (MB/s, pages/s) and text fidelity, which
+is the token-level F1 score against a reference backend. By default the
+reference is the previous langchain loader for that type, or the first
+installed backend if that loader is missing.
+"""
+import argparse
+import re
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from src.rag.extractors import Extractor, PagedPdfExtractor, extractor_registry
+
+# The loaders DocumentProcessor used before the extractor registry
+LEGACY_BACKENDS = {".txt": "text", ".pdf": "pdfminer", ".docx": "unstructured"}
+
+
+@dataclass
+class _Result:
+    backend: str
+    files: int = 0
+    failures: int = 0
+    bytes: int = 0
+    pages: int = 0
+    chars: int = 0
+    seconds: float = 0.0
+    fidelity: List[float] = field(default_factory=list)
+
+
+def _tokens(text: str) -> Counter:
+    return Counter(re.findall(r"\w+", text.lower()))
+
+
+def token_f1(text: str, reference: str) -> float:
+    """Bag-of-words F1 between two extractions; 1.0 means the same words in the same amounts."""
+    ours, theirs = _tokens(text), _tokens(reference)
+    if not ours and not theirs:
+        return 1.0
+    overlap = sum((ours & theirs).values())
+    if not overlap:
+        return 0.0
+    precision = overlap / sum(ours.values())
+    recall = overlap / sum(theirs.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def _extract(extractor: Extractor, path: Path, repeat: int) -> tuple:
+    """Returns (text, page count, best time over repeat runs)."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        documents = extractor.load(path)
+        best = min(best, time.perf_counter() - started)
+    return "\n".join(doc.page_content for doc in documents), len(documents), best
+
+
+def _backends(extension: str, page_workers: int) -> List[Tuple[str, Extractor]]:
+    """Installed backends for a file type as (label, extractor), plus parallel variants of paged PDF backends."""
+    backends = [(e.name, e) for e in extractor_registry.for_extension(extension) if e.available()]
+    if page_workers > 1:
+        for name, extractor in list(backends):
+            if isinstance(extractor, PagedPdfExtractor):
+                parallel = type(extractor)(page_workers=page_workers, parallel_min_pages=1)
+                backends.append((f"{name} x{page_workers}", parallel))
+    return backends
+
+
+def benchmark(files: List[Path], repeat: int, page_workers: int, reference: Optional[str]) -> Dict[str, List[_Result]]:
+    by_extension: Dict[str, List[Path]] = {}
+    for path in files:
+        by_extension.setdefault(path.suffix.lower(), []).append(path)
+
+    report: Dict[str, List[_Result]] = {}
+    for extension, paths in sorted(by_extension.items()):
+        backends = _backends(extension, page_workers)
+        if not backends:
+            print(f"No installed extractor for {extension}, skipping {len(paths)} files")
+            continue
+        names = [label for label, _ in backends]
+        reference_name = reference if reference in names else LEGACY_BACKENDS.get(extension)
+        if reference_name not in names:
+            reference_name = names[0]
+        results = {label: _Result(label) for label, _ in backends}
+        for path in paths:
+            size = path.stat().st_size
+            texts: Dict[str, str] = {}
+            for label, extractor in backends:
+                result = results[label]
+                try:
+                    text, pages, seconds = _extract(extractor, path, repeat)
+                except Exception as e:
+                    print(f"{result.backend} failed on {path}: {e}", file=sys.stderr)
+                    result.failures += 1
+                    continue
+                texts[result.backend] = text
+                result.files += 1
+                result.bytes += size
+                result.pages += pages
+                result.chars += len(text)
+                result.seconds += seconds
+            if reference_name in texts:
+                for backend, text in texts.items():
+                    results[backend].fidelity.append(token_f1(text, texts[reference_name]))
+        report[f"{extension} (reference: {reference_name})"] = list(results.values())
+    return report
+
+
+def print_report(report: Dict[str, List[_Result]]) -> None:
+    for title, results in report.items():
+        print(f"\n{title}")
+        print(f"{'backend':<20}{'files':>7}{'failed':>8}{'MB/s':>10}{'pages/s':>10}{'chars':>12}{'fidelity':>10}")
+        for r in sorted(results, key=lambda r: r.seconds / r.files if r.files else float("inf")):
+            mb_per_s = r.bytes / 1e6 / r.seconds if r.seconds else 0.0
+            pages_per_s = r.pages / r.seconds if r.seconds else 0.0
+            fidelity = f"{sum(r.fidelity) / len(r.fidelity):.3f}" if r.fidelity else "-"
+            print(f"{r.backend:<20}{r.files:>7}{r.failures:>8}{mb_per_s:>10.2f}{pages_per_s:>10.1f}{r.chars:>12}{fidelity:>10}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.benchmark_extractors", description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("directory", nargs="?", default="Test_Docs", help="Directory of sample documents (default: Test_Docs)")
+    parser.add_argument("--repeat", type=int, default=1, help="Extract each file this many times and keep the best time")
+    parser.add_argument("--page-workers", type=int, default=1, help="Also time paged PDF backends with this many processes")
+    parser.add_argument("--reference", help="Backend to measure fidelity against")
+    args = parser.parse_args(argv)
+
+    directory = Path(args.directory)
+    extensions = set(LEGACY_BACKENDS)
+    files = sorted(p for p in directory.rglob("*") if p.is_file() and p.suffix.lower() in extensions)
+    if not files:
+        print(f"No .txt, .pdf or .docx files in {directory}")
+        return 1
+    print(f"Benchmarking {len(files)} files from {directory}")
+    print_report(benchmark(files, args.repeat, args.page_workers, args.reference))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
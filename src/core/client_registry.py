@@ -0,0 +1,76 @@
+# src/core/client_registry.py
+import logging
+from typing import Dict, Optional
+
+import httpx
+from langchain_ollama import OllamaLLM
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+class ClientRegistry:
+    """
+    Process-wide holder of the clients used to talk to Ollama.
+
+    A single pooled httpx.AsyncClient (keep-alive, connection limits and
+    timeouts from settings) serves all Ollama API calls, and OllamaLLM
+    objects are created once per model and reused, so requests neither pay
+    connection setup nor rebuild the LLM. The registry is opened on app
+    startup and closed on shutdown.
+    """
+
+    def __init__(self):
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._llms: Dict[str, OllamaLLM] = {}
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """The shared HTTP client, created on first use."""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                base_url=settings.ollama.base_url,
+                limits=httpx.Limits(
+                    max_connections=settings.ollama.max_connections,
+                    max_keepalive_connections=settings.ollama.max_keepalive_connections,
+                    keepalive_expiry=settings.ollama.keepalive_expiry
+                ),
+                timeout=httpx.Timeout(
+                    settings.ollama.request_timeout,
+                    connect=settings.ollama.connect_timeout
+                )
+            )
+            logger.info(f"Opened pooled HTTP client for {settings.ollama.base_url}")
+        return self._http_client
+
+    def get_llm(self, model_name: str) -> OllamaLLM:
+        """Returns the cached OllamaLLM for a model, creating it on first use."""
+        llm = self._llms.get(model_name)
+        if llm is None:
+            options = {}
+            if settings.ollama.keep_alive is not None:
+                options["keep_alive"] = settings.ollama.keep_alive
+            llm = self._llms[model_name] = OllamaLLM(
+                model=model_name,
+                base_url=settings.ollama.base_url,
+                **options
+            )
+            logger.info(f"Initialized LLM with model: {model_name}")
+        return llm
+
+    def get_stats(self) -> Dict[str, object]:
+        return {
+            "http_client_open": self._http_client is not None and not self._http_client.is_closed,
+            "llm_models": sorted(self._llms)
+        }
+
+    async def close(self) -> None:
+        """Closes the HTTP client and drops cached LLM objects."""
+        if self._http_client is not None and not self._http_client.is_closed:
+            await self._http_client.aclose()
+            logger.info("Closed pooled HTTP client")
+        self._http_client = None
+        self._llms.clear()
+
+
+client_registry = ClientRegistry()
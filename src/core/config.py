@@ -1,7 +1,7 @@
 # src/core/config.py
 from pydantic import Field
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Optional, Dict, List
 
 class OllamaSettings(BaseSettings):
     base_url: str = Field("http://localhost:11434", env="OLLAMA_BASE_URL")
@@ -9,6 +9,18 @@ class OllamaSettings(BaseSettings):
     default_embedding_model: str = Field("nomic-ai/nomic-embed-text-v1", env="RAG_EMBEDDING_MODEL")
     max_retries: int = Field(3, env="RAG_OLLAMA_MAX_RETRIES")
     retry_delay: int = Field(1, env="RAG_OLLAMA_RETRY_DELAY")
+    max_concurrent_generations: int = Field(2, env="RAG_OLLAMA_MAX_CONCURRENCY")
+    model_concurrency: Dict[str, int] = Field(default_factory=dict, env="RAG_OLLAMA_MODEL_CONCURRENCY")
+    generation_queue_timeout: float = Field(60.0, env="RAG_OLLAMA_QUEUE_TIMEOUT")
+    max_connections: int = Field(20, env="RAG_OLLAMA_MAX_CONNECTIONS")
+    max_keepalive_connections: int = Field(10, env="RAG_OLLAMA_MAX_KEEPALIVE")
+    keepalive_expiry: float = Field(30.0, env="RAG_OLLAMA_KEEPALIVE_EXPIRY")
+    request_timeout: float = Field(120.0, env="RAG_OLLAMA_TIMEOUT")
+    connect_timeout: float = Field(5.0, env="RAG_OLLAMA_CONNECT_TIMEOUT")
+    keep_alive: Optional[str] = Field(None, env="RAG_OLLAMA_KEEP_ALIVE")
+    preload_models: List[str] = Field(default_factory=list, env="RAG_OLLAMA_PRELOAD_MODELS")
+    model_catalog_ttl: float = Field(300.0, env="RAG_MODEL_CATALOG_TTL")
+    model_catalog_refresh_interval: float = Field(240.0, env="RAG_MODEL_CATALOG_REFRESH")
 
 class AuthSettings(BaseSettings):
     enabled: bool = Field(False, env="AUTH_ENABLED")
@@ -18,14 +30,90 @@ class AuthSettings(BaseSettings):
     password: str = Field("password", env="AUTH_PASSWORD")
     hashed_password: Optional[str] = Field(None, env="AUTH_HASHED_PASSWORD")
 
+class IngestionSettings(BaseSettings):
+    parse_workers: int = Field(2, env="RAG_INGEST_PARSE_WORKERS")
+    embed_workers: int = Field(1, env="RAG_INGEST_EMBED_WORKERS")
+    queue_size: int = Field(16, env="RAG_INGEST_QUEUE_SIZE")
+    batch_size: int = Field(256, env="RAG_INGEST_BATCH_SIZE")  # Chunks per parsed and embedded batch
+
+class ExtractionSettings(BaseSettings):
+    pdf_backend: str = Field("auto", env="RAG_PDF_EXTRACTOR")  # auto, pypdfium2, pypdf or pdfminer
+    docx_backend: str = Field("auto", env="RAG_DOCX_EXTRACTOR")  # auto, docx-xml, python-docx or unstructured
+    pdf_page_workers: int = Field(1, env="RAG_PDF_PAGE_WORKERS")  # Processes per large PDF; 1 disables
+    pdf_parallel_min_pages: int = Field(200, env="RAG_PDF_PARALLEL_MIN_PAGES")
+
+class RetrievalSettings(BaseSettings):
+    search_mode: str = Field("vector", env="RAG_SEARCH_MODE")  # vector, keyword or hybrid
+    keyword_weight: float = Field(0.5, env="RAG_KEYWORD_WEIGHT")  # BM25 share of the fused score
+    rrf_k: int = Field(60, env="RAG_RRF_K")
+    search_workers: int = Field(4, env="RAG_SEARCH_WORKERS")  # Threads for query embedding and search
+
+class RerankSettings(BaseSettings):
+    enabled: bool = Field(False, env="RAG_RERANK_ENABLED")
+    model: str = Field("cross-encoder/ms-marco-MiniLM-L-6-v2", env="RAG_RERANK_MODEL")
+    candidates: int = Field(50, env="RAG_RERANK_CANDIDATES")
+    batch_size: int = Field(16, env="RAG_RERANK_BATCH_SIZE")
+    budget_ms: float = Field(300, env="RAG_RERANK_BUDGET_MS")
+    cache_size: int = Field(50_000, env="RAG_RERANK_CACHE_SIZE")
+
+class ContextSettings(BaseSettings):
+    max_prompt_tokens: int = Field(3000, env="RAG_MAX_PROMPT_TOKENS")
+    model_prompt_tokens: Dict[str, int] = Field(default_factory=dict, env="RAG_MODEL_PROMPT_TOKENS")
+    history_share: float = Field(0.3, env="RAG_HISTORY_TOKEN_SHARE")
+    duplicate_threshold: float = Field(0.9, env="RAG_DUPLICATE_THRESHOLD")
+
+class EmbeddingSettings(BaseSettings):
+    batch_size: int = Field(32, env="RAG_EMBEDDING_BATCH_SIZE")
+    num_threads: int = Field(0, env="RAG_EMBEDDING_THREADS")  # 0 keeps the torch default
+    dtype: str = Field("float32", env="RAG_EMBEDDING_DTYPE")
+
+class EmbeddingCacheSettings(BaseSettings):
+    enabled: bool = Field(True, env="RAG_EMBEDDING_CACHE_ENABLED")
+    path: str = Field("embedding_cache/embeddings.sqlite3", env="RAG_EMBEDDING_CACHE_PATH")
+    max_entries: int = Field(500_000, env="RAG_EMBEDDING_CACHE_MAX_ENTRIES")
+
+class AnswerCacheSettings(BaseSettings):
+    enabled: bool = Field(True, env="RAG_ANSWER_CACHE_ENABLED")
+    ttl_seconds: float = Field(3600, env="RAG_ANSWER_CACHE_TTL")
+    max_entries: int = Field(1000, env="RAG_ANSWER_CACHE_MAX_ENTRIES")
+    semantic_enabled: bool = Field(False, env="RAG_ANSWER_CACHE_SEMANTIC")
+    semantic_threshold: float = Field(0.95, env="RAG_ANSWER_CACHE_SIMILARITY")
+
+class UploadSettings(BaseSettings):
+    max_bytes: int = Field(1024 * 1024 * 1024, env="RAG_UPLOAD_MAX_BYTES")
+    max_request_bytes: Optional[int] = Field(None, env="RAG_UPLOAD_MAX_REQUEST_BYTES")  # Multipart body limit; defaults to just over max_bytes
+    max_concurrent: int = Field(4, env="RAG_UPLOAD_MAX_CONCURRENT")
+    chunk_bytes: int = Field(1024 * 1024, env="RAG_UPLOAD_CHUNK_BYTES")
+    queue_timeout: float = Field(30.0, env="RAG_UPLOAD_QUEUE_TIMEOUT")
+    session_ttl_hours: float = Field(24.0, env="RAG_UPLOAD_SESSION_TTL_HOURS")
+
+class ChatHistorySettings(BaseSettings):
+    cache_size: int = Field(256, env="RAG_CHAT_HISTORY_CACHE_SIZE")
+    compaction_enabled: bool = Field(False, env="RAG_HISTORY_COMPACTION_ENABLED")
+    compaction_threshold_tokens: int = Field(1500, env="RAG_HISTORY_COMPACTION_TOKENS")
+    compaction_keep_messages: int = Field(4, env="RAG_HISTORY_COMPACTION_KEEP_MESSAGES")
+    summary_max_words: int = Field(200, env="RAG_HISTORY_SUMMARY_MAX_WORDS")
+    summary_model: Optional[str] = Field(None, env="RAG_HISTORY_SUMMARY_MODEL")
+
 class Settings(BaseSettings):
     ollama: OllamaSettings = OllamaSettings()
     auth: AuthSettings = AuthSettings()
+    ingestion: IngestionSettings = IngestionSettings()
+    retrieval: RetrievalSettings = RetrievalSettings()
+    rerank: RerankSettings = RerankSettings()
+    context: ContextSettings = ContextSettings()
+    embedding: EmbeddingSettings = EmbeddingSettings()
+    embedding_cache: EmbeddingCacheSettings = EmbeddingCacheSettings()
+    answer_cache: AnswerCacheSettings = AnswerCacheSettings()
+    chat_history: ChatHistorySettings = ChatHistorySettings()
+    uploads: UploadSettings = UploadSettings()
+    extraction: ExtractionSettings = ExtractionSettings()
     uploads_dir: str = Field("uploads", env="RAG_UPLOADS_DIR")
     chroma_db_path: str = Field("chroma_db", env="RAG_CHROMA_DB_PATH")
     chat_histories_dir: str = Field("chat_histories", env="RAG_CHAT_HISTORIES_DIR")
     api_host: str = Field("0.0.0.0", env="RAG_API_HOST")
     api_port: int = Field(8002, env="RAG_API_PORT")
+    ready_timeout: float = Field(120.0, env="RAG_READY_TIMEOUT")
     log_level: str = Field("INFO", env="LOG_LEVEL")
     log_file: Optional[str] = Field(None, env="LOG_FILE")
 
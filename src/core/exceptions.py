@@ -16,6 +16,10 @@ class ModelSwitchError(ModelError):
     """Raised when model switch operation fails."""
     pass
 
+class ModelBusyError(ModelError):
+    """Raised when a model's generation queue is saturated."""
+    pass
+
 class DocumentProcessingError(BaseAppException):
     """Raised when document processing fails."""
     pass
@@ -24,10 +28,38 @@ class VectorStoreError(BaseAppException):
     """Base exception for vector store related errors."""
     pass
 
+class DocumentNotFoundError(VectorStoreError):
+    """Raised when a document ID has no stored chunks."""
+    pass
+
 class QueryError(BaseAppException):
     """Raised when query processing fails."""
     pass
 
 class AuthenticationError(BaseAppException):
     """Raised for authentication related errors."""
+    pass
+
+class ServiceNotReadyError(BaseAppException):
+    """Raised when a request needs components that are still warming up."""
+    pass
+
+class UploadError(BaseAppException):
+    """Raised when an upload is rejected."""
+    pass
+
+class UploadTooLargeError(UploadError):
+    """Raised when an upload exceeds the configured size limit."""
+    pass
+
+class UploadLimitError(UploadError):
+    """Raised when too many uploads are in progress."""
+    pass
+
+class UploadSessionError(UploadError):
+    """Raised when a resumable upload part does not fit the session state."""
+    pass
+
+class UploadSessionNotFoundError(UploadSessionError):
+    """Raised when a resumable upload session does not exist."""
     pass
\ No newline at end of file
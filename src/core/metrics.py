@@ -0,0 +1,151 @@
+# src/core/metrics.py
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+# Everything is registered here rather than in the prometheus_client default
+# registry, so /metrics only shows what this app records.
+REGISTRY = CollectorRegistry()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+HTTP_REQUESTS = Counter(
+    "rag_http_requests_total", "HTTP requests by route and status",
+    ["method", "route", "status"], registry=REGISTRY
+)
+HTTP_LATENCY = Histogram(
+    "rag_http_request_duration_seconds", "HTTP request latency by route, until the last byte of the response",
+    ["method", "route"], buckets=LATENCY_BUCKETS, registry=REGISTRY
+)
+HTTP_STREAM_DURATION = Histogram(
+    "rag_http_stream_duration_seconds", "Duration of streamed (Server-Sent Events) responses by route",
+    ["method", "route"], buckets=LATENCY_BUCKETS, registry=REGISTRY
+)
+DOCUMENTS_PROCESSED = Counter(
+    "rag_documents_processed_total", "Documents loaded and split", ["file_type"], registry=REGISTRY
+)
+DOCUMENT_CHUNKS = Counter(
+    "rag_document_chunks_total", "Chunks produced by document splitting", registry=REGISTRY
+)
+DOCUMENT_PROCESSING_LATENCY = Histogram(
+    "rag_document_processing_seconds", "Time to load and split one document",
+    buckets=LATENCY_BUCKETS, registry=REGISTRY
+)
+INGESTION_STAGE_LATENCY = Histogram(
+    "rag_ingestion_stage_seconds", "Ingestion pipeline stage latency per document",
+    ["stage"], buckets=LATENCY_BUCKETS, registry=REGISTRY
+)
+INGESTED_CHUNKS = Counter(
+    "rag_ingested_chunks_total", "Chunks written to the vector store by the ingestion pipeline",
+    registry=REGISTRY
+)
+INGESTION_CHUNKS_PER_SECOND = Histogram(
+    "rag_ingestion_chunks_per_second", "Per-document ingestion throughput",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500), registry=REGISTRY
+)
+EMBEDDING_BATCH_LATENCY = Histogram(
+    "rag_embedding_batch_seconds", "Latency of one embedding model batch",
+    buckets=LATENCY_BUCKETS, registry=REGISTRY
+)
+VECTOR_STORE_ADD_LATENCY = Histogram(
+    "rag_vector_store_add_seconds", "Time to embed and store a set of chunks",
+    buckets=LATENCY_BUCKETS, registry=REGISTRY
+)
+SEARCH_LATENCY = Histogram(
+    "rag_search_duration_seconds", "Search latency by kind, k and whether a filter was applied",
+    ["kind", "k", "filtered"], buckets=LATENCY_BUCKETS, registry=REGISTRY
+)
+QUERY_STAGE_LATENCY = Histogram(
+    "rag_query_stage_seconds", "Query pipeline stage latency",
+    ["stage"], buckets=LATENCY_BUCKETS, registry=REGISTRY
+)
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "rag_llm_time_to_first_token_seconds", "Time from sending a prompt to the first token",
+    ["model"], buckets=LATENCY_BUCKETS, registry=REGISTRY
+)
+LLM_TOKENS_PER_SECOND = Histogram(
+    "rag_llm_tokens_per_second", "Generation throughput after the first token",
+    ["model"], buckets=(1, 2, 5, 10, 20, 30, 50, 75, 100, 200), registry=REGISTRY
+)
+LLM_TOKENS = Counter(
+    "rag_llm_tokens_total", "Streamed tokens generated", ["model"], registry=REGISTRY
+)
+
+
+def observe_search(kind: str, k: int, filtered: bool, started: float) -> None:
+    SEARCH_LATENCY.labels(kind, str(k), "true" if filtered else "false").observe(time.perf_counter() - started)
+
+
+def observe_query_timings(timings: Dict[str, float]) -> None:
+    """Records the per-stage timings of a query (milliseconds, *_ms keys)."""
+    for name, value in timings.items():
+        if name.endswith("_ms") and value is not None:
+            QUERY_STAGE_LATENCY.labels(name[:-3]).observe(value / 1000)
+
+
+class ComponentStatsCollector:
+    """
+    Exposes component get_stats() values (cache hit ratios, queue depths) at scrape time.
+
+    Nothing is computed on the request path; the stats callables are only
+    invoked when /metrics is scraped.
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, Callable[[], Optional[Dict[str, Any]]]] = {}
+
+    def add_source(self, name: str, get_stats: Callable[[], Optional[Dict[str, Any]]]) -> None:
+        self._sources[name] = get_stats
+
+    def collect(self) -> Iterable:
+        for name, get_stats in self._sources.items():
+            try:
+                stats = get_stats()
+            except Exception as e:
+                logger.warning(f"Collecting metrics from {name} failed: {e}")
+                continue
+            if stats:
+                yield from _stats_metrics(name, stats)
+
+
+def _stats_metrics(name: str, stats: Dict[str, Any]) -> Iterable:
+    """Turns a get_stats() dict into gauges; nested per-key dicts become labelled gauges."""
+    prefix = f"rag_{name}"
+    for key, value in stats.items():
+        if isinstance(value, bool) or value is None:
+            continue
+        if isinstance(value, (int, float)):
+            if key in ("hits", "misses", "exact_hits", "semantic_hits", "calls", "fallbacks",
+                       "leaders", "followers", "fetches", "compactions", "failures"):
+                yield CounterMetricFamily(f"{prefix}_{key}", f"{name} {key}", value=value)
+            else:
+                yield GaugeMetricFamily(f"{prefix}_{key}", f"{name} {key}", value=value)
+        elif isinstance(value, dict) and value and all(isinstance(v, dict) for v in value.values()):
+            # e.g. generation queues: {model: {"active": 1, "waiting": 0}}
+            fields = {f for v in value.values() for f, x in v.items() if isinstance(x, (int, float))}
+            for field_name in sorted(fields):
+                gauge = GaugeMetricFamily(f"{prefix}_{key}_{field_name}", f"{name} {key} {field_name}", labels=["key"])
+                for label, values in value.items():
+                    if isinstance(values.get(field_name), (int, float)):
+                        gauge.add_metric([str(label)], values[field_name])
+                yield gauge
+        elif isinstance(value, dict) and value and all(isinstance(v, (int, float)) for v in value.values()):
+            # e.g. ingestion jobs by status
+            gauge = GaugeMetricFamily(f"{prefix}_{key}", f"{name} {key}", labels=["key"])
+            for label, count in value.items():
+                gauge.add_metric([str(label)], count)
+            yield gauge
+
+
+component_stats = ComponentStatsCollector()
+REGISTRY.register(component_stats)
+
+
+def render_metrics() -> bytes:
+    return generate_latest(REGISTRY)
+
@@ -0,0 +1,108 @@
+# src/core/model_catalog.py
+import asyncio
+import logging
+import time
+from typing import List, Dict, Any, Optional
+
+from .ollama_client import OllamaClient, ModelInfo
+
+logger = logging.getLogger(__name__)
+
+# Unknown names refresh the catalog at most this often, so bad requests can't hammer Ollama
+MISS_REFRESH_SECONDS = 5.0
+
+class ModelCatalog:
+    """
+    Cached view of the models Ollama has installed.
+
+    The tag list is fetched at most once per ttl_seconds; concurrent callers
+    share one in-flight fetch. A background task refreshes the list every
+    refresh_interval seconds so lookups rarely wait on Ollama, and the last
+    good list keeps being served if a refresh fails. A name that is not in
+    the cache triggers one forced refresh before it is reported missing,
+    so newly pulled models show up without waiting for the TTL.
+    """
+
+    def __init__(self, ollama_client: OllamaClient, ttl_seconds: float = 300, refresh_interval: float = 240):
+        self.ollama_client = ollama_client
+        self.ttl_seconds = ttl_seconds
+        self.refresh_interval = refresh_interval
+        self._models: Optional[List[ModelInfo]] = None
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.fetches = 0
+        self.hits = 0
+
+    def start(self) -> None:
+        """Starts the background refresh task."""
+        if self.refresh_interval > 0 and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    def invalidate(self) -> None:
+        """Forces the next lookup to fetch the model list from Ollama."""
+        self._fetched_at = 0.0
+        logger.info("Invalidated model catalog")
+
+    async def get_models(self, refresh: bool = False) -> List[ModelInfo]:
+        """Returns the installed models, fetching them if the cache is stale."""
+        if not refresh and self._is_fresh():
+            self.hits += 1
+            return self._models
+        fetched_before = self._fetched_at
+        async with self._lock:
+            # Another caller may have refreshed while we waited for the lock
+            if self._fetched_at > fetched_before and self._models is not None:
+                return self._models
+            return await self._fetch()
+
+    async def has_model(self, model_name: str) -> bool:
+        """Checks whether a model is installed, refreshing once on a miss."""
+        models = await self.get_models()
+        if any(m.name == model_name for m in models):
+            return True
+        if time.monotonic() - self._fetched_at < MISS_REFRESH_SECONDS:
+            return False
+        models = await self.get_models(refresh=True)
+        return any(m.name == model_name for m in models)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "models": len(self._models) if self._models is not None else None,
+            "age_seconds": round(time.monotonic() - self._fetched_at, 1) if self._models is not None else None,
+            "fetches": self.fetches,
+            "hits": self.hits
+        }
+
+    def _is_fresh(self) -> bool:
+        return self._models is not None and time.monotonic() - self._fetched_at < self.ttl_seconds
+
+    async def _fetch(self) -> List[ModelInfo]:
+        try:
+            models = await self.ollama_client.list_models()
+        except Exception as e:
+            if self._models is None:
+                raise
+            logger.warning(f"Refreshing model catalog failed, serving cached list: {e}")
+            return self._models
+        self._models = models
+        self._fetched_at = time.monotonic()
+        self.fetches += 1
+        return models
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.get_models(refresh=True)
+            except Exception as e:
+                logger.warning(f"Background model catalog refresh failed: {e}")
@@ -1,7 +1,7 @@
 # src/core/ollama_client.py
 import httpx
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from pydantic import BaseModel, ValidationError, Field
 from src.core.config import settings  # Import settings
 
@@ -16,9 +16,11 @@ class ModelInfo(BaseModel):
     details: Dict[str, Any] = Field(default_factory=dict)
 
 class OllamaClient:
-    def __init__(self):
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
         self.base_url = settings.ollama.base_url
-        self.client = httpx.AsyncClient()
+        # A shared client is owned (and closed) by whoever passed it in
+        self._owns_client = http_client is None
+        self.client = http_client or httpx.AsyncClient()
         logger.info(f"Initialized OllamaClient with base URL: {self.base_url}")
 
     async def list_models(self) -> List[ModelInfo]:
@@ -50,6 +52,16 @@ class OllamaClient:
             logger.exception(f"An unexpected error occurred: {e}")
             raise
 
+    async def preload_model(self, model_name: str, keep_alive: Optional[str] = None) -> None:
+        """Loads a model into Ollama's memory; a generate call without a prompt only loads it."""
+        payload: Dict[str, Any] = {"model": model_name}
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        response = await self.client.post(f"{self.base_url}/api/generate", json=payload)
+        response.raise_for_status()
+
     async def close(self):
+        if not self._owns_client:
+            return
         await self.client.aclose()
         logger.info("OllamaClient connection closed")
\ No newline at end of file
@@ -1,37 +1,52 @@
 # src/core/text_generation.py
-from langchain_ollama import OllamaLLM
+import asyncio
 import logging
-from typing import Optional, List
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import Optional, List, AsyncIterator, Dict, Any, Tuple
 from .ollama_client import OllamaClient
+from .client_registry import ClientRegistry, client_registry as default_client_registry
+from .model_catalog import ModelCatalog
 from .config import settings
-from .exceptions import ModelNotFoundError
+from . import metrics
+from .exceptions import ModelNotFoundError, ModelBusyError
 
 logger = logging.getLogger(__name__)
 
 class TextGenerationService:
-    def __init__(self, ollama_client: OllamaClient):
+    def __init__(
+        self,
+        ollama_client: OllamaClient,
+        client_registry: Optional[ClientRegistry] = None,
+        model_catalog: Optional[ModelCatalog] = None
+    ):
         self.ollama_client = ollama_client
+        self.client_registry = client_registry or default_client_registry
+        self.model_catalog = model_catalog or ModelCatalog(
+            ollama_client,
+            ttl_seconds=settings.ollama.model_catalog_ttl,
+            refresh_interval=0
+        )
         self.current_model = settings.ollama.default_model
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._waiting: Dict[str, int] = defaultdict(int)
+        self._active: Dict[str, int] = defaultdict(int)
         self._initialize_llm()
         logger.info(f"Initialized TextGenerationService with model: {self.current_model}")
 
     def _initialize_llm(self, model_name: Optional[str] = None):
-        """Initializes or re-initializes the OllamaLLM object."""
+        """Points self.llm at the registry's cached OllamaLLM for the model."""
         model_to_use = model_name or self.current_model
         try:
-            self.llm = OllamaLLM(
-                model=model_to_use,
-                base_url=settings.ollama.base_url
-            )
-            logger.info(f"Initialized LLM with model: {model_to_use}")
+            self.llm = self.client_registry.get_llm(model_to_use)
         except Exception as e:
             logger.error(f"Failed to initialize LLM with model {model_to_use}: {e}", exc_info=True)
             raise
 
     async def set_model(self, model_name: str) -> bool:
         """Switch to a different model."""
-        models = await self.ollama_client.list_models()
-        if not any(m.name == model_name for m in models):
+        if not await self.model_catalog.has_model(model_name):
             logger.error(f"Model {model_name} not found in available models")
             raise ModelNotFoundError(f"Model {model_name} not available")
 
@@ -46,19 +61,126 @@ class TextGenerationService:
 
     async def generate_text(self, prompt: List, model_name: Optional[str] = None) -> str:
         """Generate text using specified or current model."""
-        if model_name and model_name != self.current_model:
-            await self.set_model(model_name)
+        model, llm = await self._resolve_llm(model_name)
+        try:
+            async with self._generation_slot(model):
+                response = await llm.ainvoke(prompt)
+            return self._to_text(response)
+        except ModelBusyError:
+            raise
+        except Exception as e:
+            logger.error(f"Error generating text with model {model}: {e}", exc_info=True)
+            raise
 
+    async def stream_text(self, prompt: List, model_name: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream generated text chunk by chunk using specified or current model."""
+        model, llm = await self._resolve_llm(model_name)
         try:
-            response = self.llm.invoke(prompt)
-            # Fix: Check if response is a string or an object with content attribute
-            if isinstance(response, str):
-                return response
-            elif hasattr(response, 'content'):
-                return response.content
-            else:
-                # If it's neither, convert it to a string
-                return str(response)
+            async with self._generation_slot(model):
+                started = time.perf_counter()
+                first_token_at = None
+                tokens = 0
+                async for chunk in llm.astream(prompt):
+                    text = self._to_text(chunk)
+                    if text:
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                            metrics.LLM_TIME_TO_FIRST_TOKEN.labels(model).observe(first_token_at - started)
+                        tokens += 1
+                        yield text
+                self._record_throughput(model, first_token_at, tokens)
+        except ModelBusyError:
+            raise
         except Exception as e:
-            logger.error(f"Error generating text with model {self.current_model}: {e}", exc_info=True)
-            raise
\ No newline at end of file
+            logger.error(f"Error streaming text with model {model}: {e}", exc_info=True)
+            raise
+
+    async def preload_models(self, model_names: List[str]) -> None:
+        """Asks Ollama to load models into memory ahead of the first request."""
+        for model_name in model_names:
+            try:
+                await self.ollama_client.preload_model(model_name, keep_alive=settings.ollama.keep_alive)
+                self.client_registry.get_llm(model_name)
+                logger.info(f"Preloaded model: {model_name}")
+            except Exception as e:
+                logger.warning(f"Failed to preload model {model_name}: {e}")
+
+    async def _resolve_llm(self, model_name: Optional[str]) -> Tuple[str, Any]:
+        """
+        Picks the LLM handle for a single request.
+
+        The default model stays untouched, so concurrent requests for
+        different models each get their own cached handle instead of
+        switching a shared one back and forth.
+        """
+        model = model_name or self.current_model
+        if model == self.current_model:
+            return model, self.llm
+        if not await self.model_catalog.has_model(model):
+            logger.error(f"Model {model} not found in available models")
+            raise ModelNotFoundError(f"Model {model} not available")
+        return model, self.client_registry.get_llm(model)
+
+    @staticmethod
+    def _record_throughput(model_name: str, first_token_at: Optional[float], tokens: int) -> None:
+        """Records tokens/s after the first token; Ollama streams roughly one token per chunk."""
+        metrics.LLM_TOKENS.labels(model_name).inc(tokens)
+        if first_token_at is not None and tokens > 1:
+            elapsed = time.perf_counter() - first_token_at
+            if elapsed > 0:
+                metrics.LLM_TOKENS_PER_SECOND.labels(model_name).observe((tokens - 1) / elapsed)
+
+    def get_queue_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Returns per-model concurrency limits, active generations and queue depth."""
+        return {
+            model: {
+                "limit": self._concurrency_limit(model),
+                "active": self._active[model],
+                "waiting": self._waiting[model]
+            }
+            for model in self._semaphores
+        }
+
+    def _concurrency_limit(self, model_name: str) -> int:
+        return settings.ollama.model_concurrency.get(model_name, settings.ollama.max_concurrent_generations)
+
+    @asynccontextmanager
+    async def _generation_slot(self, model_name: str):
+        """
+        Holds one of the model's concurrency slots for the duration of a generation.
+
+        Requests beyond the limit queue up; if a slot does not free up within
+        the configured timeout a ModelBusyError is raised so callers get a fast
+        503 instead of piling up behind a slow model.
+        """
+        semaphore = self._semaphores.get(model_name)
+        if semaphore is None:
+            semaphore = self._semaphores[model_name] = asyncio.Semaphore(self._concurrency_limit(model_name))
+
+        self._waiting[model_name] += 1
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=settings.ollama.generation_queue_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Generation queue for model {model_name} is saturated ({self._waiting[model_name]} waiting)")
+            raise ModelBusyError(f"Model {model_name} is busy, please retry later")
+        finally:
+            self._waiting[model_name] -= 1
+
+        self._active[model_name] += 1
+        try:
+            yield
+        finally:
+            self._active[model_name] -= 1
+            semaphore.release()
+
+    @staticmethod
+    def _to_text(response) -> str:
+        """Normalizes an LLM response or stream chunk to a string."""
+        # Fix: Check if response is a string or an object with content attribute
+        if isinstance(response, str):
+            return response
+        elif hasattr(response, 'content'):
+            return response.content
+        else:
+            # If it's neither, convert it to a string
+            return str(response)
@@ -0,0 +1,402 @@
+# src/core/uploads.py
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import aiofiles
+import aiofiles.os
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from .exceptions import UploadError, UploadTooLargeError, UploadLimitError, UploadSessionError, UploadSessionNotFoundError
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class StoredUpload:
+    """A fully received upload, still in the staging directory until committed."""
+    file_name: str
+    temp_path: Path
+    doc_id: str
+    size: int
+
+
+@dataclass
+class UploadSession:
+    upload_id: str
+    file_name: str
+    total_bytes: Optional[int]
+    received_bytes: int = 0
+    created_at: float = 0.0
+
+
+class UploadManager:
+    """
+    Streams uploads to disk without holding them in memory.
+
+    Files are written in chunk_bytes pieces with aiofiles while their SHA-256
+    (the document ID) is computed on the fly, and are staged in a .partial
+    directory so a failed or oversized upload never leaves a half-written
+    file in the upload directory. At most max_concurrent uploads write at
+    once and no file may exceed max_bytes. Multipart requests are parsed as
+    their body arrives (receive_multipart), so each file is written once,
+    straight to its staging file, and the slot is held only while bytes are
+    being received. check_request_size turns away requests that declare an
+    oversized body before any of it is read.
+
+    Large files can also be sent as a resumable session: the client creates
+    a session, appends parts in order with an offset, can ask how much has
+    arrived after a dropped connection, and completes the session when done.
+    Session metadata is kept in a sidecar file so sessions survive restarts.
+    """
+
+    def __init__(
+        self,
+        upload_dir: str,
+        max_bytes: int,
+        max_concurrent: int = 4,
+        chunk_bytes: int = 1024 * 1024,
+        queue_timeout: float = 30.0,
+        session_ttl_seconds: float = 24 * 3600,
+        max_request_bytes: Optional[int] = None
+    ):
+        self.upload_dir = Path(upload_dir)
+        self.partial_dir = self.upload_dir / ".partial"
+        self.partial_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        # Leaves room for the multipart boundaries and headers around a max_bytes file
+        self.max_request_bytes = max_request_bytes or max_bytes + 64 * 1024
+        self.max_concurrent = max_concurrent
+        self.chunk_bytes = chunk_bytes
+        self.queue_timeout = queue_timeout
+        self.session_ttl_seconds = session_ttl_seconds
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._active = 0
+        self._sessions: Dict[str, UploadSession] = {}
+        self._digests: Dict[str, "hashlib._Hash"] = {}
+        self._session_locks: Dict[str, asyncio.Lock] = {}
+        self._load_sessions()
+        logger.info(f"Initialized UploadManager with max_bytes={max_bytes}, max_concurrent={max_concurrent}")
+
+    def check_request_size(self, content_length: Optional[str]) -> None:
+        """Rejects a multipart request whose declared Content-Length is over the limit."""
+        if content_length and content_length.isdigit() and int(content_length) > self.max_request_bytes:
+            raise UploadTooLargeError(
+                f"Request of {content_length} bytes exceeds the {self.max_request_bytes} byte upload limit"
+            )
+
+    async def receive_multipart(self, content_type: str, chunks: AsyncIterator[bytes]) -> List[StoredUpload]:
+        """
+        Streams the files of a multipart/form-data body into the staging directory.
+
+        Holds an upload slot until the last file is staged, and no longer, so
+        queueing the files for ingestion does not count against the limit.
+        Form fields without a file name are ignored. If anything fails, every
+        file staged by this request is removed.
+        """
+        _, params = parse_options_header(content_type)
+        boundary = params.get(b"boundary")
+        if not content_type.startswith("multipart/form-data") or not boundary:
+            raise UploadError("Expected a multipart/form-data body")
+
+        # The parser's callbacks are synchronous, so they only record events
+        # and the file writes happen after each chunk has been fed
+        events: List[Tuple[str, Any]] = []
+        header_name = bytearray()
+        header_value = bytearray()
+
+        def on_header_end() -> None:
+            events.append(("header", (bytes(header_name).lower(), bytes(header_value))))
+            header_name.clear()
+            header_value.clear()
+
+        parser = MultipartParser(boundary, {
+            "on_part_begin": lambda: events.append(("begin", None)),
+            "on_header_field": lambda data, start, end: header_name.extend(data[start:end]),
+            "on_header_value": lambda data, start, end: header_value.extend(data[start:end]),
+            "on_header_end": on_header_end,
+            "on_headers_finished": lambda: events.append(("headers", None)),
+            "on_part_data": lambda data, start, end: events.append(("data", data[start:end])),
+            "on_part_end": lambda: events.append(("end", None))
+        })
+
+        received: List[StoredUpload] = []
+        disposition = b""
+        current: Optional[StoredUpload] = None
+        out = None
+        digest = None
+        try:
+            async with self.slot():
+                async for chunk in chunks:
+                    try:
+                        parser.write(chunk)
+                    except Exception as e:
+                        raise UploadError(f"Malformed multipart body: {e}")
+                    for event, value in events:
+                        if event == "begin":
+                            disposition = b""
+                        elif event == "header" and value[0] == b"content-disposition":
+                            disposition = value[1]
+                        elif event == "headers":
+                            _, options = parse_options_header(disposition)
+                            if b"filename" in options:
+                                file_name = self._safe_name(options[b"filename"].decode("utf-8", "replace"))
+                                current = StoredUpload(
+                                    file_name=file_name,
+                                    temp_path=self.partial_dir / f"{uuid.uuid4().hex}.part",
+                                    doc_id="",
+                                    size=0
+                                )
+                                received.append(current)
+                                digest = hashlib.sha256()
+                                out = await aiofiles.open(current.temp_path, "wb")
+                        elif event == "data" and current is not None:
+                            current.size += len(value)
+                            if current.size > self.max_bytes:
+                                raise UploadTooLargeError(
+                                    f"{current.file_name} exceeds the {self.max_bytes} byte upload limit"
+                                )
+                            await out.write(value)
+                            digest.update(value)
+                        elif event == "end" and current is not None:
+                            await out.close()
+                            out = None
+                            current.doc_id = digest.hexdigest()
+                            current = None
+                    events.clear()
+                try:
+                    parser.finalize()
+                except Exception as e:
+                    raise UploadError(f"Malformed multipart body: {e}")
+                if current is not None:
+                    raise UploadError("Multipart body ended in the middle of a file")
+        except BaseException:
+            if out is not None:
+                await out.close()
+            for stored in received:
+                await self._remove(stored.temp_path)
+            raise
+        if not received:
+            raise UploadError("No file was uploaded")
+        return received
+
+    async def commit(self, stored: StoredUpload) -> Path:
+        """
+        Moves a received upload into the upload directory, under its document ID.
+
+        Uploads that share a file name but not their content get separate
+        paths, so committing one never changes the bytes behind another that
+        is still queued or being parsed.
+        """
+        final_dir = self.upload_dir / stored.doc_id
+        await aiofiles.os.makedirs(final_dir, exist_ok=True)
+        final_path = final_dir / stored.file_name
+        await aiofiles.os.rename(stored.temp_path, final_path)
+        return final_path
+
+    async def discard(self, stored: StoredUpload) -> None:
+        await self._remove(stored.temp_path)
+
+    async def remove_file(self, file_path: str) -> bool:
+        """Deletes a committed upload; paths outside the upload directory are left alone."""
+        path = Path(file_path)
+        parent = path.parent.resolve()
+        upload_dir = self.upload_dir.resolve()
+        # Uploads live in a per-document directory; older ones directly in the upload directory
+        in_document_dir = parent.parent == upload_dir and parent != self.partial_dir.resolve()
+        if parent != upload_dir and not in_document_dir:
+            return False
+        await self._remove(path)
+        if in_document_dir:
+            try:
+                await aiofiles.os.rmdir(parent)
+            except OSError:
+                # Still holds the same content under another file name
+                pass
+        logger.info(f"Removed uploaded file {path}")
+        return True
+
+    def create_session(self, file_name: str, total_bytes: Optional[int] = None) -> UploadSession:
+        """Starts a resumable upload."""
+        if total_bytes is not None and total_bytes > self.max_bytes:
+            raise UploadTooLargeError(f"{file_name} exceeds the {self.max_bytes} byte upload limit")
+        session = UploadSession(
+            upload_id=uuid.uuid4().hex,
+            file_name=self._safe_name(file_name),
+            total_bytes=total_bytes,
+            created_at=time.time()
+        )
+        self._part_path(session.upload_id).touch()
+        self._meta_path(session.upload_id).write_text(json.dumps({
+            "file_name": session.file_name,
+            "total_bytes": session.total_bytes,
+            "created_at": session.created_at
+        }))
+        self._sessions[session.upload_id] = session
+        self._digests[session.upload_id] = hashlib.sha256()
+        logger.info(f"Created upload session {session.upload_id} for {session.file_name}")
+        return session
+
+    def get_session(self, upload_id: str) -> UploadSession:
+        session = self._sessions.get(upload_id)
+        if session is None:
+            raise UploadSessionNotFoundError(f"Upload session {upload_id} not found")
+        return session
+
+    async def append(self, upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> UploadSession:
+        """
+        Appends one part to a session.
+
+        Parts must arrive in order: offset has to equal the bytes received so
+        far, otherwise UploadSessionError tells the client where to resume.
+        Bytes written before a dropped connection are kept.
+        """
+        session = self.get_session(upload_id)
+        async with self._session_lock(upload_id), self.slot():
+            if offset != session.received_bytes:
+                raise UploadSessionError(
+                    f"Upload {upload_id} expects offset {session.received_bytes}, got {offset}"
+                )
+            digest = await self._session_digest(session)
+            limit = min(self.max_bytes, session.total_bytes or self.max_bytes)
+            async with aiofiles.open(self._part_path(upload_id), "ab") as out:
+                async for chunk in chunks:
+                    if not chunk:
+                        continue
+                    if session.received_bytes + len(chunk) > limit:
+                        raise UploadTooLargeError(f"Upload {upload_id} exceeds {limit} bytes")
+                    await out.write(chunk)
+                    digest.update(chunk)
+                    session.received_bytes += len(chunk)
+        return session
+
+    async def complete(self, upload_id: str) -> StoredUpload:
+        """Finishes a session and returns it as a received upload."""
+        session = self.get_session(upload_id)
+        async with self._session_lock(upload_id):
+            if session.total_bytes is not None and session.received_bytes != session.total_bytes:
+                raise UploadSessionError(
+                    f"Upload {upload_id} is incomplete: {session.received_bytes} of {session.total_bytes} bytes"
+                )
+            digest = await self._session_digest(session)
+            self._forget(upload_id)
+            await self._remove(self._meta_path(upload_id))
+        logger.info(f"Completed upload session {upload_id} ({session.received_bytes} bytes)")
+        return StoredUpload(
+            file_name=session.file_name,
+            temp_path=self._part_path(upload_id),
+            doc_id=digest.hexdigest(),
+            size=session.received_bytes
+        )
+
+    async def abort(self, upload_id: str) -> None:
+        self.get_session(upload_id)
+        async with self._session_lock(upload_id):
+            self._forget(upload_id)
+            await self._remove(self._part_path(upload_id))
+            await self._remove(self._meta_path(upload_id))
+        logger.info(f"Aborted upload session {upload_id}")
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "active_uploads": self._active,
+            "max_concurrent": self.max_concurrent,
+            "sessions": len(self._sessions)
+        }
+
+    @asynccontextmanager
+    async def slot(self):
+        """Holds one of the concurrent upload slots."""
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise UploadLimitError(f"Too many concurrent uploads (limit {self.max_concurrent}), please retry later")
+        self._active += 1
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._semaphore.release()
+
+    def _session_lock(self, upload_id: str) -> asyncio.Lock:
+        lock = self._session_locks.get(upload_id)
+        if lock is None:
+            lock = self._session_locks[upload_id] = asyncio.Lock()
+        return lock
+
+    async def _session_digest(self, session: UploadSession) -> "hashlib._Hash":
+        """Returns the running hash, rebuilding it from the part file after a restart."""
+        digest = self._digests.get(session.upload_id)
+        if digest is None:
+            digest = hashlib.sha256()
+            async with aiofiles.open(self._part_path(session.upload_id), "rb") as f:
+                while True:
+                    chunk = await f.read(self.chunk_bytes)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+            self._digests[session.upload_id] = digest
+        return digest
+
+    def _forget(self, upload_id: str) -> None:
+        self._sessions.pop(upload_id, None)
+        self._digests.pop(upload_id, None)
+        self._session_locks.pop(upload_id, None)
+
+    def _load_sessions(self) -> None:
+        """Restores resumable sessions from disk and removes expired or orphaned staging files."""
+        now = time.time()
+        for meta_path in self.partial_dir.glob("*.json"):
+            upload_id = meta_path.stem
+            part_path = self._part_path(upload_id)
+            try:
+                meta = json.loads(meta_path.read_text())
+            except (OSError, json.JSONDecodeError):
+                meta = None
+            if meta is None or not part_path.exists() or now - meta["created_at"] > self.session_ttl_seconds:
+                meta_path.unlink(missing_ok=True)
+                part_path.unlink(missing_ok=True)
+                continue
+            self._sessions[upload_id] = UploadSession(
+                upload_id=upload_id,
+                file_name=meta["file_name"],
+                total_bytes=meta["total_bytes"],
+                received_bytes=part_path.stat().st_size,
+                created_at=meta["created_at"]
+            )
+        for part_path in self.partial_dir.glob("*.part"):
+            if part_path.stem not in self._sessions:
+                part_path.unlink(missing_ok=True)
+        if self._sessions:
+            logger.info(f"Restored {len(self._sessions)} resumable upload sessions")
+
+    def _part_path(self, upload_id: str) -> Path:
+        return self.partial_dir / f"{upload_id}.part"
+
+    def _meta_path(self, upload_id: str) -> Path:
+        return self.partial_dir / f"{upload_id}.json"
+
+    @staticmethod
+    def _safe_name(file_name: Optional[str]) -> str:
+        """Strips any directory components a client may have sent."""
+        name = Path(file_name or "").name
+        if not name or name in (".", ".."):
+            raise UploadError("A file name is required")
+        return name
+
+    @staticmethod
+    async def _remove(path: Path) -> None:
+        try:
+            await aiofiles.os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,438 @@
+# src/ingest.py
+"""
+Bulk document loader.
+
+    python -m src.ingest Test_Docs/
+    python -m src.ingest "archive/**/*.pdf" --batch-size 512
+    python -m src.ingest --manifest files.txt
+
+Files are hashed, parsed and split in worker processes, embedded in
+batches and written to the vector store in separate stages connected by
+bounded queues, so the stages overlap. Chunks are streamed out of the
+workers in batches, so memory stays bounded even for very large documents. Finished
+files are appended to a checkpoint so an interrupted run picks up where it
+stopped; files whose content is already stored are skipped.
+"""
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from src.core.config import settings
+from src.core.logging_config import setup_logging
+from src.rag.document_processor import DocumentProcessor, compute_file_hash
+from src.rag.parse_workers import init_parse_worker, next_batch, stream_document
+from src.rag.vector_store import VectorStoreManager
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def discover_files(inputs: List[str], manifest: Optional[str], supported_formats: List[str]) -> Iterator[Path]:
+    """Yields supported files from directories, glob patterns, plain paths and a manifest, each once."""
+    def candidates() -> Iterator[Path]:
+        for item in inputs:
+            path = Path(item)
+            if path.is_dir():
+                yield from sorted(p for p in path.rglob("*") if p.is_file())
+            elif glob.has_magic(item):
+                yield from (Path(p) for p in sorted(glob.glob(item, recursive=True)))
+            else:
+                yield path
+        if manifest:
+            manifest_path = Path(manifest)
+            with open(manifest_path) as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        path = Path(line)
+                        yield path if path.is_absolute() else manifest_path.parent / path
+
+    seen = set()
+    for path in candidates():
+        path = path.resolve()
+        if path in seen or path.suffix.lower() not in supported_formats:
+            continue
+        seen.add(path)
+        if path.is_file():
+            yield path
+        else:
+            logger.warning(f"Skipping missing file: {path}")
+
+
+class Checkpoint:
+    """
+    Append-only JSON-lines log of files a bulk run has finished.
+
+    Entries carry the file size and mtime, so unchanged files are skipped
+    on the next run without hashing them again.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._done: Dict[str, Tuple[int, int]] = {}
+        if self.path.exists():
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Torn last line from an interrupted run
+                    if entry.get("status") == "done":
+                        self._done[entry["path"]] = (entry["size"], entry["mtime_ns"])
+                    else:
+                        self._done.pop(entry["path"], None)
+        self._file = open(self.path, "a")
+
+    def __len__(self) -> int:
+        return len(self._done)
+
+    def is_done(self, path: Path, stat: os.stat_result) -> bool:
+        return self._done.get(str(path)) == (stat.st_size, stat.st_mtime_ns)
+
+    def record(self, path: Path, stat: os.stat_result, status: str, doc_id: Optional[str] = None, chunks: int = 0) -> None:
+        entry = {
+            "path": str(path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "status": status,
+            "doc_id": doc_id,
+            "chunks": chunks
+        }
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        if status == "done":
+            self._done[str(path)] = (stat.st_size, stat.st_mtime_ns)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+@dataclass
+class _FileState:
+    path: Path
+    stat: os.stat_result
+    doc_id: str
+    metadata: Optional[Dict[str, Any]] = None
+    chunk_count: int = 0
+    failed: bool = False
+    # Chunks this run added, which is all a failure may remove; chunks kept
+    # from an earlier revision are only taken over once the file is done
+    added_ids: List[str] = field(default_factory=list)
+    kept: List[Tuple[str, Dict[str, Any]]] = field(default_factory=list)
+
+
+@dataclass
+class _Progress:
+    started: float
+    files: int = 0
+    skipped: int = 0
+    failed: int = 0
+    chunks: int = 0
+    batches: int = 0
+    embed_seconds: float = 0.0
+
+    def line(self) -> str:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        embed_ms = self.embed_seconds * 1000 / self.batches if self.batches else 0.0
+        return (
+            f"{self.files} files ({self.files / elapsed:.2f} files/s), "
+            f"{self.chunks} chunks ({self.chunks / elapsed:.1f} chunks/s), "
+            f"embed {embed_ms:.0f} ms/batch, {self.skipped} skipped, {self.failed} failed"
+        )
+
+
+# Entries flowing from the parse stage to the writer: a chunk, or a marker
+# (chunk_id None) sent after a file's last chunk
+_Entry = Tuple[_FileState, Optional[str], Optional[Document]]
+
+
+class BulkIngester:
+    """
+    Runs the hash/parse, embed and write stages of a bulk load concurrently.
+
+    Worker processes send each file's chunks back in batches through bounded
+    queues as they are produced, so memory is bounded by the batch and queue
+    sizes, not by the size of the largest document.
+    """
+
+    def __init__(
+        self,
+        vector_store: VectorStoreManager,
+        document_processor: DocumentProcessor,
+        checkpoint: Checkpoint,
+        parse_workers: int,
+        batch_size: int,
+        queue_size: int,
+        report_every: float = 5.0
+    ):
+        self.vector_store = vector_store
+        self.document_processor = document_processor
+        self.checkpoint = checkpoint
+        self.parse_workers = parse_workers
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.report_every = report_every
+        self.progress = _Progress(started=time.perf_counter())
+        self._relays: Optional[asyncio.Queue] = None
+
+    async def run(self, files: Iterator[Path]) -> _Progress:
+        chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        write_queue: asyncio.Queue = asyncio.Queue(maxsize=2)
+        # Use "spawn" so workers don't inherit the parent's model threads
+        mp_context = multiprocessing.get_context("spawn")
+        process_pool = ProcessPoolExecutor(
+            max_workers=self.parse_workers,
+            mp_context=mp_context,
+            initializer=init_parse_worker,
+            initargs=(
+                self.document_processor.chunk_size,
+                self.document_processor.chunk_overlap,
+                self.document_processor.supported_formats
+            )
+        )
+        parse_slots = self.parse_workers * 2
+        manager = mp_context.Manager()
+        # One bounded relay queue per file being parsed, reused across files
+        self._relays = asyncio.Queue()
+        for _ in range(parse_slots):
+            self._relays.put_nowait(manager.Queue(maxsize=2))
+        io_pool = ThreadPoolExecutor(max_workers=parse_slots, thread_name_prefix="ingest-io")
+        embed_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-embed")
+        write_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-write")
+        stages = [
+            asyncio.create_task(self._parse_stage(files, chunk_queue, process_pool, io_pool)),
+            asyncio.create_task(self._embed_stage(chunk_queue, write_queue, embed_pool)),
+            asyncio.create_task(self._write_stage(write_queue, write_pool)),
+            asyncio.create_task(self._report())
+        ]
+        try:
+            # A failing stage raises here instead of leaving the others blocked on a full queue
+            await asyncio.gather(*stages[:3])
+        finally:
+            for task in stages:
+                task.cancel()
+            process_pool.shutdown(wait=False, cancel_futures=True)
+            for pool in (io_pool, embed_pool, write_pool):
+                pool.shutdown(wait=False, cancel_futures=True)
+            manager.shutdown()
+        return self.progress
+
+    async def _parse_stage(self, files: Iterator[Path], chunk_queue: asyncio.Queue, process_pool, io_pool) -> None:
+        """Hashes and parses files, a few at a time so results can't pile up ahead of embedding."""
+        slots = asyncio.Semaphore(self.parse_workers * 2)
+        tasks = set()
+        for path in files:
+            await slots.acquire()
+            task = asyncio.create_task(self._parse_file(path, chunk_queue, process_pool, io_pool))
+            task.add_done_callback(lambda done: slots.release())
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+        await chunk_queue.put(None)
+
+    async def _parse_file(self, path: Path, chunk_queue: asyncio.Queue, process_pool, io_pool) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            stat = path.stat()
+        except OSError as e:
+            logger.error(f"Cannot read {path}: {e}")
+            self.progress.failed += 1
+            return
+        if self.checkpoint.is_done(path, stat):
+            self.progress.skipped += 1
+            return
+        try:
+            doc_id = await loop.run_in_executor(io_pool, compute_file_hash, str(path))
+        except OSError as e:
+            logger.error(f"Cannot read {path}: {e}")
+            self.checkpoint.record(path, stat, "failed")
+            self.progress.failed += 1
+            return
+        if self.vector_store.document_registry.get(doc_id) is not None:
+            self.checkpoint.record(path, stat, "done", doc_id)
+            self.progress.skipped += 1
+            return
+
+        state = _FileState(path, stat, doc_id)
+        relay = await self._relays.get()
+        try:
+            future = process_pool.submit(stream_document, str(path), self.batch_size, relay, doc_id)
+            occurrences: Dict[str, int] = {}
+            while True:
+                chunks = await loop.run_in_executor(io_pool, next_batch, relay, future)
+                if chunks is None:
+                    break
+                if state.metadata is None:
+                    state.metadata = dict(chunks[0].metadata)
+                state.chunk_count += len(chunks)
+                await chunk_queue.put((state, VectorStoreManager._chunk_ids(chunks, occurrences), chunks))
+            try:
+                await asyncio.wrap_future(future)
+            except Exception as e:
+                logger.error(f"Failed to parse {path}: {e}")
+                state.failed = True
+        finally:
+            self._relays.put_nowait(relay)
+        await chunk_queue.put((state, None, None))
+
+    async def _embed_stage(self, chunk_queue: asyncio.Queue, write_queue: asyncio.Queue, embed_pool) -> None:
+        """Collects chunks from any number of files into fixed-size batches and embeds them."""
+        loop = asyncio.get_running_loop()
+        pending: List[_Entry] = []
+        pending_chunks = 0
+        while True:
+            item = await chunk_queue.get()
+            if item is not None:
+                state, chunk_ids, chunks = item
+                if chunk_ids is None:
+                    pending.append((state, None, None))
+                else:
+                    pending.extend((state, chunk_id, chunk) for chunk_id, chunk in zip(chunk_ids, chunks))
+                    pending_chunks += len(chunks)
+            while pending_chunks >= self.batch_size or (item is None and pending):
+                current, pending = _take_batch(pending, self.batch_size)
+                texts = [chunk.page_content for _, chunk_id, chunk in current if chunk_id is not None]
+                pending_chunks -= len(texts)
+                embeddings = []
+                if texts:
+                    started = time.perf_counter()
+                    embeddings = await loop.run_in_executor(
+                        embed_pool, self.vector_store.embedding_function.embed_documents, texts
+                    )
+                    self.progress.embed_seconds += time.perf_counter() - started
+                    self.progress.batches += 1
+                await write_queue.put((current, embeddings))
+            if item is None:
+                await write_queue.put(None)
+                return
+
+    async def _write_stage(self, write_queue: asyncio.Queue, write_pool) -> None:
+        """Writes embedded batches and registers each file once its end marker arrives."""
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await write_queue.get()
+            if item is None:
+                return
+            batch, embeddings = item
+            by_file: Dict[int, Tuple[_FileState, List[str], List[Document], List[List[float]]]] = {}
+            chunks = [(state, chunk_id, chunk) for state, chunk_id, chunk in batch if chunk_id is not None]
+            for (state, chunk_id, chunk), embedding in zip(chunks, embeddings):
+                group = by_file.setdefault(id(state), (state, [], [], []))
+                group[1].append(chunk_id)
+                group[2].append(chunk)
+                group[3].append(embedding)
+            for state, chunk_ids, documents, file_embeddings in by_file.values():
+                written = await loop.run_in_executor(
+                    write_pool, self.vector_store.write_document_batch, chunk_ids, documents, file_embeddings
+                )
+                state.added_ids.extend(written["added"])
+                state.kept.extend(written["kept"])
+            self.progress.chunks += len(chunks)
+            # Markers follow their file's last chunk, so every chunk of the file is stored by now
+            for state, chunk_id, _ in batch:
+                if chunk_id is None:
+                    await loop.run_in_executor(write_pool, self._finish_file, state)
+
+    def _finish_file(self, state: _FileState) -> None:
+        if state.failed:
+            # Don't leave a partly written document behind; an earlier revision
+            # of the file was never touched and stays as it was
+            if state.added_ids:
+                self.vector_store.delete_chunks(state.added_ids)
+            self.checkpoint.record(state.path, state.stat, "failed", state.doc_id)
+            self.progress.failed += 1
+            return
+        if state.chunk_count:
+            self.vector_store.finish_document(state.doc_id, state.metadata, state.chunk_count, state.kept)
+        self.checkpoint.record(state.path, state.stat, "done", state.doc_id, state.chunk_count)
+        self.progress.files += 1
+
+    async def _report(self) -> None:
+        while True:
+            await asyncio.sleep(self.report_every)
+            print(self.progress.line(), flush=True)
+
+
+def _take_batch(pending: List[_Entry], size: int) -> Tuple[List[_Entry], List[_Entry]]:
+    """Splits off up to size chunks, plus any end markers that directly follow them."""
+    taken = 0
+    end = 0
+    while end < len(pending) and (pending[end][1] is None or taken < size):
+        if pending[end][1] is not None:
+            taken += 1
+        end += 1
+    return pending[:end], pending[end:]
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m src.ingest", description="Bulk-load documents into the vector store.")
+    parser.add_argument("inputs", nargs="*", help="Directories, files or glob patterns (quote them) to ingest")
+    parser.add_argument("--manifest", help="File listing one path per line, relative to the manifest")
+    parser.add_argument("--checkpoint", help="Checkpoint file; defaults to ingest_checkpoint.jsonl in the vector store directory")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and reconsider every file")
+    parser.add_argument("--parse-workers", type=int, default=settings.ingestion.parse_workers)
+    parser.add_argument("--batch-size", type=int, default=settings.ingestion.batch_size, help="Chunks per embedding batch")
+    parser.add_argument("--queue-size", type=int, default=settings.ingestion.queue_size, help="Chunk batches waiting for embedding")
+    parser.add_argument("--report-every", type=float, default=5.0, help="Seconds between progress lines")
+    args = parser.parse_args(argv)
+    if not args.inputs and not args.manifest:
+        parser.error("give at least one input or --manifest")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    setup_logging()
+    vector_store_dir = PROJECT_ROOT / settings.chroma_db_path
+    vector_store = VectorStoreManager(
+        persist_directory=str(vector_store_dir),
+        embedding_cache_path=str(PROJECT_ROOT / settings.embedding_cache.path)
+    )
+    document_processor = DocumentProcessor()
+    checkpoint_path = Path(args.checkpoint) if args.checkpoint else vector_store_dir / "ingest_checkpoint.jsonl"
+    if args.restart and checkpoint_path.exists():
+        checkpoint_path.unlink()
+    checkpoint = Checkpoint(checkpoint_path)
+    if len(checkpoint):
+        print(f"Resuming from {checkpoint_path} ({len(checkpoint)} files already done)", flush=True)
+
+    ingester = BulkIngester(
+        vector_store,
+        document_processor,
+        checkpoint,
+        parse_workers=args.parse_workers,
+        batch_size=args.batch_size,
+        queue_size=args.queue_size,
+        report_every=args.report_every
+    )
+    files = discover_files(args.inputs, args.manifest, document_processor.supported_formats)
+    try:
+        progress = asyncio.run(ingester.run(files))
+    except KeyboardInterrupt:
+        print(f"Interrupted: {ingester.progress.line()}", flush=True)
+        print("Run the same command again to resume", flush=True)
+        return 130
+    finally:
+        checkpoint.close()
+        vector_store.keyword_index.save()
+    print(f"Done: {progress.line()}", flush=True)
+    return 1 if progress.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
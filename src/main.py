@@ -1,34 +1,41 @@
 # src/main.py
-import sys
-print(f"Running main.py from: {__file__}")
-print(f"Python path: {sys.path}")
-
+import asyncio
+import json
 import logging
-import os
+import shutil
+import time
+from contextlib import aclosing
+from dataclasses import asdict
 from pathlib import Path
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 import uvicorn
-from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks, Depends, Security
+from fastapi import FastAPI, HTTPException, Depends, Request, Query
+from fastapi.responses import Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
 from src.core.config import settings
+from src.core import metrics
 from src.core.logging_config import setup_logging
 from src.rag.document_processor import DocumentProcessor
 from src.rag.vector_store import VectorStoreManager
+from src.rag.document_registry import SORT_COLUMNS
 from src.rag.query_engine import RAGQueryEngine
+from src.rag.ingestion import IngestionPipeline, IngestionJob
 from src.api.routers import system, auth, web
 from src.api.error_handlers import register_exception_handlers
 from src.core.ollama_client import OllamaClient
+from src.core.client_registry import client_registry
+from src.core.model_catalog import ModelCatalog
+from src.core.uploads import UploadManager, StoredUpload
 from src.core.text_generation import TextGenerationService
-from src.api.dependencies import get_ollama_client, get_text_gen_service, get_auth_dependency
-from src.api.models.requests import QueryRequest
-from src.api.models.responses import QueryResponse, DocumentListResponse, DocumentUploadResponse
-from src.core.exceptions import DocumentProcessingError, QueryError
+from src.api.dependencies import get_auth_dependency, get_vector_store, get_query_engine, wait_until_ready
+from src.api.models.requests import QueryRequest, UploadSessionRequest
+from src.api.models.responses import QueryResponse, DocumentListResponse, DocumentUploadResponse, UploadSessionResponse
+from src.core.exceptions import QueryError, ModelBusyError, UploadError, DocumentNotFoundError
 
 # Setup logging
 setup_logging()
@@ -58,11 +65,58 @@ app.add_middleware(
 # Register exception handlers
 register_exception_handlers(app)
 
+class HTTPMetricsMiddleware:
+    """
+    Records request counts and latency per route template.
+
+    A plain ASGI middleware rather than @app.middleware("http"), so the timer
+    stops when the last body message is sent instead of when the response
+    starts. Server-Sent Events responses last as long as the answer is
+    generated, so they go to a separate histogram.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        finished = None
+        status_code = 500
+        streaming = False
+
+        async def send_and_observe(message):
+            nonlocal finished, status_code, streaming
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                content_type = dict(message.get("headers", [])).get(b"content-type", b"")
+                streaming = content_type.startswith(b"text/event-stream")
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finished = time.perf_counter()
+
+        try:
+            await self.app(scope, receive, send_and_observe)
+        finally:
+            # The matched route is only known once routing has run
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            duration = (finished or time.perf_counter()) - started
+            metrics.HTTP_REQUESTS.labels(scope["method"], path, str(status_code)).inc()
+            latency = metrics.HTTP_STREAM_DURATION if streaming else metrics.HTTP_LATENCY
+            latency.labels(scope["method"], path).observe(duration)
+
+app.add_middleware(HTTPMetricsMiddleware)
+
 # --- Use settings for paths, and make them ABSOLUTE ---
 PROJECT_ROOT = Path(__file__).resolve().parent.parent  # /home/cqhoward/Metis_1
 UPLOAD_DIR = PROJECT_ROOT / settings.uploads_dir
 VECTOR_STORE_DIR = PROJECT_ROOT / settings.chroma_db_path
 CHAT_HISTORY_DIR = PROJECT_ROOT / settings.chat_histories_dir
+EMBEDDING_CACHE_PATH = PROJECT_ROOT / settings.embedding_cache.path
 
 # Ensure directories exist
 for directory in [UPLOAD_DIR, VECTOR_STORE_DIR, CHAT_HISTORY_DIR]:
@@ -73,36 +127,126 @@ for directory in [UPLOAD_DIR, VECTOR_STORE_DIR, CHAT_HISTORY_DIR]:
 async def startup_event():
     """Initialize components on startup."""
     logger.info("Starting application...")
-    app.state.ollama_client = OllamaClient()
+    app.state.client_registry = client_registry
+    app.state.ollama_client = OllamaClient(http_client=client_registry.http_client)
+    app.state.model_catalog = ModelCatalog(
+        app.state.ollama_client,
+        ttl_seconds=settings.ollama.model_catalog_ttl,
+        refresh_interval=settings.ollama.model_catalog_refresh_interval
+    )
+    app.state.model_catalog.start()
     app.state.text_generation_service = TextGenerationService(
-        ollama_client=app.state.ollama_client
+        ollama_client=app.state.ollama_client,
+        client_registry=client_registry,
+        model_catalog=app.state.model_catalog
     )
+    if settings.ollama.preload_models:
+        app.state.preload_task = asyncio.create_task(
+            app.state.text_generation_service.preload_models(settings.ollama.preload_models)
+        )
     app.state.document_processor = DocumentProcessor()
-    app.state.vector_store = VectorStoreManager(persist_directory=str(VECTOR_STORE_DIR))
-    app.state.query_engine = RAGQueryEngine(
-        vector_store=app.state.vector_store,
-        text_generation_service=app.state.text_generation_service
+    app.state.upload_manager = UploadManager(
+        str(UPLOAD_DIR),
+        max_bytes=settings.uploads.max_bytes,
+        max_concurrent=settings.uploads.max_concurrent,
+        chunk_bytes=settings.uploads.chunk_bytes,
+        queue_timeout=settings.uploads.queue_timeout,
+        session_ttl_seconds=settings.uploads.session_ttl_hours * 3600,
+        max_request_bytes=settings.uploads.max_request_bytes
+    )
+
+    # The embedding model and Chroma take seconds to load, so the server starts
+    # accepting requests right away and they are loaded in the background
+    app.state.ready = asyncio.Event()
+    app.state.warmup_error = None
+    app.state.warmup_task = asyncio.create_task(_warm_up())
+    logger.info("Initialized application components, warming up in the background")
+
+async def _warm_up():
+    """Loads the vector store, embedding model and query engine, then marks the app ready."""
+    started = time.perf_counter()
+    try:
+        app.state.vector_store = await asyncio.to_thread(
+            VectorStoreManager,
+            persist_directory=str(VECTOR_STORE_DIR),
+            embedding_cache_path=str(EMBEDDING_CACHE_PATH)
+        )
+        # Runs the model once so the first query doesn't pay for lazy initialization
+        await asyncio.to_thread(app.state.vector_store.embed_query, "warmup")
+        app.state.query_engine = await asyncio.to_thread(
+            RAGQueryEngine,
+            vector_store=app.state.vector_store,
+            text_generation_service=app.state.text_generation_service,
+            chat_histories_dir=str(CHAT_HISTORY_DIR)
+        )
+        app.state.ingestion_pipeline = IngestionPipeline(
+            document_processor=app.state.document_processor,
+            vector_store=app.state.vector_store,
+            upload_manager=app.state.upload_manager
+        )
+        await app.state.ingestion_pipeline.start()
+        _register_metric_sources()
+        logger.info(f"Warmup finished in {time.perf_counter() - started:.1f}s, ready to serve queries")
+    except Exception as e:
+        app.state.warmup_error = str(e)
+        logger.error(f"Warmup failed: {e}", exc_info=True)
+    finally:
+        # Waiting requests are released either way; they fail fast if warmup failed
+        app.state.ready.set()
+
+def _register_metric_sources():
+    """Exposes component stats on /metrics; they are only read when scraped."""
+    query_engine = app.state.query_engine
+    vector_store = app.state.vector_store
+    metrics.component_stats.add_source(
+        "generation", lambda: {"queue": query_engine.text_generation_service.get_queue_stats()}
     )
-    logger.info("Initialized application components")
+    metrics.component_stats.add_source("ingestion", app.state.ingestion_pipeline.get_stats)
+    metrics.component_stats.add_source("uploads", app.state.upload_manager.get_stats)
+    metrics.component_stats.add_source("documents", lambda: vector_store.document_registry.get_stats())
+    metrics.component_stats.add_source("coalescing", query_engine.single_flight.get_stats)
+    metrics.component_stats.add_source("model_catalog", app.state.model_catalog.get_stats)
+    metrics.component_stats.add_source("reranker", query_engine.reranker.get_stats)
+    if query_engine.answer_cache:
+        metrics.component_stats.add_source("answer_cache", query_engine.answer_cache.get_stats)
+    if vector_store.embedding_cache:
+        metrics.component_stats.add_source("embedding_cache", vector_store.embedding_cache.get_stats)
+    if query_engine.history_compactor:
+        metrics.component_stats.add_source("history_compaction", query_engine.history_compactor.get_stats)
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown."""
     logger.info("Shutting down application...")
-    await app.state.ollama_client.close()
-    logger.info("Closed OllamaClient connection")
+    if not app.state.warmup_task.done():
+        app.state.warmup_task.cancel()
+    if getattr(app.state, "ingestion_pipeline", None):
+        await app.state.ingestion_pipeline.stop()
+    if getattr(app.state, "query_engine", None) and app.state.query_engine.history_compactor:
+        await app.state.query_engine.history_compactor.close()
+    if getattr(app.state, "preload_task", None):
+        app.state.preload_task.cancel()
+    await app.state.model_catalog.stop()
+    await app.state.client_registry.close()
+    logger.info("Closed Ollama client connections")
 
-# Dependencies for endpoints
+# Dependencies for endpoints; components loaded during warmup wait for it to finish
 def get_document_processor() -> DocumentProcessor:
     return app.state.document_processor
 
-def get_vector_store() -> VectorStoreManager:
-    return app.state.vector_store
+def get_upload_manager() -> UploadManager:
+    return app.state.upload_manager
 
-def get_query_engine() -> RAGQueryEngine:
-    return app.state.query_engine
+async def get_ingestion_pipeline() -> IngestionPipeline:
+    await wait_until_ready(app)
+    return app.state.ingestion_pipeline
 
 # --- Include Routers ---
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus metrics in the text exposition format."""
+    return Response(content=metrics.render_metrics(), media_type=metrics.CONTENT_TYPE_LATEST)
+
 app.include_router(system.router, prefix="/system", tags=["System"])
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 
@@ -117,53 +261,186 @@ app.include_router(web.router, prefix="/ui", tags=["Web UI"])
 auth_dependency = get_auth_dependency()
 
 # --- API Endpoints ---
-@app.post("/upload", response_model=DocumentUploadResponse, dependencies=[Depends(auth_dependency)] if auth_dependency else [])
+def _multipart_body(field: str, multiple: bool) -> dict:
+    """OpenAPI request body for endpoints that stream their multipart form themselves."""
+    file_schema = {"type": "string", "format": "binary"}
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"multipart/form-data": {"schema": {
+                "type": "object",
+                "properties": {field: {"type": "array", "items": file_schema} if multiple else file_schema},
+                "required": [field]
+            }}}
+        }
+    }
+
+async def _receive_files(request: Request, upload_manager: UploadManager) -> List[StoredUpload]:
+    """
+    Stages the files of a multipart request.
+
+    The form is parsed here rather than by FastAPI, which would spool the
+    whole body to disk before the size and concurrency limits could apply.
+    """
+    upload_manager.check_request_size(request.headers.get("content-length"))
+    return await upload_manager.receive_multipart(request.headers.get("content-type", ""), request.stream())
+
+@app.post(
+    "/upload",
+    response_model=DocumentUploadResponse,
+    dependencies=[Depends(auth_dependency)] if auth_dependency else [],
+    openapi_extra=_multipart_body("files", multiple=True)
+)
 async def upload_documents(
-    background_tasks: BackgroundTasks,
-    files: List[UploadFile] = File(...)
+    request: Request,
+    upload_manager: UploadManager = Depends(get_upload_manager),
+    ingestion_pipeline: IngestionPipeline = Depends(get_ingestion_pipeline),
+    vector_store: VectorStoreManager = Depends(get_vector_store)
 ):
-    """Upload and process documents for RAG."""
+    """Upload documents and queue new or changed ones for processing."""
     try:
+        received = await _receive_files(request, upload_manager)
         document_ids = []
-        for file in files:
-            file_path = UPLOAD_DIR / file.filename
-            with open(file_path, "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
-            document_ids.append(str(file_path))
-            # CORRECT: Pass only the function name and the file_path
-            background_tasks.add_task(process_document, str(file_path))
-
-        logger.info(f"Uploaded {len(files)} documents")
+        job_ids = []
+        duplicates = []
+        try:
+            for stored in received:
+                document_ids.append(stored.doc_id)
+                job_id = await _queue_upload(stored, upload_manager, ingestion_pipeline, vector_store)
+                if job_id is None:
+                    duplicates.append(stored.doc_id)
+                else:
+                    job_ids.append(job_id)
+        except BaseException:
+            # Files already moved into place are left alone; the rest are dropped
+            for stored in received:
+                await upload_manager.discard(stored)
+            raise
+
+        logger.info(f"Uploaded {len(document_ids)} documents, {len(duplicates)} unchanged")
         return DocumentUploadResponse(
             message="Documents uploaded and queued for processing",
-            num_processed=len(files),
-            document_ids=document_ids
+            num_processed=len(document_ids),
+            document_ids=document_ids,
+            job_ids=job_ids,
+            duplicates=duplicates
         )
+    except UploadError:
+        raise
     except Exception as e:
         logger.error(f"Error uploading documents: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
-# CORRECT: Use FastAPI's dependency injection within the background task
-async def process_document(file_path: str):
-    """Process a document and add it to the vector store."""
-    document_processor = get_document_processor()  # Get instances directly
-    vector_store = get_vector_store()             # Get instances directly
-    try:
-        logger.info(f"Starting to process document: {file_path}")
-        chunks = document_processor.process_single_document(file_path)
-        if not chunks:
-            logger.warning(f"No chunks generated for document: {file_path}")
-            return
+async def _queue_upload(
+    stored: StoredUpload,
+    upload_manager: UploadManager,
+    ingestion_pipeline: IngestionPipeline,
+    vector_store: VectorStoreManager,
+    replaces: Optional[str] = None
+) -> Optional[str]:
+    """Moves a received file into place and queues it; returns None if its content is already stored."""
+    if await asyncio.to_thread(vector_store.has_document, stored.doc_id):
+        logger.info(f"Skipping {stored.file_name}: content already stored as {stored.doc_id}")
+        await upload_manager.discard(stored)
+        if replaces and replaces != stored.doc_id:
+            # Identical content is already stored under its own ID, so only the old document has to go
+            removed = await asyncio.to_thread(vector_store.delete_document, replaces)
+            if removed["source"]:
+                await upload_manager.remove_file(removed["source"])
+        return None
+    file_path = await upload_manager.commit(stored)
+    job = await ingestion_pipeline.submit(str(file_path), doc_id=stored.doc_id, replaces=replaces)
+    if job.file_path != str(file_path):
+        # The same content is already being ingested under another file name
+        await upload_manager.remove_file(str(file_path))
+    return job.job_id
+
+@app.post("/uploads", response_model=UploadSessionResponse, dependencies=[Depends(auth_dependency)] if auth_dependency else [])
+async def create_upload_session(
+    request: UploadSessionRequest,
+    upload_manager: UploadManager = Depends(get_upload_manager)
+):
+    """Start a resumable upload for a large file."""
+    session = upload_manager.create_session(request.file_name, request.total_bytes)
+    return UploadSessionResponse(**asdict(session))
+
+@app.put("/uploads/{upload_id}", response_model=UploadSessionResponse, dependencies=[Depends(auth_dependency)] if auth_dependency else [])
+async def append_upload_part(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(0, ge=0),
+    upload_manager: UploadManager = Depends(get_upload_manager)
+):
+    """Append the raw request body to an upload, starting at offset."""
+    session = await upload_manager.append(upload_id, offset, request.stream())
+    return UploadSessionResponse(**asdict(session))
 
-        logger.info(f"Generated {len(chunks)} chunks from document: {file_path}")
-        vector_store.add_documents(chunks)
-        logger.info(f"Successfully processed and added document: {file_path}")
+@app.get("/uploads/{upload_id}", response_model=UploadSessionResponse, dependencies=[Depends(auth_dependency)] if auth_dependency else [])
+async def get_upload_session(
+    upload_id: str,
+    upload_manager: UploadManager = Depends(get_upload_manager)
+):
+    """Report how much of an upload has arrived, i.e. where to resume."""
+    session = upload_manager.get_session(upload_id)
+    return UploadSessionResponse(**asdict(session))
 
-    except DocumentProcessingError as e:
-        logger.error(f"Error processing document {file_path}: {e}")
+@app.post("/uploads/{upload_id}/complete", response_model=DocumentUploadResponse, dependencies=[Depends(auth_dependency)] if auth_dependency else [])
+async def complete_upload(
+    upload_id: str,
+    upload_manager: UploadManager = Depends(get_upload_manager),
+    ingestion_pipeline: IngestionPipeline = Depends(get_ingestion_pipeline),
+    vector_store: VectorStoreManager = Depends(get_vector_store)
+):
+    """Finish a resumable upload and queue the file for processing."""
+    try:
+        stored = await upload_manager.complete(upload_id)
+        job_id = await _queue_upload(stored, upload_manager, ingestion_pipeline, vector_store)
+        return DocumentUploadResponse(
+            message="Document uploaded and queued for processing",
+            num_processed=1,
+            document_ids=[stored.doc_id],
+            job_ids=[job_id] if job_id else [],
+            duplicates=[] if job_id else [stored.doc_id]
+        )
+    except UploadError:
+        raise
     except Exception as e:
-        logger.error(f"Unexpected error processing document {file_path}: {e}", exc_info=True)
+        logger.error(f"Error completing upload {upload_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/uploads/{upload_id}", dependencies=[Depends(auth_dependency)] if auth_dependency else [])
+async def abort_upload(
+    upload_id: str,
+    upload_manager: UploadManager = Depends(get_upload_manager)
+):
+    """Abort a resumable upload and delete what was received."""
+    await upload_manager.abort(upload_id)
+    return {"message": f"Upload {upload_id} aborted"}
+
+@app.get("/jobs/{job_id}", response_model=IngestionJob)
+async def get_ingestion_job(
+    job_id: str,
+    ingestion_pipeline: IngestionPipeline = Depends(get_ingestion_pipeline)
+):
+    """Get the processing status of an uploaded document."""
+    job = ingestion_pipeline.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Ingestion job {job_id} not found")
+    return job
+
+@app.get("/documents/{doc_id}/status", response_model=IngestionJob)
+async def get_document_status(
+    doc_id: str,
+    ingestion_pipeline: IngestionPipeline = Depends(get_ingestion_pipeline),
+    vector_store: VectorStoreManager = Depends(get_vector_store)
+):
+    """Get the processing status of a document by its content-hash ID."""
+    job = ingestion_pipeline.get_job(doc_id)
+    if job is not None:
+        return job
+    if await asyncio.to_thread(vector_store.has_document, doc_id):
+        return IngestionJob(job_id=doc_id, file_path="", doc_id=doc_id, status="completed")
+    raise HTTPException(status_code=404, detail=f"Document {doc_id} not found")
 
 @app.post("/query", response_model=QueryResponse)
 async def query_documents(
@@ -177,7 +454,9 @@ async def query_documents(
             chat_history_id=request.chat_history_id,
             filter_dict=request.filters,
             model_name=request.model_name,
-            doc_id=request.doc_id
+            doc_id=request.doc_id,
+            search_mode=request.search_mode,
+            keyword_weight=request.keyword_weight
         )
         
         # Generate a unique ID if not provided
@@ -185,40 +464,104 @@ async def query_documents(
         
         logger.info(f"Processed query: '{request.query[:50]}...'")
         return QueryResponse(
-            response=result, 
-            sources=[], 
-            chat_history_id=chat_history_id
+            response=result["response"],
+            sources=result["sources"],
+            chat_history_id=chat_history_id,
+            context_usage=result["context_usage"],
+            timings=result["timings"]
         )
-    except QueryError as e:
+    except (QueryError, ModelBusyError) as e:
         logger.error(f"Error processing query: {e}")
         raise
     except Exception as e:
         logger.error(f"Unexpected error processing query: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/query/stream")
+async def query_documents_stream(
+    request: QueryRequest,
+    http_request: Request,
+    query_engine: RAGQueryEngine = Depends(get_query_engine)
+):
+    """Query documents using RAG, streaming the answer as Server-Sent Events."""
+    events = query_engine.stream_response(
+        query=request.query,
+        chat_history_id=request.chat_history_id,
+        filter_dict=request.filters,
+        model_name=request.model_name,
+        doc_id=request.doc_id,
+        search_mode=request.search_mode,
+        keyword_weight=request.keyword_weight
+    )
+
+    async def event_stream():
+        # aclosing() guarantees the engine generator (and the upstream Ollama
+        # request) is closed as soon as we stop iterating.
+        async with aclosing(events):
+            try:
+                async for event in events:
+                    if await http_request.is_disconnected():
+                        logger.info(f"Client disconnected, cancelling query: '{request.query[:50]}...'")
+                        break
+                    yield _format_sse(event["event"], event["data"])
+            except (QueryError, ModelBusyError) as e:
+                logger.error(f"Error streaming query: {e}")
+                yield _format_sse("error", {"detail": str(e), "error_type": e.__class__.__name__})
+            except Exception as e:
+                logger.error(f"Unexpected error streaming query: {e}", exc_info=True)
+                yield _format_sse("error", {"detail": str(e), "error_type": "UnhandledException"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _format_sse(event: str, data) -> str:
+    """Encodes a single Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @app.get("/stats", dependencies=[Depends(auth_dependency)] if auth_dependency else [])
-async def get_stats(vector_store: VectorStoreManager = Depends(get_vector_store)):
+async def get_stats(
+    vector_store: VectorStoreManager = Depends(get_vector_store),
+    query_engine: RAGQueryEngine = Depends(get_query_engine)
+):
     """Get statistics about the RAG system."""
     try:
-        vector_store_stats = vector_store.get_collection_stats()
+        vector_store_stats = await asyncio.to_thread(vector_store.get_collection_stats)
         return {
             "vector_store_stats": vector_store_stats,
-            "uploaded_documents": len(list(UPLOAD_DIR.glob("*"))),
-            "chat_histories": len(list(CHAT_HISTORY_DIR.glob("*.json")))
+            "documents": vector_store_stats["documents"],
+            "uploaded_documents": vector_store_stats["documents"]["documents"],
+            "uploads": app.state.upload_manager.get_stats(),
+            "chat_histories": query_engine.chat_history_store.count(),
+            "generation_queues": query_engine.text_generation_service.get_queue_stats(),
+            "clients": app.state.client_registry.get_stats(),
+            "model_catalog": app.state.model_catalog.get_stats(),
+            "ingestion": app.state.ingestion_pipeline.get_stats(),
+            "answer_cache": query_engine.answer_cache.get_stats() if query_engine.answer_cache else None,
+            "reranker": query_engine.reranker.get_stats(),
+            "coalescing": query_engine.single_flight.get_stats(),
+            "history_compaction": query_engine.history_compactor.get_stats() if query_engine.history_compactor else None
         }
     except Exception as e:
         logger.error(f"Error getting stats: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/clear", dependencies=[Depends(auth_dependency)] if auth_dependency else [])
-async def clear_system(vector_store: VectorStoreManager = Depends(get_vector_store)):
+async def clear_system(
+    vector_store: VectorStoreManager = Depends(get_vector_store),
+    query_engine: RAGQueryEngine = Depends(get_query_engine)
+):
     """Clear all documents and reset the system."""
     try:
         vector_store.clear_collection()
-        for file in UPLOAD_DIR.glob("*"):
-            file.unlink()
-        for file in CHAT_HISTORY_DIR.glob("*.json"):
-            file.unlink()
+        for entry in UPLOAD_DIR.glob("*"):
+            if entry.is_file():
+                entry.unlink()
+            elif entry.is_dir() and entry.name != ".partial":
+                shutil.rmtree(entry)
+        await query_engine.chat_history_store.clear()
         logger.info("System cleared successfully")
         return {"message": "System cleared successfully"}
     except Exception as e:
@@ -226,22 +569,97 @@ async def clear_system(vector_store: VectorStoreManager = Depends(get_vector_sto
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/documents", response_model=DocumentListResponse)
-async def list_documents(vector_store: VectorStoreManager = Depends(get_vector_store)):
-    """List all documents in the system."""
+async def list_documents(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    sort_by: Literal[SORT_COLUMNS] = Query("processed_at"),
+    order: Literal["asc", "desc"] = Query("desc"),
+    vector_store: VectorStoreManager = Depends(get_vector_store)
+):
+    """List documents in the system, one page at a time."""
     try:
-        documents = vector_store.list_documents()
-        total_documents = len(documents)
-        total_chunks = sum(doc['chunk_count'] for doc in documents)
-        logger.info(f"Listed {total_documents} documents with {total_chunks} total chunks")
+        documents = vector_store.list_documents(offset, limit, sort_by, descending=order == "desc")
+        totals = vector_store.document_registry.totals()
+        logger.info(f"Listed {len(documents)} of {totals['documents']} documents")
         return DocumentListResponse(
             documents=documents,
-            total_documents=total_documents,
-            total_chunks=total_chunks
+            total_documents=totals["documents"],
+            total_chunks=totals["chunks"],
+            offset=offset,
+            limit=limit
         )
     except Exception as e:
         logger.error(f"Error listing documents: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.delete("/documents/{doc_id}", dependencies=[Depends(auth_dependency)] if auth_dependency else [])
+async def delete_document(
+    doc_id: str,
+    vector_store: VectorStoreManager = Depends(get_vector_store),
+    upload_manager: UploadManager = Depends(get_upload_manager)
+):
+    """Delete one document, its chunks and its uploaded file."""
+    try:
+        result = await asyncio.to_thread(vector_store.delete_document, doc_id)
+        if result["source"]:
+            await upload_manager.remove_file(result["source"])
+        return {
+            "message": f"Document {doc_id} deleted",
+            "doc_id": doc_id,
+            "chunks_deleted": result["deleted"]
+        }
+    except DocumentNotFoundError:
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting document {doc_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.put(
+    "/documents/{doc_id}",
+    response_model=DocumentUploadResponse,
+    dependencies=[Depends(auth_dependency)] if auth_dependency else [],
+    openapi_extra=_multipart_body("file", multiple=False)
+)
+async def replace_document(
+    doc_id: str,
+    request: Request,
+    upload_manager: UploadManager = Depends(get_upload_manager),
+    ingestion_pipeline: IngestionPipeline = Depends(get_ingestion_pipeline),
+    vector_store: VectorStoreManager = Depends(get_vector_store)
+):
+    """Replace a document with a new version; the old one is served until the new one is stored."""
+    try:
+        known = await asyncio.to_thread(vector_store.document_registry.get, doc_id)
+        if known is None and not await asyncio.to_thread(vector_store.has_document, doc_id):
+            raise DocumentNotFoundError(f"Document {doc_id} not found")
+        received = await _receive_files(request, upload_manager)
+        if len(received) != 1:
+            for stored in received:
+                await upload_manager.discard(stored)
+            raise UploadError("Exactly one file is required")
+        stored = received[0]
+        if stored.doc_id == doc_id:
+            await upload_manager.discard(stored)
+            job_id = None
+        else:
+            try:
+                job_id = await _queue_upload(stored, upload_manager, ingestion_pipeline, vector_store, replaces=doc_id)
+            except BaseException:
+                await upload_manager.discard(stored)
+                raise
+        return DocumentUploadResponse(
+            message="Document uploaded and queued to replace " + doc_id if job_id else "Document is unchanged",
+            num_processed=1,
+            document_ids=[stored.doc_id],
+            job_ids=[job_id] if job_id else [],
+            duplicates=[] if job_id else [stored.doc_id]
+        )
+    except (UploadError, DocumentNotFoundError):
+        raise
+    except Exception as e:
+        logger.error(f"Error replacing document {doc_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
 if __name__ == "__main__":
     logger.info(f"Starting server on {settings.api_host}:{settings.api_port}")
     uvicorn.run(
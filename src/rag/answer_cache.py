@@ -0,0 +1,163 @@
+# src/rag/answer_cache.py
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Dict, Any, Iterable, Tuple
+
+from .embedding_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+class AnswerCache:
+    """
+    In-memory cache of full RAG answers.
+
+    The exact tier matches on the normalized query plus a scope describing
+    everything else that shapes the answer (filters, model, retrieval
+    settings). The optional semantic tier reuses an answer for a different
+    phrasing when the query embeddings are within the cosine threshold *and*
+    retrieval returned exactly the same chunks, so the answer was built from
+    the same context. Entries expire after ttl_seconds, the least recently used entry is
+    evicted beyond max_entries, and entries are dropped when any document they
+    were built from changes. Documents added later do not invalidate anything,
+    so an answer can miss newly ingested material for up to ttl_seconds.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 3600,
+        max_entries: int = 1000,
+        semantic_threshold: Optional[float] = 0.95
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.semantic_threshold = semantic_threshold
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._by_context: Dict[Tuple[str, Tuple[str, ...]], set] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _scope(scope: Dict[str, Any]) -> str:
+        return json.dumps(scope, sort_keys=True, default=str)
+
+    @staticmethod
+    def _key(query: str, scope: str) -> str:
+        return hashlib.sha256(f"{normalize_text(query).lower()}\0{scope}".encode()).hexdigest()
+
+    def get(self, query: str, scope: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Exact-match lookup. Misses are not counted here, see get_similar."""
+        key = self._key(query, self._scope(scope))
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is None:
+                return None
+            self.exact_hits += 1
+            return {"response": entry["response"], "sources": entry["sources"]}
+
+    def get_similar(
+        self,
+        query: str,
+        scope: Dict[str, Any],
+        query_embedding: Optional[List[float]],
+        chunk_ids: List[str]
+    ) -> Optional[Dict[str, Any]]:
+        """Semantic lookup among entries built from the same retrieved chunks."""
+        scope = self._scope(scope)
+        with self._lock:
+            if self.semantic_threshold is not None and query_embedding is not None:
+                for key in list(self._by_context.get((scope, tuple(chunk_ids)), ())):
+                    entry = self._live_entry(key)
+                    if entry is None or entry["embedding"] is None:
+                        continue
+                    if _cosine(query_embedding, entry["embedding"]) >= self.semantic_threshold:
+                        self.semantic_hits += 1
+                        return {"response": entry["response"], "sources": entry["sources"]}
+            self.misses += 1
+            return None
+
+    def put(
+        self,
+        query: str,
+        scope: Dict[str, Any],
+        response: str,
+        sources: List[str],
+        query_embedding: Optional[List[float]],
+        chunk_ids: List[str],
+        doc_ids: Iterable[str]
+    ) -> None:
+        scope = self._scope(scope)
+        key = self._key(query, scope)
+        context = (scope, tuple(chunk_ids))
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = {
+                "response": response,
+                "sources": sources,
+                "embedding": query_embedding,
+                "context": context,
+                "doc_ids": set(doc_ids),
+                "created_at": time.monotonic()
+            }
+            self._by_context.setdefault(context, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_documents(self, doc_ids: Optional[Iterable[str]] = None) -> None:
+        """Drops entries built from any of the given documents, or everything if None."""
+        with self._lock:
+            if doc_ids is None:
+                self._entries.clear()
+                self._by_context.clear()
+                logger.info("Cleared answer cache")
+                return
+            doc_ids = set(doc_ids)
+            stale = [key for key, entry in self._entries.items() if entry["doc_ids"] & doc_ids]
+            for key in stale:
+                self._remove(key)
+            if stale:
+                logger.info(f"Invalidated {len(stale)} cached answers for {len(doc_ids)} changed documents")
+
+    def get_stats(self) -> Dict[str, Any]:
+        hits = self.exact_hits + self.semantic_hits
+        total = hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_ratio": round(hits / total, 4) if total else 0.0
+        }
+
+    def _live_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry["created_at"] > self.ttl_seconds:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._by_context.get(entry["context"])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_context[entry["context"]]
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
@@ -0,0 +1,125 @@
+# src/rag/chat_history.py
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, List, Dict, Any
+
+import aiofiles
+import aiofiles.os
+
+logger = logging.getLogger(__name__)
+
+class ChatHistoryStore:
+    """
+    Append-only chat history persistence with an in-memory LRU of hot conversations.
+
+    Each conversation is a JSONL file with one message per line, so a turn
+    costs one append instead of rewriting the whole history. Files are read
+    and written with aiofiles to keep the event loop free, and a per-
+    conversation lock serializes concurrent turns on the same ID. Locks only
+    exist while a conversation is being read or written. Legacy {id}.json
+    files are migrated on first access.
+    """
+
+    def __init__(self, directory: str, cache_size: int = 256):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        # Conversation ID -> (lock, number of tasks holding or waiting for it)
+        self._locks: Dict[str, List] = {}
+        # Counted once here; kept up to date as conversations are created
+        self._conversation_ids = {path.stem for path in self.directory.glob("*.jsonl")}
+        self._conversation_ids.update(path.stem for path in self.directory.glob("*.json"))
+        logger.info(f"Initialized ChatHistoryStore at {self.directory} with {len(self._conversation_ids)} conversations")
+
+    def count(self) -> int:
+        """Returns the number of stored conversations."""
+        return len(self._conversation_ids)
+
+    async def load(self, chat_history_id: str) -> List[Dict[str, Any]]:
+        """Returns the messages of a conversation, oldest first."""
+        async with self._locked(chat_history_id):
+            return list(await self._load_unlocked(chat_history_id))
+
+    async def append(self, chat_history_id: str, messages: List[Dict[str, Any]]) -> None:
+        """Appends messages to a conversation in a single write."""
+        timestamp = datetime.now().isoformat()
+        entries = [{**message, "timestamp": message.get("timestamp", timestamp)} for message in messages]
+        async with self._locked(chat_history_id):
+            history = await self._load_unlocked(chat_history_id)
+            async with aiofiles.open(self._path(chat_history_id), "a") as f:
+                await f.write("".join(json.dumps(entry) + "\n" for entry in entries))
+            history.extend(entries)
+            self._conversation_ids.add(chat_history_id)
+        logger.info(f"Saved chat history for ID: {chat_history_id}")
+
+    async def clear(self) -> None:
+        """Deletes all conversations."""
+        for path in list(self.directory.glob("*.jsonl")) + list(self.directory.glob("*.json")):
+            await aiofiles.os.remove(path)
+        self._cache.clear()
+        self._conversation_ids.clear()
+
+    @asynccontextmanager
+    async def _locked(self, chat_history_id: str) -> AsyncIterator[None]:
+        """Holds the conversation's lock; the lock is dropped once nobody holds or waits for it."""
+        entry = self._locks.get(chat_history_id)
+        if entry is None:
+            entry = self._locks[chat_history_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[chat_history_id]
+
+    def _path(self, chat_history_id: str) -> Path:
+        return self.directory / f"{chat_history_id}.jsonl"
+
+    async def _load_unlocked(self, chat_history_id: str) -> List[Dict[str, Any]]:
+        history = self._cache.get(chat_history_id)
+        if history is not None:
+            self._cache.move_to_end(chat_history_id)
+            return history
+
+        path = self._path(chat_history_id)
+        history = []
+        if path.exists():
+            async with aiofiles.open(path, "r") as f:
+                async for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        history.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        logger.warning(f"Skipping corrupt chat history line for ID: {chat_history_id}")
+        elif (self.directory / f"{chat_history_id}.json").exists():
+            history = await self._migrate_legacy(chat_history_id)
+        else:
+            logger.info(f"No chat history found for ID: {chat_history_id}")
+
+        self._cache[chat_history_id] = history
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return history
+
+    async def _migrate_legacy(self, chat_history_id: str) -> List[Dict[str, Any]]:
+        """Converts a legacy {id}.json array into the JSONL format."""
+        legacy_path = self.directory / f"{chat_history_id}.json"
+        async with aiofiles.open(legacy_path, "r") as f:
+            history = json.loads(await f.read())
+        tmp_path = self.directory / f"{chat_history_id}.jsonl.tmp"
+        async with aiofiles.open(tmp_path, "w") as f:
+            await f.write("".join(json.dumps(entry) + "\n" for entry in history))
+        await aiofiles.os.rename(tmp_path, self._path(chat_history_id))
+        await aiofiles.os.remove(legacy_path)
+        logger.info(f"Migrated legacy chat history for ID: {chat_history_id}")
+        return history
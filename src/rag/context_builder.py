@@ -0,0 +1,217 @@
+# src/rag/context_builder.py
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+# Tokens added per chat message by typical chat templates
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+class TokenCounter:
+    """Counts tokens with tiktoken, falling back to a chars/4 estimate if it is unavailable."""
+
+    def __init__(self, encoding_name: str = "cl100k_base"):
+        self._encoding = None
+        try:
+            import tiktoken
+            self._encoding = tiktoken.get_encoding(encoding_name)
+        except Exception as e:
+            logger.warning(f"tiktoken encoding {encoding_name} unavailable, estimating tokens from length: {e}")
+
+    def count(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return (len(text) + 3) // 4
+
+
+@dataclass
+class BuiltContext:
+    passages: List[Document]
+    history: List[Any]
+    usage: Dict[str, int] = field(default_factory=dict)
+
+
+class ContextBuilder:
+    """
+    Assembles prompt context within a token budget.
+
+    Whatever is left of the budget after the fixed prompt parts is split
+    between chat history (newest turns first, up to history_share of it) and
+    retrieved passages (in rank order). Chunks that are adjacent in the same
+    document are merged back into one passage and near-duplicate passages are
+    dropped before filling.
+    """
+
+    def __init__(
+        self,
+        max_prompt_tokens: int = 3000,
+        history_share: float = 0.3,
+        duplicate_threshold: float = 0.9,
+        model_prompt_tokens: Optional[Dict[str, int]] = None,
+        token_counter: Optional[TokenCounter] = None
+    ):
+        self.max_prompt_tokens = max_prompt_tokens
+        self.history_share = history_share
+        self.duplicate_threshold = duplicate_threshold
+        self.model_prompt_tokens = model_prompt_tokens or {}
+        self.token_counter = token_counter or TokenCounter()
+
+    def build(
+        self,
+        model: str,
+        documents: List[Document],
+        history: List[Any],
+        fixed_text: str,
+        format_passage: Callable[[int, Document], str]
+    ) -> BuiltContext:
+        """Selects history messages and passages that fit the model's prompt budget."""
+        budget = self.model_prompt_tokens.get(model, self.max_prompt_tokens)
+        fixed_tokens = self.token_counter.count(fixed_text) + 2 * MESSAGE_OVERHEAD_TOKENS
+        available = max(budget - fixed_tokens, 0)
+
+        kept_history, history_tokens = self._select_history(history, int(available * self.history_share))
+        passages, context_tokens, dropped = self._select_passages(
+            self._dedupe(self._merge_adjacent(documents)),
+            available - history_tokens,
+            format_passage
+        )
+
+        usage = {
+            "budget_tokens": budget,
+            "fixed_tokens": fixed_tokens,
+            "history_tokens": history_tokens,
+            "context_tokens": context_tokens,
+            "used_tokens": fixed_tokens + history_tokens + context_tokens,
+            "history_messages": len(kept_history),
+            "history_messages_dropped": len(history) - len(kept_history),
+            "passages": len(passages),
+            "passages_dropped": dropped
+        }
+        return BuiltContext(passages=passages, history=kept_history, usage=usage)
+
+    def _select_history(self, history: List[Any], budget: int) -> Tuple[List[Any], int]:
+        pinned, used = [], 0
+        # A leading system message is the conversation summary; it outranks any single turn
+        if history and _message_role(history[0]) == "system":
+            tokens = self.token_counter.count(_message_content(history[0])) + MESSAGE_OVERHEAD_TOKENS
+            if tokens <= budget:
+                pinned, used = [history[0]], tokens
+            history = history[1:]
+
+        kept = []
+        for message in reversed(history):
+            tokens = self.token_counter.count(_message_content(message)) + MESSAGE_OVERHEAD_TOKENS
+            if used + tokens > budget:
+                break
+            kept.append(message)
+            used += tokens
+        kept.reverse()
+        return pinned + kept, used
+
+    def _select_passages(
+        self,
+        passages: List[Document],
+        budget: int,
+        format_passage: Callable[[int, Document], str]
+    ) -> Tuple[List[Document], int, int]:
+        selected, used, dropped = [], 0, 0
+        for passage in passages:
+            tokens = self.token_counter.count(format_passage(len(selected) + 1, passage))
+            if used + tokens > budget:
+                # A smaller, lower ranked passage may still fit
+                dropped += 1
+                continue
+            selected.append(passage)
+            used += tokens
+        return selected, used, dropped
+
+    @staticmethod
+    def _merge_adjacent(documents: List[Document]) -> List[Document]:
+        """Merges chunks with the same doc_id and consecutive chunk_index, keeping rank order."""
+        by_doc: Dict[Any, List[Tuple[int, int, Document]]] = {}
+        for rank, doc in enumerate(documents):
+            index = doc.metadata.get("chunk_index")
+            if doc.metadata.get("doc_id") is None or not isinstance(index, int):
+                by_doc.setdefault(("unmerged", rank), []).append((rank, 0, doc))
+            else:
+                by_doc.setdefault(doc.metadata["doc_id"], []).append((rank, index, doc))
+
+        runs: List[Tuple[int, Document]] = []
+        for entries in by_doc.values():
+            entries.sort(key=lambda e: e[1])
+            run = [entries[0]]
+            for entry in entries[1:]:
+                if entry[1] == run[-1][1] + 1:
+                    run.append(entry)
+                else:
+                    runs.append(_join_run(run))
+                    run = [entry]
+            runs.append(_join_run(run))
+
+        runs.sort(key=lambda r: r[0])
+        return [doc for _, doc in runs]
+
+    def _dedupe(self, documents: List[Document]) -> List[Document]:
+        """Drops passages whose word shingles mostly overlap a higher ranked passage."""
+        kept, kept_shingles = [], []
+        for doc in documents:
+            shingles = _shingles(doc.page_content)
+            if any(_jaccard(shingles, other) >= self.duplicate_threshold for other in kept_shingles):
+                continue
+            kept.append(doc)
+            kept_shingles.append(shingles)
+        return kept
+
+
+def _join_run(run: List[Tuple[int, int, Document]]) -> Tuple[int, Document]:
+    best_rank = min(entry[0] for entry in run)
+    if len(run) == 1:
+        return best_rank, run[0][2]
+    text = run[0][2].page_content
+    for _, _, doc in run[1:]:
+        text += _strip_overlap(text, doc.page_content)
+    metadata = dict(run[0][2].metadata)
+    metadata["merged_chunks"] = len(run)
+    return best_rank, Document(page_content=text, metadata=metadata)
+
+
+def _strip_overlap(previous: str, current: str, max_overlap: int = 300) -> str:
+    """Removes the splitter overlap between consecutive chunks."""
+    for size in range(min(len(previous), len(current), max_overlap), 0, -1):
+        if previous.endswith(current[:size]):
+            return current[size:]
+    return "\n" + current
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _message_role(message: Any) -> str:
+    if isinstance(message, tuple) and len(message) == 2:
+        return str(message[0])
+    if isinstance(message, dict):
+        return str(message.get("role", ""))
+    return str(getattr(message, "type", ""))
+
+
+def _message_content(message: Any) -> str:
+    if isinstance(message, tuple) and len(message) == 2:
+        return str(message[1])
+    if isinstance(message, dict):
+        return str(message.get("content", ""))
+    return str(getattr(message, "content", message))
@@ -1,25 +1,30 @@
 # src/rag/document_processor.py
-from typing import List, Optional, Dict, Any
+from typing import Iterator, List, Optional, Dict, Any
 from pathlib import Path
 import logging
 from datetime import datetime
-import time
 import hashlib
 import os
+import time
 
-from langchain_community.document_loaders import (
-    DirectoryLoader,
-    UnstructuredFileLoader,
-    TextLoader,
-    PDFMinerLoader
-)
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
+from src.core.config import settings
 from src.core.exceptions import DocumentProcessingError
+from src.core import metrics
+from .extractors import Extractor, extractor_registry
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+def compute_file_hash(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """Computes the SHA-256 hash of a file's content, reading it in blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
 class DocumentProcessor:
     """Handles document loading and preprocessing for RAG applications."""
 
@@ -49,10 +54,10 @@ class DocumentProcessor:
             is_separator_regex=False
         )
 
-        self.loader_map = {
-            '.txt': TextLoader,
-            '.pdf': PDFMinerLoader,
-            '.docx': UnstructuredFileLoader,
+        # Extraction backend per file type; "auto" picks the fastest installed one
+        self.extractor_backends = {
+            '.pdf': settings.extraction.pdf_backend,
+            '.docx': settings.extraction.docx_backend,
         }
         
         logger.info(f"Initialized DocumentProcessor with chunk_size={chunk_size}, chunk_overlap={chunk_overlap}")
@@ -70,9 +75,10 @@ class DocumentProcessor:
 
         return True
 
-    def _get_loader_for_file(self, file_path: Path) -> Optional[Any]:
-        """Gets the appropriate loader for a file type."""
-        return self.loader_map.get(file_path.suffix.lower())
+    def _get_extractor_for_file(self, file_path: Path) -> Optional[Extractor]:
+        """Gets the extractor configured for a file type."""
+        extension = file_path.suffix.lower()
+        return extractor_registry.get(extension, self.extractor_backends.get(extension))
 
     def _extract_section_info(self, text: str) -> Dict[str, Any]:
         """Extracts section information from text."""
@@ -92,56 +98,78 @@ class DocumentProcessor:
 
     def process_single_document(self, file_path: str) -> List[Document]:
         """Processes a single document file."""
+        return list(self.iter_chunks(file_path))
+
+    def iter_chunk_batches(self, file_path: str, batch_size: int, doc_id: Optional[str] = None) -> Iterator[List[Document]]:
+        """Yields a document's chunks in lists of at most batch_size."""
+        batch = []
+        for chunk in self.iter_chunks(file_path, doc_id):
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def iter_chunks(self, file_path: str, doc_id: Optional[str] = None) -> Iterator[Document]:
+        """
+        Lazily loads and splits a document, yielding chunks as they are produced.
+
+        Pages come from the extractor's lazy_load, so only one page and its
+        chunks are held at a time; consumers that embed chunks as they
+        arrive never need the whole document in memory. doc_id is the
+        content hash when the caller already knows it; otherwise the file
+        is hashed first.
+        """
         file_path = Path(file_path)
-        logger.info(f"Entering process_single_document: {file_path}") # ADD THIS
+        logger.debug(f"Processing document: {file_path}")
+        started = time.perf_counter()
+        chunk_index = 0
         try:
             if not self._validate_file(file_path):
                 raise ValueError(f"Invalid file: {file_path}")
 
-            loader_class = self._get_loader_for_file(file_path)
-            if not loader_class:
-                raise ValueError(f"No loader available for: {file_path}")
-
-            logger.info(f"Using loader: {loader_class.__name__}") # ADD THIS
-            loader = loader_class(str(file_path))
-            logger.info(f"About to call loader.load() for: {file_path}") # ADD THIS
-            documents = loader.load()
-            logger.info(f"loader.load() returned: {len(documents)} documents") # ADD THIS
-
-            processed_chunks = []
-            chunk_index = 0
+            extractor = self._get_extractor_for_file(file_path)
+            if not extractor:
+                raise ValueError(f"No extractor available for: {file_path}")
 
-            # Generate a unique document ID using a hash for better uniqueness
-            doc_id = hashlib.sha256(f"{file_path}{time.time()}".encode()).hexdigest()
-            logger.info(f"Generated doc_id: {doc_id} for document: {file_path}") # ADD THIS
+            # The document ID is the hash of the file content, so re-uploading
+            # an unchanged file maps to the same document
+            doc_id = doc_id or compute_file_hash(str(file_path))
+            file_size = file_path.stat().st_size
+            logger.debug(f"Generated doc_id: {doc_id} for document: {file_path}")
 
-            for doc in documents:
+            for doc in extractor.lazy_load(file_path):
                 doc.metadata.update({
                     "source": str(file_path),
                     "file_type": file_path.suffix,
                     "file_name": file_path.name,
                     "doc_id": doc_id,  # Add the unique document ID
+                    "file_size": file_size,
                     "processed_at": datetime.now().isoformat()
                 })
 
                 chunks = self.text_splitter.split_documents([doc])
-                logger.info(f"Split into {len(chunks)} chunks") # ADD THIS
+                logger.debug(f"Split into {len(chunks)} chunks")
 
                 for chunk in chunks:
                     section_info = self._extract_section_info(chunk.page_content)
                     chunk.metadata.update({
                         "doc_id": doc_id,  # Add doc_id to each chunk
+                        "chunk_hash": hashlib.sha256(chunk.page_content.encode()).hexdigest(),
                         "chunk_index": chunk_index,
                         "total_chunks": len(chunks),
                         "chunk_size": len(chunk.page_content),
                         "section_info": section_info,
                         "is_section_start": section_info["is_section_start"]
                     })
-                    processed_chunks.append(chunk)
                     chunk_index += 1
+                    yield chunk
 
-            logger.info(f"Processed {file_path}: {len(processed_chunks)} chunks created, doc_id: {doc_id}")
-            return processed_chunks
+            metrics.DOCUMENTS_PROCESSED.labels(file_path.suffix.lower()).inc()
+            metrics.DOCUMENT_CHUNKS.inc(chunk_index)
+            metrics.DOCUMENT_PROCESSING_LATENCY.observe(time.perf_counter() - started)
+            logger.info(f"Processed {file_path}: {chunk_index} chunks created, doc_id: {doc_id}")
 
         except DocumentProcessingError as e:
             logger.error(f"Error processing document {file_path}: {e}")
@@ -0,0 +1,131 @@
+# src/rag/document_registry.py
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+# Columns /documents may be sorted by
+SORT_COLUMNS = ("processed_at", "file_name", "source", "file_type", "chunk_count", "bytes")
+
+_COLUMNS = ("doc_id", "source", "file_name", "file_type", "chunk_count", "bytes", "content_hash", "processed_at")
+
+
+class DocumentRegistry:
+    """
+    One row per stored document, kept in SQLite next to the Chroma data.
+
+    Listing documents and totals are answered from here instead of scanning
+    every chunk in the collection. The vector store updates the registry
+    whenever it adds, replaces or deletes a document's chunks.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " doc_id TEXT PRIMARY KEY,"
+            " source TEXT NOT NULL,"
+            " file_name TEXT NOT NULL,"
+            " file_type TEXT NOT NULL,"
+            " chunk_count INTEGER NOT NULL,"
+            " bytes INTEGER,"
+            " content_hash TEXT,"
+            " processed_at TEXT NOT NULL)"
+        )
+        for column in SORT_COLUMNS:
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_documents_{column} ON documents ({column})")
+        self._conn.commit()
+        logger.info(f"Initialized DocumentRegistry at {self.path} with {len(self)} documents")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def add_chunks(self, chunk_counts: Mapping[str, int], metadata: Mapping[str, Mapping[str, Any]]) -> None:
+        """Adds chunk_counts[doc_id] chunks to each document, creating rows from its chunk metadata."""
+        rows = [_row(metadata[doc_id], doc_id, count) for doc_id, count in chunk_counts.items()]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO documents ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))}) "
+                "ON CONFLICT (doc_id) DO UPDATE SET chunk_count = chunk_count + excluded.chunk_count",
+                rows
+            )
+
+    def replace(self, doc_id: str, metadata: Mapping[str, Any], chunk_count: int, remove: Iterable[str] = ()) -> None:
+        """Writes a document's row and drops the rows it supersedes, in one transaction."""
+        stale = [d for d in remove if d != doc_id]
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM documents WHERE doc_id = ?", [(d,) for d in stale])
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO documents ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                _row(metadata, doc_id, chunk_count)
+            )
+
+    def remove(self, doc_ids: Iterable[str]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM documents WHERE doc_id = ?", [(d,) for d in doc_ids])
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+        return dict(row) if row else None
+
+    def doc_ids_for_source(self, source: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT doc_id FROM documents WHERE source = ?", (source,)).fetchall()
+        return [row["doc_id"] for row in rows]
+
+    def list_documents(
+        self,
+        offset: int = 0,
+        limit: int = 100,
+        sort_by: str = "processed_at",
+        descending: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Returns one page of documents."""
+        if sort_by not in SORT_COLUMNS:
+            raise ValueError(f"Cannot sort documents by {sort_by}")
+        direction = "DESC" if descending else "ASC"
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM documents ORDER BY {sort_by} {direction}, doc_id LIMIT ? OFFSET ?",
+                (limit, offset)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def totals(self) -> Dict[str, int]:
+        with self._lock:
+            documents, chunks, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(chunk_count), 0), COALESCE(SUM(bytes), 0) FROM documents"
+            ).fetchone()
+        return {"documents": documents, "chunks": chunks, "bytes": size}
+
+    def get_stats(self) -> Dict[str, int]:
+        return self.totals()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _row(metadata: Mapping[str, Any], doc_id: str, chunk_count: int) -> tuple:
+    file_size = metadata.get("file_size")
+    return (
+        doc_id,
+        metadata.get("source", ""),
+        metadata.get("file_name", ""),
+        metadata.get("file_type", ""),
+        chunk_count,
+        int(file_size) if file_size is not None else None,
+        metadata.get("content_hash") or doc_id,
+        metadata.get("processed_at", "")
+    )
@@ -0,0 +1,154 @@
+# src/rag/embedding_cache.py
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from pathlib import Path
+from typing import List, Optional, Dict, Any
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+def normalize_text(text: str) -> str:
+    """Normalizes text before hashing so trivial whitespace changes still hit the cache."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode()).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Disk-backed embedding cache keyed by (model name, normalized text hash).
+
+    Vectors are stored as packed float32 blobs in SQLite. Entries are evicted
+    least-recently-used first once the cache grows past max_entries.
+    """
+
+    def __init__(self, path: str, max_entries: int = 500_000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " text_hash TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        logger.info(f"Initialized EmbeddingCache at {self.path} with {self._size} entries")
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Returns cached vectors in input order, None for misses."""
+        hashes = [text_hash(text) for text in texts]
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            unique = list(set(hashes))
+            for i in range(0, len(unique), 500):
+                batch = unique[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch]
+                ).fetchall()
+                for row_hash, blob in rows:
+                    found[row_hash] = array("f", blob).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in found]
+                )
+                self._conn.commit()
+
+            results = [found.get(h) for h in hashes]
+            hit_count = sum(1 for r in results if r is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+        return results
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]) -> None:
+        """Stores vectors and evicts the least recently used entries if over capacity."""
+        if not texts:
+            return
+        now = time.time()
+        rows = [
+            (model, text_hash(text), array("f", vector).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._size += self._conn.total_changes - before
+            if self._size > self.max_entries:
+                overflow = self._size - self.max_entries
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (overflow,)
+                )
+                self._size -= overflow
+                logger.info(f"Evicted {overflow} entries from embedding cache")
+            self._conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that consults an EmbeddingCache before the underlying model."""
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, model_name: str):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.cache.get_many(self.model_name, texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = self.embeddings.embed_documents([texts[i] for i in missing])
+            self.cache.put_many(self.model_name, [texts[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                vectors[i] = list(vector)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        # Query and document embeddings can differ for some models, so keep
+        # them in separate keyspaces
+        model = f"{self.model_name}::query"
+        vector = self.cache.get_many(model, [text])[0]
+        if vector is None:
+            vector = list(self.embeddings.embed_query(text))
+            self.cache.put_many(model, [text], [vector])
+        return vector
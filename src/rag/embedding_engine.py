@@ -0,0 +1,110 @@
+# src/rag/embedding_engine.py
+import logging
+import threading
+import time
+from typing import List, Optional, Dict, Any
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.core import metrics
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingEngine(Embeddings):
+    """
+    Batched SentenceTransformer embedding engine.
+
+    Texts are ordered by token length and cut into batches of batch_size, so
+    every batch holds similarly sized inputs and little compute is spent on
+    padding. Results are returned in the original order as float32 or float16
+    NumPy arrays.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int = 32,
+        num_threads: int = 0,
+        dtype: str = "float32",
+        normalize_embeddings: bool = False
+    ):
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"Unsupported embedding dtype: {dtype}")
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.dtype = np.dtype(dtype)
+        self.normalize_embeddings = normalize_embeddings
+        if num_threads > 0:
+            import torch
+            torch.set_num_threads(num_threads)
+        # Imported here because sentence_transformers pulls in torch
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, trust_remote_code=True)
+        self._lock = threading.Lock()
+        self._texts = 0
+        self._batches = 0
+        self._seconds = 0.0
+        self._last_batch_ms = 0.0
+        logger.info(f"Initialized EmbeddingEngine with model={model_name}, batch_size={batch_size}, "
+                    f"num_threads={num_threads or 'default'}, dtype={dtype}")
+
+    def encode(self, texts: List[str], dtype: Optional[str] = None) -> np.ndarray:
+        """Embeds texts in length-sorted batches and returns an array in input order."""
+        out_dtype = np.dtype(dtype) if dtype else self.dtype
+        if not texts:
+            return np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype=out_dtype)
+
+        order = np.argsort(self._token_lengths(texts), kind="stable")
+        result: Optional[np.ndarray] = None
+        started = time.perf_counter()
+        batch_ms = 0.0
+        for start in range(0, len(order), self.batch_size):
+            batch_idx = order[start:start + self.batch_size]
+            batch_started = time.perf_counter()
+            vectors = self.model.encode(
+                [texts[i] for i in batch_idx],
+                batch_size=len(batch_idx),
+                convert_to_numpy=True,
+                normalize_embeddings=self.normalize_embeddings,
+                show_progress_bar=False
+            )
+            batch_ms = (time.perf_counter() - batch_started) * 1000
+            metrics.EMBEDDING_BATCH_LATENCY.observe(batch_ms / 1000)
+            if result is None:
+                result = np.empty((len(texts), vectors.shape[1]), dtype=out_dtype)
+            result[batch_idx] = vectors.astype(out_dtype, copy=False)
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self._texts += len(texts)
+            self._batches += (len(texts) + self.batch_size - 1) // self.batch_size
+            self._seconds += elapsed
+            self._last_batch_ms = batch_ms
+        logger.debug(f"Embedded {len(texts)} texts in {elapsed:.2f}s ({len(texts) / elapsed:.1f} chunks/s)")
+        return result
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "model": self.model_name,
+                "batch_size": self.batch_size,
+                "dtype": self.dtype.name,
+                "texts_embedded": self._texts,
+                "batches": self._batches,
+                "chunks_per_second": round(self._texts / self._seconds, 2) if self._seconds else 0.0,
+                "last_batch_ms": round(self._last_batch_ms, 2)
+            }
+
+    def _token_lengths(self, texts: List[str]) -> List[int]:
+        tokenizer = getattr(self.model, "tokenizer", None)
+        if tokenizer is None:
+            return [len(text) for text in texts]
+        encoded = tokenizer(texts, add_special_tokens=False, truncation=False)["input_ids"]
+        return [len(ids) for ids in encoded]
@@ -0,0 +1,341 @@
+# src/rag/extractors.py
+import importlib
+import importlib.util
+import logging
+import multiprocessing
+import re
+import zipfile
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+from xml.etree.ElementTree import iterparse
+
+from langchain_core.documents import Document
+
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Text and DOCX files are yielded in blocks of about this many characters
+BLOCK_CHARS = 1 << 20
+# Characters repeated at the start of the next block
+OVERLAP_CHARS = 200
+
+
+class Extractor(ABC):
+    """
+    Turns a file into text Documents, one per page where the format has pages.
+
+    requires lists the modules the backend imports; a backend whose modules
+    are not installed is skipped when picking the default for a file type.
+    """
+
+    name: str = ""
+    extensions: Tuple[str, ...] = ()
+    requires: Tuple[str, ...] = ()
+
+    def available(self) -> bool:
+        return all(importlib.util.find_spec(module) is not None for module in self.requires)
+
+    @abstractmethod
+    def lazy_load(self, file_path: Path) -> Iterator[Document]:
+        """Yields the file's Documents in order, without reading more than needed up front."""
+
+    def load(self, file_path: Path) -> List[Document]:
+        return list(self.lazy_load(file_path))
+
+
+class TextExtractor(Extractor):
+    """Reads text files block by block (see _blocks) instead of in one piece."""
+
+    name = "text"
+    extensions = (".txt",)
+
+    def __init__(self, block_chars: int = BLOCK_CHARS, overlap_chars: int = OVERLAP_CHARS):
+        self.block_chars = block_chars
+        self.overlap_chars = overlap_chars
+
+    def lazy_load(self, file_path: Path) -> Iterator[Document]:
+        with open(file_path, encoding="utf-8", errors="replace") as f:
+            reads = iter(lambda: f.read(self.block_chars), "")
+            for block in _blocks(reads, self.block_chars, self.overlap_chars):
+                yield Document(page_content=block, metadata={})
+
+
+class PagedPdfExtractor(Extractor):
+    """
+    Base for PDF backends that can read pages independently.
+
+    Documents with at least parallel_min_pages pages are extracted by
+    page_workers processes, each reading a range of pages; pages are still
+    yielded in order and only a few ranges are in flight at a time.
+    """
+
+    extensions = (".pdf",)
+
+    def __init__(self, page_workers: int = 1, parallel_min_pages: int = 200):
+        self.page_workers = page_workers
+        self.parallel_min_pages = parallel_min_pages
+
+    @abstractmethod
+    def page_count(self, file_path: Path) -> int:
+        pass
+
+    @abstractmethod
+    def page_texts(self, file_path: Path, start: int, stop: int) -> Iterator[str]:
+        """Yields the text of pages start..stop-1."""
+
+    def lazy_load(self, file_path: Path) -> Iterator[Document]:
+        total = self.page_count(file_path)
+        if self.page_workers > 1 and total >= self.parallel_min_pages:
+            texts = self._parallel_page_texts(file_path, total)
+        else:
+            texts = self.page_texts(file_path, 0, total)
+        for page, text in enumerate(texts):
+            yield Document(page_content=text, metadata={"page": page, "total_pages": total})
+
+    def _parallel_page_texts(self, file_path: Path, total: int) -> Iterator[str]:
+        pages_per_task = max(1, -(-total // (self.page_workers * 4)))
+        ranges = deque((start, min(start + pages_per_task, total)) for start in range(0, total, pages_per_task))
+        logger.debug(f"Extracting {total} pages of {file_path} with {self.page_workers} processes")
+        # Use "spawn" so workers don't inherit the parent's model threads
+        with ProcessPoolExecutor(
+            max_workers=self.page_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            in_flight: Deque = deque()
+            while ranges or in_flight:
+                while ranges and len(in_flight) < self.page_workers * 2:
+                    start, stop = ranges.popleft()
+                    in_flight.append(pool.submit(_extract_page_range, self.name, str(file_path), start, stop))
+                yield from in_flight.popleft().result()
+
+
+class PdfiumExtractor(PagedPdfExtractor):
+    name = "pypdfium2"
+    requires = ("pypdfium2",)
+
+    def page_count(self, file_path: Path) -> int:
+        import pypdfium2 as pdfium
+        pdf = pdfium.PdfDocument(str(file_path))
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+    def page_texts(self, file_path: Path, start: int, stop: int) -> Iterator[str]:
+        import pypdfium2 as pdfium
+        pdf = pdfium.PdfDocument(str(file_path))
+        try:
+            for index in range(start, stop):
+                page = pdf[index]
+                textpage = page.get_textpage()
+                try:
+                    yield textpage.get_text_range()
+                finally:
+                    textpage.close()
+                    page.close()
+        finally:
+            pdf.close()
+
+
+class PypdfExtractor(PagedPdfExtractor):
+    name = "pypdf"
+    requires = ("pypdf",)
+
+    def page_count(self, file_path: Path) -> int:
+        from pypdf import PdfReader
+        return len(PdfReader(str(file_path)).pages)
+
+    def page_texts(self, file_path: Path, start: int, stop: int) -> Iterator[str]:
+        from pypdf import PdfReader
+        reader = PdfReader(str(file_path))
+        for index in range(start, stop):
+            yield reader.pages[index].extract_text() or ""
+
+
+class DocxXmlExtractor(Extractor):
+    """
+    Reads word/document.xml straight from the DOCX archive; paragraphs and tables keep their order.
+
+    Paragraphs are yielded in blocks (see _blocks) as iterparse reaches them.
+    """
+
+    name = "docx-xml"
+    extensions = (".docx",)
+
+    _W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+    def __init__(self, block_chars: int = BLOCK_CHARS, overlap_chars: int = OVERLAP_CHARS):
+        self.block_chars = block_chars
+        self.overlap_chars = overlap_chars
+
+    def lazy_load(self, file_path: Path) -> Iterator[Document]:
+        paragraphs = (f"{p}\n\n" for p in self._paragraphs(file_path) if p.strip())
+        for block in _blocks(paragraphs, self.block_chars, self.overlap_chars):
+            yield Document(page_content=re.sub(r"\n{3,}", "\n\n", block), metadata={})
+
+    def _paragraphs(self, file_path: Path) -> Iterator[str]:
+        current: List[str] = []
+        # w:tab is also a tab stop definition under w:pPr/w:tabs; only tabs in runs are text
+        runs = 0
+        with zipfile.ZipFile(file_path) as archive, archive.open("word/document.xml") as xml:
+            for event, element in iterparse(xml, events=("start", "end")):
+                tag = element.tag
+                if tag == f"{self._W}r":
+                    runs += 1 if event == "start" else -1
+                if event == "start":
+                    continue
+                if tag == f"{self._W}t":
+                    current.append(element.text or "")
+                elif tag == f"{self._W}tab" and runs:
+                    current.append("\t")
+                elif tag in (f"{self._W}br", f"{self._W}cr"):
+                    current.append("\n")
+                elif tag == f"{self._W}p":
+                    yield "".join(current)
+                    current = []
+                    element.clear()
+
+
+class PythonDocxExtractor(Extractor):
+    name = "python-docx"
+    extensions = (".docx",)
+    requires = ("docx",)
+
+    def lazy_load(self, file_path: Path) -> Iterator[Document]:
+        import docx
+        from docx.table import Table
+        from docx.text.paragraph import Paragraph
+        document = docx.Document(str(file_path))
+        # Walk the body rather than document.paragraphs and document.tables so tables stay in place
+        paragraphs = []
+        for element in document.element.body.iterchildren():
+            if element.tag == f"{DocxXmlExtractor._W}p":
+                paragraphs.append(Paragraph(element, document).text)
+            elif element.tag == f"{DocxXmlExtractor._W}tbl":
+                for row in Table(element, document).rows:
+                    paragraphs.append("\t".join(cell.text for cell in row.cells))
+        yield Document(page_content=_join_paragraphs(paragraphs), metadata={})
+
+
+class LangchainLoaderExtractor(Extractor):
+    """Wraps a langchain_community document loader (the previous defaults)."""
+
+    def __init__(self, name: str, loader_name: str, extensions: Tuple[str, ...], requires: Tuple[str, ...] = ()):
+        self.name = name
+        self.loader_name = loader_name
+        self.extensions = extensions
+        self.requires = ("langchain_community",) + requires
+
+    def lazy_load(self, file_path: Path) -> Iterator[Document]:
+        # Imported here because the loaders package is slow to import
+        loader_class = getattr(importlib.import_module("langchain_community.document_loaders"), self.loader_name)
+        yield from loader_class(str(file_path)).lazy_load()
+
+
+def _join_paragraphs(paragraphs: List[str]) -> str:
+    return re.sub(r"\n{3,}", "\n\n", "\n\n".join(p for p in paragraphs if p.strip()))
+
+
+def _blocks(pieces: Iterable[str], block_chars: int, overlap_chars: int) -> Iterator[str]:
+    """
+    Regroups streamed text into blocks of at most block_chars characters.
+
+    A block ends at its last paragraph, line or word break, and the next block
+    starts with the overlap_chars before that break, so chunks split block by
+    block still overlap across the boundary.
+    """
+    buffer = ""
+    carried = 0  # Leading characters of buffer already yielded as overlap
+    for piece in pieces:
+        buffer += piece
+        while len(buffer) >= block_chars:
+            cut = _last_break(buffer, carried, block_chars)
+            yield buffer[:cut]
+            start = max(cut - overlap_chars, 0)
+            space = buffer.find(" ", start, cut)
+            if start and space != -1:
+                start = space + 1
+            buffer = buffer[start:]
+            carried = cut - start
+    if buffer[carried:].strip():
+        yield buffer
+
+
+def _last_break(text: str, start: int, stop: int) -> int:
+    for separator in ("\n\n", "\n", " "):
+        index = text.rfind(separator, start + 1, stop)
+        if index != -1:
+            return index + len(separator)
+    return stop
+
+
+class ExtractorRegistry:
+    """
+    Extractors by file extension, in order of preference.
+
+    get() returns the named backend if it is installed, otherwise the first
+    installed one, so optional dependencies only change which backend wins.
+    """
+
+    def __init__(self):
+        self._extractors: Dict[str, List[Extractor]] = {}
+
+    def register(self, extractor: Extractor, preferred: bool = False) -> None:
+        for extension in extractor.extensions:
+            extractors = self._extractors.setdefault(extension, [])
+            extractors[:] = [e for e in extractors if e.name != extractor.name]
+            if preferred:
+                extractors.insert(0, extractor)
+            else:
+                extractors.append(extractor)
+
+    def get(self, extension: str, name: Optional[str] = None) -> Optional[Extractor]:
+        extractors = self._extractors.get(extension.lower(), [])
+        if name and name != "auto":
+            for extractor in extractors:
+                if extractor.name == name:
+                    if extractor.available():
+                        return extractor
+                    logger.warning(f"Extractor {name} is not installed, falling back to the default for {extension}")
+                    break
+            else:
+                logger.warning(f"Unknown extractor {name} for {extension}, falling back to the default")
+        return next((e for e in extractors if e.available()), None)
+
+    def get_by_name(self, name: str) -> Optional[Extractor]:
+        for extractors in self._extractors.values():
+            for extractor in extractors:
+                if extractor.name == name:
+                    return extractor
+        return None
+
+    def for_extension(self, extension: str) -> List[Extractor]:
+        return list(self._extractors.get(extension.lower(), []))
+
+
+def _extract_page_range(name: str, file_path: str, start: int, stop: int) -> List[str]:
+    """Extracts a range of PDF pages inside a page worker process."""
+    return list(extractor_registry.get_by_name(name).page_texts(Path(file_path), start, stop))
+
+
+def _default_registry() -> ExtractorRegistry:
+    page_options: Dict[str, Any] = {
+        "page_workers": settings.extraction.pdf_page_workers,
+        "parallel_min_pages": settings.extraction.pdf_parallel_min_pages
+    }
+    registry = ExtractorRegistry()
+    registry.register(TextExtractor())
+    registry.register(PdfiumExtractor(**page_options))
+    registry.register(PypdfExtractor(**page_options))
+    registry.register(LangchainLoaderExtractor("pdfminer", "PDFMinerLoader", (".pdf",), ("pdfminer",)))
+    registry.register(DocxXmlExtractor())
+    registry.register(PythonDocxExtractor())
+    registry.register(LangchainLoaderExtractor("unstructured", "UnstructuredFileLoader", (".docx",), ("unstructured",)))
+    return registry
+
+
+extractor_registry = _default_registry()
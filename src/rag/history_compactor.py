@@ -0,0 +1,160 @@
+# src/rag/history_compactor.py
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Tuple
+
+from .chat_history import ChatHistoryStore
+from .context_builder import TokenCounter, MESSAGE_OVERHEAD_TOKENS
+from src.core.text_generation import TextGenerationService
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_ROLE = "summary"
+SUMMARY_PROMPT = (
+    "Summarize the following conversation between a user and an assistant so it can replace "
+    "the original messages in later prompts. Keep facts, names, numbers, decisions and open "
+    "questions; drop pleasantries. Write at most {max_words} words.\n\n"
+    "{previous_summary}"
+    "Conversation:\n{conversation}\n\nSummary:"
+)
+SUMMARY_MESSAGE = "Summary of the earlier conversation:\n{summary}"
+
+
+@dataclass
+class HistoryView:
+    """The part of a conversation that goes into the prompt."""
+    summary: Optional[str] = None
+    summarized_count: int = 0
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+
+    def to_prompt_messages(self) -> List[Tuple[str, str]]:
+        """Returns (role, content) tuples, with the summary as a leading system message."""
+        prompt_messages = []
+        if self.summary:
+            prompt_messages.append(("system", SUMMARY_MESSAGE.format(summary=self.summary)))
+        for message in self.messages:
+            prompt_messages.append((message["role"], message["content"]))
+        return prompt_messages
+
+
+def build_history_view(entries: List[Dict[str, Any]]) -> HistoryView:
+    """
+    Collapses stored history entries into the latest summary plus the turns after it.
+
+    Summary entries record how many user/assistant messages they cover, so the
+    raw turns stay in the log and the summary simply masks the oldest ones.
+    """
+    messages = [entry for entry in entries if entry.get("role") in ("user", "assistant")]
+    view = HistoryView(messages=messages)
+    for entry in reversed(entries):
+        if entry.get("role") == SUMMARY_ROLE:
+            view.summary = entry["content"]
+            view.summarized_count = entry.get("covers", 0)
+            view.messages = messages[view.summarized_count:]
+            break
+    return view
+
+
+class HistoryCompactor:
+    """
+    Folds older turns of long conversations into a rolling summary.
+
+    After a turn is saved, the unsummarized part of the conversation is
+    measured; once it exceeds threshold_tokens, everything but the last
+    keep_messages messages is summarized by the LLM in a background task,
+    together with the previous summary. The summary is appended to the
+    conversation log and replaces those turns in later prompts, so prompt
+    size stays roughly constant however long the conversation gets.
+    """
+
+    def __init__(
+        self,
+        chat_history_store: ChatHistoryStore,
+        text_generation_service: TextGenerationService,
+        threshold_tokens: int = 1500,
+        keep_messages: int = 4,
+        summary_max_words: int = 200,
+        model_name: Optional[str] = None,
+        token_counter: Optional[TokenCounter] = None
+    ):
+        self.chat_history_store = chat_history_store
+        self.text_generation_service = text_generation_service
+        self.threshold_tokens = threshold_tokens
+        self.keep_messages = keep_messages
+        self.summary_max_words = summary_max_words
+        self.model_name = model_name
+        self.token_counter = token_counter or TokenCounter()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.compactions = 0
+        self.failures = 0
+        logger.info(f"Initialized HistoryCompactor with threshold_tokens={threshold_tokens}, keep_messages={keep_messages}")
+
+    def maybe_compact(self, chat_history_id: str, entries: List[Dict[str, Any]]) -> bool:
+        """Schedules a background compaction if the conversation is over the threshold."""
+        if chat_history_id in self._tasks:
+            return False
+        view = build_history_view(entries)
+        if len(view.messages) <= self.keep_messages:
+            return False
+        tokens = sum(
+            self.token_counter.count(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+            for message in view.messages
+        )
+        if tokens <= self.threshold_tokens:
+            return False
+
+        task = asyncio.create_task(self._compact(chat_history_id))
+        self._tasks[chat_history_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(chat_history_id, None))
+        logger.info(f"Scheduled compaction of chat history {chat_history_id} ({tokens} unsummarized tokens)")
+        return True
+
+    async def close(self) -> None:
+        """Cancels pending compactions."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "threshold_tokens": self.threshold_tokens,
+            "running": len(self._tasks),
+            "compactions": self.compactions,
+            "failures": self.failures
+        }
+
+    async def _compact(self, chat_history_id: str) -> None:
+        try:
+            view = build_history_view(await self.chat_history_store.load(chat_history_id))
+            to_summarize = view.messages[:-self.keep_messages] if self.keep_messages else view.messages
+            if not to_summarize:
+                return
+
+            previous_summary = ""
+            if view.summary:
+                previous_summary = f"Summary of the conversation so far:\n{view.summary}\n\n"
+            conversation = "\n".join(f"{message['role']}: {message['content']}" for message in to_summarize)
+            summary = await self.text_generation_service.generate_text(
+                prompt=SUMMARY_PROMPT.format(
+                    max_words=self.summary_max_words,
+                    previous_summary=previous_summary,
+                    conversation=conversation
+                ),
+                model_name=self.model_name
+            )
+
+            await self.chat_history_store.append(chat_history_id, [{
+                "role": SUMMARY_ROLE,
+                "content": summary.strip(),
+                "covers": view.summarized_count + len(to_summarize)
+            }])
+            self.compactions += 1
+            logger.info(f"Compacted {len(to_summarize)} messages of chat history {chat_history_id}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # The raw turns are still there, so the next turn simply tries again
+            self.failures += 1
+            logger.error(f"Error compacting chat history {chat_history_id}: {e}", exc_info=True)
@@ -0,0 +1,321 @@
+# src/rag/ingestion.py
+import asyncio
+import logging
+import multiprocessing
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional, Dict, Any, Tuple
+
+from pydantic import BaseModel, Field
+
+from src.core.config import settings
+from src.core.exceptions import DocumentProcessingError, DocumentNotFoundError
+from src.core.uploads import UploadManager
+from src.core import metrics
+from .document_processor import DocumentProcessor
+from .parse_workers import init_parse_worker, next_batch, stream_document
+from .vector_store import VectorStoreManager
+
+logger = logging.getLogger(__name__)
+
+class IngestionJob(BaseModel):
+    job_id: str
+    file_path: str
+    status: str = Field("queued", description="queued, parsing, embedding, completed or failed")
+    doc_id: Optional[str] = None
+    replaces: Optional[str] = Field(None, description="Document removed once this one is stored")
+    chunk_count: int = 0
+    chunks_embedded: int = 0
+    chunks_reused: int = 0
+    chunks_deleted: int = 0
+    error: Optional[str] = None
+    queued_at: str = Field(default_factory=lambda: datetime.now().isoformat())
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+
+class IngestionPipeline:
+    """
+    Runs document ingestion outside the request path.
+
+    Parsing and splitting are CPU-bound and run in a process pool; embedding
+    and writing to the vector store run in a separate thread pool. The two
+    stages are connected by bounded queues so a burst of uploads applies
+    backpressure instead of growing memory without limit. A document's
+    chunks are streamed from the parser to the embed stage in batches, so
+    memory is bounded by the batch size rather than the document size.
+    """
+
+    def __init__(
+        self,
+        document_processor: DocumentProcessor,
+        vector_store: VectorStoreManager,
+        parse_workers: Optional[int] = None,
+        embed_workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        max_tracked_jobs: int = 1000,
+        upload_manager: Optional[UploadManager] = None
+    ):
+        self.document_processor = document_processor
+        self.vector_store = vector_store
+        self.upload_manager = upload_manager
+        self.parse_workers = parse_workers or settings.ingestion.parse_workers
+        self.embed_workers = embed_workers or settings.ingestion.embed_workers
+        self.queue_size = queue_size or settings.ingestion.queue_size
+        self.batch_size = batch_size or settings.ingestion.batch_size
+        self.max_tracked_jobs = max_tracked_jobs
+        self.jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._parse_queue: Optional[asyncio.Queue] = None
+        self._embed_queue: Optional[asyncio.Queue] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._relay_pool: Optional[ThreadPoolExecutor] = None
+        self._manager = None
+        self._relays: List[Any] = []
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """Starts the worker pools and stage tasks."""
+        self._parse_queue = asyncio.Queue(maxsize=self.queue_size)
+        self._embed_queue = asyncio.Queue(maxsize=self.queue_size)
+        # Use "spawn" so workers don't inherit the parent's model threads
+        mp_context = multiprocessing.get_context("spawn")
+        self._process_pool = ProcessPoolExecutor(
+            max_workers=self.parse_workers,
+            mp_context=mp_context,
+            initializer=init_parse_worker,
+            initargs=(
+                self.document_processor.chunk_size,
+                self.document_processor.chunk_overlap,
+                self.document_processor.supported_formats
+            )
+        )
+        self._thread_pool = ThreadPoolExecutor(
+            max_workers=self.embed_workers,
+            thread_name_prefix="ingest-embed"
+        )
+        # Each parse worker relays its current document's batches through its own bounded queue
+        self._manager = mp_context.Manager()
+        self._relays = [self._manager.Queue(maxsize=2) for _ in range(self.parse_workers)]
+        self._relay_pool = ThreadPoolExecutor(
+            max_workers=self.parse_workers,
+            thread_name_prefix="ingest-relay"
+        )
+        self._tasks = [
+            asyncio.create_task(self._parse_worker(i)) for i in range(self.parse_workers)
+        ] + [
+            asyncio.create_task(self._embed_worker(i)) for i in range(self.embed_workers)
+        ]
+        logger.info(f"Started IngestionPipeline with {self.parse_workers} parse workers, "
+                    f"{self.embed_workers} embed workers, queue_size={self.queue_size}")
+
+    async def stop(self) -> None:
+        """Cancels the stage tasks and shuts down the worker pools."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._process_pool:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+        for pool in (self._thread_pool, self._relay_pool):
+            if pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+        if self._manager:
+            self._manager.shutdown()
+            self._manager = None
+        logger.info("Stopped IngestionPipeline")
+
+    async def submit(self, file_path: str, doc_id: Optional[str] = None, replaces: Optional[str] = None) -> IngestionJob:
+        """
+        Queues a file for ingestion, waiting if the parse queue is full.
+
+        When the content hash is known it doubles as the job ID, so a second
+        upload of a file that is still being ingested returns the running job.
+        If replaces is given, that document (and its uploaded file) is deleted
+        after the new one has been stored, so it stays searchable until then.
+        """
+        if doc_id:
+            running = self.jobs.get(doc_id)
+            if running and running.status not in ("completed", "failed"):
+                logger.info(f"Document {doc_id} is already being ingested, reusing job")
+                return running
+        job = IngestionJob(job_id=doc_id or uuid.uuid4().hex, file_path=file_path, doc_id=doc_id, replaces=replaces)
+        self.jobs.pop(job.job_id, None)
+        self._track(job)
+        await self._parse_queue.put(job)
+        logger.info(f"Queued ingestion job {job.job_id} for {file_path}")
+        return job
+
+    def get_job(self, job_id: str) -> Optional[IngestionJob]:
+        return self.jobs.get(job_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Returns queue depths and job counts by status."""
+        by_status: Dict[str, int] = {}
+        for job in self.jobs.values():
+            by_status[job.status] = by_status.get(job.status, 0) + 1
+        return {
+            "parse_queue_depth": self._parse_queue.qsize() if self._parse_queue else 0,
+            "embed_queue_depth": self._embed_queue.qsize() if self._embed_queue else 0,
+            "parse_workers": self.parse_workers,
+            "embed_workers": self.embed_workers,
+            "jobs": by_status
+        }
+
+    def _track(self, job: IngestionJob) -> None:
+        self.jobs[job.job_id] = job
+        # Forget the oldest finished jobs once we track too many
+        while len(self.jobs) > self.max_tracked_jobs:
+            oldest_id = next(
+                (jid for jid, j in self.jobs.items() if j.status in ("completed", "failed")),
+                None
+            )
+            if oldest_id is None:
+                break
+            del self.jobs[oldest_id]
+
+    async def _remove_replaced(self, job: IngestionJob) -> None:
+        """Deletes the document a job replaces, unless syncing the new file already did."""
+        loop = asyncio.get_running_loop()
+        try:
+            removed = await loop.run_in_executor(self._thread_pool, self.vector_store.delete_document, job.replaces)
+        except DocumentNotFoundError:
+            return
+        job.chunks_deleted += removed["deleted"]
+        if self.upload_manager and removed["source"] and removed["source"] != job.file_path:
+            await self.upload_manager.remove_file(removed["source"])
+
+    def _fail(self, job: IngestionJob, error: Exception) -> None:
+        job.status = "failed"
+        job.error = str(error)
+        job.finished_at = datetime.now().isoformat()
+
+    async def _parse_worker(self, worker_id: int) -> None:
+        loop = asyncio.get_running_loop()
+        relay = self._relays[worker_id]
+        while True:
+            job = await self._parse_queue.get()
+            # Batches of this job for the embed stage, ended by None or the parse error
+            batches: Optional[asyncio.Queue] = None
+            try:
+                job.status = "parsing"
+                job.started_at = datetime.now().isoformat()
+                logger.info(f"Parse worker {worker_id} processing {job.file_path}")
+                started = time.perf_counter()
+                future = self._process_pool.submit(stream_document, job.file_path, self.batch_size, relay, job.doc_id)
+                while True:
+                    chunks = await loop.run_in_executor(self._relay_pool, next_batch, relay, future)
+                    if chunks is None:
+                        break
+                    if batches is None:
+                        job.doc_id = chunks[0].metadata.get("doc_id")
+                        batches = asyncio.Queue(maxsize=2)
+                        await self._embed_queue.put((job, batches))
+                    job.chunk_count += len(chunks)
+                    await batches.put(chunks)
+                try:
+                    await asyncio.wrap_future(future)
+                except Exception as e:
+                    if batches is None:
+                        raise
+                    logger.error(f"Error processing document {job.file_path}: {e}")
+                    await batches.put(e)
+                    continue
+                metrics.INGESTION_STAGE_LATENCY.labels("parse").observe(time.perf_counter() - started)
+                if batches is None:
+                    logger.warning(f"No chunks generated for document: {job.file_path}")
+                    job.status = "completed"
+                    job.finished_at = datetime.now().isoformat()
+                    continue
+                await batches.put(None)
+            except DocumentProcessingError as e:
+                logger.error(f"Error processing document {job.file_path}: {e}")
+                self._fail(job, e)
+            except Exception as e:
+                logger.error(f"Unexpected error processing document {job.file_path}: {e}", exc_info=True)
+                self._fail(job, e)
+            finally:
+                self._parse_queue.task_done()
+
+    async def _embed_worker(self, worker_id: int) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job, batches = await self._embed_queue.get()
+            added: List[str] = []
+            ended = False
+            try:
+                job.status = "embedding"
+                logger.info(f"Embed worker {worker_id} adding chunks from {job.file_path}")
+                if await loop.run_in_executor(self._thread_pool, self.vector_store.has_document, job.doc_id):
+                    logger.info(f"Document {job.doc_id} is unchanged, skipping ingestion")
+                    ended = True
+                    job.chunks_reused = await self._drain(batches)
+                else:
+                    kept: List[Tuple[str, Dict[str, Any]]] = []
+                    occurrences: Dict[str, int] = {}
+                    metadata: Optional[Dict[str, Any]] = None
+                    elapsed = 0.0
+                    while True:
+                        chunks = await batches.get()
+                        if chunks is None or isinstance(chunks, Exception):
+                            ended = True
+                            if chunks is None:
+                                break
+                            raise chunks
+                        if metadata is None:
+                            metadata = dict(chunks[0].metadata)
+                        started = time.perf_counter()
+                        written = await loop.run_in_executor(
+                            self._thread_pool,
+                            self.vector_store.write_document_batch,
+                            VectorStoreManager._chunk_ids(chunks, occurrences),
+                            chunks
+                        )
+                        elapsed += time.perf_counter() - started
+                        added.extend(written["added"])
+                        kept.extend(written["kept"])
+                        metrics.INGESTED_CHUNKS.inc(len(chunks))
+                    started = time.perf_counter()
+                    result = await loop.run_in_executor(
+                        self._thread_pool, self.vector_store.finish_document, job.doc_id, metadata, job.chunk_count, kept
+                    )
+                    elapsed += time.perf_counter() - started
+                    metrics.INGESTION_STAGE_LATENCY.labels("embed").observe(elapsed)
+                    if elapsed > 0:
+                        metrics.INGESTION_CHUNKS_PER_SECOND.observe(job.chunk_count / elapsed)
+                    job.chunks_embedded = len(added)
+                    job.chunks_reused = len(kept)
+                    job.chunks_deleted = result["deleted"]
+                    added = []
+                if job.replaces and job.replaces != job.doc_id:
+                    await self._remove_replaced(job)
+                job.status = "completed"
+                job.finished_at = datetime.now().isoformat()
+                logger.info(f"Successfully processed and added document: {job.file_path}")
+            except Exception as e:
+                logger.error(f"Error adding document {job.file_path} to vector store: {e}", exc_info=True)
+                self._fail(job, e)
+                # Only what this job added goes; an earlier revision was never touched
+                if added:
+                    try:
+                        await loop.run_in_executor(self._thread_pool, self.vector_store.delete_chunks, added)
+                    except Exception as cleanup_error:
+                        logger.error(f"Error removing partly added document {job.file_path}: {cleanup_error}")
+                if not ended:
+                    await self._drain(batches)
+            finally:
+                self._embed_queue.task_done()
+
+    @staticmethod
+    async def _drain(batches: asyncio.Queue) -> int:
+        """Discards a job's remaining batches so its parse worker can finish; returns the chunks discarded."""
+        count = 0
+        while True:
+            chunks = await batches.get()
+            if chunks is None or isinstance(chunks, Exception):
+                return count
+            count += len(chunks)
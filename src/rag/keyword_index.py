@@ -0,0 +1,458 @@
+# src/rag/keyword_index.py
+import json
+import logging
+import math
+import os
+import pickle
+import re
+import threading
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Any, List, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Keeps identifiers such as "ERR-1042", "v2.3.1" or "part_no_77" intact
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+_SPLIT_RE = re.compile(r"[-_./]")
+# Metadata fields the index can filter on without asking the vector store
+FILTER_FIELDS = ("doc_id", "source")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercases and tokenizes text, emitting compound identifiers and their parts."""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        if _SPLIT_RE.search(token):
+            tokens.extend(part for part in _SPLIT_RE.split(token) if part)
+    return tokens
+
+
+class KeywordIndex:
+    """
+    Persistent BM25 inverted index over chunk text.
+
+    Each chunk gets a dense integer number; postings are kept per term as two
+    parallel uint32 arrays (chunk numbers and term frequencies) so they stay
+    compact and can be scored with vectorized NumPy operations. Scores are
+    accumulated over the query terms' postings only, so a query costs time
+    in proportion to those postings, not to the size of the index. The
+    FILTER_FIELDS metadata is kept as a code per chunk plus the chunk
+    numbers of each value, so doc_id and source filters are intersected
+    with the postings directly. Deletes are tombstones that are compacted
+    away once they make up a quarter of the index. Changes are appended to a
+    log and folded into a snapshot periodically, so incremental updates
+    don't rewrite the whole index.
+    """
+
+    SNAPSHOT_FILE = "index.pkl"
+    LOG_FILE = "changes.jsonl"
+
+    def __init__(self, directory: str, k1: float = 1.5, b: float = 0.75, snapshot_every: int = 50_000):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.k1 = k1
+        self.b = b
+        self.snapshot_every = snapshot_every
+        self._lock = threading.RLock()
+        self._save_lock = threading.Lock()
+        self._reset()
+        self._load()
+
+    def _reset(self) -> None:
+        self.chunk_ids: List[str] = []
+        self.chunk_numbers: Dict[str, int] = {}
+        self.lengths = array("I")
+        self.alive = bytearray()
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.live_count = 0
+        self.live_length = 0
+        # Per filter field: the values (code 0 is "unknown"), each chunk's
+        # code, and the chunk numbers seen with each code (possibly stale;
+        # the chunk's current code decides)
+        self.field_values: Dict[str, List[str]] = {f: [""] for f in FILTER_FIELDS}
+        self.field_codes: Dict[str, Dict[str, int]] = {f: {"": 0} for f in FILTER_FIELDS}
+        self.chunk_codes: Dict[str, array] = {f: array("I") for f in FILTER_FIELDS}
+        self.value_chunks: Dict[str, Dict[int, array]] = {f: {} for f in FILTER_FIELDS}
+        # False while chunks indexed before filter fields existed lack them
+        self.fields_complete = True
+        self._logged_ops = 0
+
+    def __len__(self) -> int:
+        return self.live_count
+
+    def add(self, ids: List[str], texts: List[str], metadatas: Optional[List[Dict[str, Any]]] = None) -> None:
+        """Indexes chunks, replacing any chunk already indexed under the same ID."""
+        with self._lock:
+            entries = []
+            for i, (chunk_id, text) in enumerate(zip(ids, texts)):
+                terms = dict(Counter(tokenize(text)))
+                fields = self._fields(metadatas[i]) if metadatas else None
+                self._add(chunk_id, terms, fields)
+                entries.append({"op": "add", "id": chunk_id, "terms": terms, "fields": fields})
+            snapshot_due = self._append_log(entries)
+        if snapshot_due:
+            self.save()
+
+    def tag(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        """Updates the filter fields of indexed chunks, e.g. after their metadata changed."""
+        with self._lock:
+            entries = []
+            for chunk_id, metadata in zip(ids, metadatas):
+                if chunk_id in self.chunk_numbers:
+                    fields = self._fields(metadata)
+                    self._tag(self.chunk_numbers[chunk_id], fields)
+                    entries.append({"op": "tag", "id": chunk_id, "fields": fields})
+            snapshot_due = self._append_log(entries)
+        if snapshot_due:
+            self.save()
+
+    def delete(self, ids: Iterable[str]) -> None:
+        """Removes chunks from the index."""
+        with self._lock:
+            ids = [chunk_id for chunk_id in ids if chunk_id in self.chunk_numbers]
+            if not ids:
+                return
+            for chunk_id in ids:
+                self._delete(chunk_id)
+            snapshot_due = self._append_log([{"op": "delete", "ids": ids}])
+            if len(self.chunk_ids) and self.live_count < 0.75 * len(self.chunk_ids):
+                self._compact()
+                snapshot_due = True
+        if snapshot_due:
+            self.save()
+
+    def supports_filter(self, where: Optional[Dict[str, Any]]) -> bool:
+        """Whether search can apply a Chroma-style where filter by itself."""
+        with self._lock:
+            return self.fields_complete and self._filter_numbers(where) is not None
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        chunk_ids: Optional[Iterable[str]] = None,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Returns up to k (chunk_id, score) pairs ranked by BM25.
+
+        Only chunks in chunk_ids and matching where (see supports_filter) are
+        ranked, so a filter applies before the top k is taken rather than
+        after.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            if not terms or not self.live_count:
+                return []
+            allowed = None
+            if where:
+                allowed = self._filter_numbers(where)
+                if allowed is None:
+                    raise ValueError(f"Unsupported keyword index filter: {where}")
+            if chunk_ids is not None:
+                numbers = np.unique(np.array(
+                    [self.chunk_numbers[chunk_id] for chunk_id in chunk_ids if chunk_id in self.chunk_numbers],
+                    dtype=np.uint32
+                ))
+                allowed = numbers if allowed is None else np.intersect1d(allowed, numbers, assume_unique=True)
+            if allowed is not None and not len(allowed):
+                return []
+
+            lengths = _view(self.lengths)
+            alive = np.frombuffer(self.alive, dtype=np.uint8)
+            avg_length = self.live_length / self.live_count
+            matched_numbers, matched_scores = [], []
+            for term in terms:
+                posting = self.postings.get(term)
+                if posting is None:
+                    continue
+                numbers = _view(posting[0])
+                tfs = _view(posting[1])
+                df = len(numbers)
+                idf = math.log(1 + (self.live_count - df + 0.5) / (df + 0.5))
+                if allowed is not None:
+                    positions = _positions(numbers, allowed)
+                    numbers, tfs = numbers[positions], tfs[positions]
+                live = alive[numbers].astype(bool)
+                numbers = numbers[live]
+                tf = tfs[live].astype(np.float32)
+                norm = self.k1 * (1 - self.b + self.b * lengths[numbers] / avg_length)
+                matched_numbers.append(numbers)
+                matched_scores.append(idf * tf * (self.k1 + 1) / (tf + norm))
+            if not matched_numbers:
+                return []
+            numbers = np.concatenate(matched_numbers)
+            scores = np.concatenate(matched_scores)
+            if len(matched_numbers) > 1:
+                # A chunk appears once per matching term; sum its term scores
+                numbers, inverse = np.unique(numbers, return_inverse=True)
+                scores = np.bincount(inverse, weights=scores)
+            if not len(numbers):
+                return []
+
+            k = min(k, len(numbers))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return [(self.chunk_ids[numbers[i]], float(scores[i])) for i in top if scores[i] > 0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset()
+        self.save()
+
+    def save(self) -> None:
+        """
+        Writes a snapshot atomically and truncates the change log.
+
+        The index is copied under the lock and pickled outside it, so searches
+        and updates only wait for the copy. Changes logged up to the copy are
+        moved aside and dropped once the snapshot is in place; later changes
+        go to a fresh log.
+        """
+        log_path = self.directory / self.LOG_FILE
+        pending_path = self.directory / f"{self.LOG_FILE}.pending"
+        with self._save_lock:
+            with self._lock:
+                snapshot = {
+                    "chunk_ids": list(self.chunk_ids),
+                    "lengths": self.lengths[:],
+                    "alive": bytes(self.alive),
+                    "postings": {term: (numbers[:], tfs[:]) for term, (numbers, tfs) in self.postings.items()},
+                    "live_count": self.live_count,
+                    "live_length": self.live_length,
+                    "fields": {
+                        f: (list(self.field_values[f]), self.chunk_codes[f][:],
+                            {code: numbers[:] for code, numbers in self.value_chunks[f].items()})
+                        for f in FILTER_FIELDS
+                    },
+                    "fields_complete": self.fields_complete
+                }
+                if pending_path.exists() and log_path.exists():
+                    # Left over from an interrupted save; keep both until this snapshot lands
+                    with open(log_path) as src, open(pending_path, "a") as dst:
+                        dst.write(src.read())
+                    log_path.unlink()
+                elif log_path.exists():
+                    os.replace(log_path, pending_path)
+                self._logged_ops = 0
+            tmp_path = self.directory / f"{self.SNAPSHOT_FILE}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.directory / self.SNAPSHOT_FILE)
+            pending_path.unlink(missing_ok=True)
+            logger.info(f"Saved keyword index snapshot with {snapshot['live_count']} chunks")
+
+    def _add(self, chunk_id: str, terms: Dict[str, int], fields: Optional[Dict[str, str]] = None) -> None:
+        if chunk_id in self.chunk_numbers:
+            self._delete(chunk_id)
+        number = len(self.chunk_ids)
+        self.chunk_ids.append(chunk_id)
+        self.chunk_numbers[chunk_id] = number
+        length = sum(terms.values())
+        self.lengths.append(length)
+        self.alive.append(1)
+        for f in FILTER_FIELDS:
+            self.chunk_codes[f].append(0)
+        if fields is None:
+            self.fields_complete = False
+        else:
+            self._tag(number, fields)
+        self.live_count += 1
+        self.live_length += length
+        for term, tf in terms.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = (array("I"), array("I"))
+            posting[0].append(number)
+            posting[1].append(tf)
+
+    def _tag(self, number: int, fields: Dict[str, str]) -> None:
+        for f in FILTER_FIELDS:
+            value = fields.get(f) or ""
+            code = self.field_codes[f].get(value)
+            if code is None:
+                code = self.field_codes[f][value] = len(self.field_values[f])
+                self.field_values[f].append(value)
+            if code != self.chunk_codes[f][number]:
+                self.chunk_codes[f][number] = code
+                if code:
+                    self.value_chunks[f].setdefault(code, array("I")).append(number)
+
+    @staticmethod
+    def _fields(metadata: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        metadata = metadata or {}
+        return {f: str(metadata[f]) for f in FILTER_FIELDS if metadata.get(f) is not None}
+
+    def _filter_numbers(self, where: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """
+        Returns the sorted chunk numbers matching a where filter, or None if it uses
+        anything besides equality, $eq, $in and $and on FILTER_FIELDS.
+        """
+        if not isinstance(where, dict) or not where:
+            return None
+        matches = []
+        for key, condition in where.items():
+            if key == "$and":
+                if not isinstance(condition, list) or not condition:
+                    return None
+                for sub in condition:
+                    numbers = self._filter_numbers(sub)
+                    if numbers is None:
+                        return None
+                    matches.append(numbers)
+            elif key in FILTER_FIELDS:
+                if isinstance(condition, dict):
+                    if len(condition) != 1:
+                        return None
+                    op, value = next(iter(condition.items()))
+                    if op == "$eq":
+                        values = [value]
+                    elif op == "$in" and isinstance(value, list):
+                        values = value
+                    else:
+                        return None
+                else:
+                    values = [condition]
+                matches.append(self._field_numbers(key, values))
+            else:
+                return None
+        result = matches[0]
+        for numbers in matches[1:]:
+            result = np.intersect1d(result, numbers, assume_unique=True)
+        return result
+
+    def _field_numbers(self, field: str, values: List[Any]) -> np.ndarray:
+        codes = [self.field_codes[field].get(str(value)) for value in values]
+        codes = [code for code in codes if code]
+        if not codes:
+            return np.zeros(0, dtype=np.uint32)
+        numbers = np.concatenate([_view(self.value_chunks[field][code]) for code in codes])
+        current = _view(self.chunk_codes[field])[numbers]
+        return np.unique(numbers[np.isin(current, codes)])
+
+    def _delete(self, chunk_id: str) -> None:
+        number = self.chunk_numbers.pop(chunk_id)
+        if self.alive[number]:
+            self.alive[number] = 0
+            self.live_count -= 1
+            self.live_length -= self.lengths[number]
+
+    def _compact(self) -> None:
+        """Renumbers live chunks and drops tombstoned postings."""
+        remap = array("i", [-1]) * len(self.chunk_ids)
+        chunk_ids, lengths = [], array("I")
+        old_fields = (self.field_values, self.chunk_codes)
+        self.field_values = {f: [""] for f in FILTER_FIELDS}
+        self.field_codes = {f: {"": 0} for f in FILTER_FIELDS}
+        self.chunk_codes = {f: array("I") for f in FILTER_FIELDS}
+        self.value_chunks = {f: {} for f in FILTER_FIELDS}
+        for number, chunk_id in enumerate(self.chunk_ids):
+            if self.alive[number]:
+                remap[number] = len(chunk_ids)
+                chunk_ids.append(chunk_id)
+                lengths.append(self.lengths[number])
+                for f in FILTER_FIELDS:
+                    self.chunk_codes[f].append(0)
+                # Re-codes the values, dropping those of deleted chunks and stale entries
+                self._tag(remap[number], {
+                    f: old_fields[0][f][old_fields[1][f][number]] for f in FILTER_FIELDS
+                })
+        postings = {}
+        for term, (numbers, tfs) in self.postings.items():
+            new_numbers, new_tfs = array("I"), array("I")
+            for number, tf in zip(numbers, tfs):
+                if remap[number] >= 0:
+                    new_numbers.append(remap[number])
+                    new_tfs.append(tf)
+            if new_numbers:
+                postings[term] = (new_numbers, new_tfs)
+        self.chunk_ids = chunk_ids
+        self.chunk_numbers = {chunk_id: i for i, chunk_id in enumerate(chunk_ids)}
+        self.lengths = lengths
+        self.alive = bytearray([1]) * len(chunk_ids)
+        self.postings = postings
+        logger.info(f"Compacted keyword index to {len(chunk_ids)} chunks")
+
+    def _append_log(self, entries: List[Dict]) -> bool:
+        """Logs changes; returns True once enough have accumulated for a new snapshot."""
+        with open(self.directory / self.LOG_FILE, "a") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+        self._logged_ops += len(entries)
+        return self._logged_ops >= self.snapshot_every
+
+    def _load(self) -> None:
+        snapshot_path = self.directory / self.SNAPSHOT_FILE
+        if snapshot_path.exists():
+            with open(snapshot_path, "rb") as f:
+                snapshot = pickle.load(f)
+            self.chunk_ids = snapshot["chunk_ids"]
+            self.lengths = snapshot["lengths"]
+            self.alive = bytearray(snapshot["alive"])
+            self.postings = snapshot["postings"]
+            self.live_count = snapshot["live_count"]
+            self.live_length = snapshot["live_length"]
+            self.chunk_numbers = {
+                chunk_id: i for i, chunk_id in enumerate(self.chunk_ids) if self.alive[i]
+            }
+            if "fields" in snapshot:
+                for f, (values, codes, chunks) in snapshot["fields"].items():
+                    self.field_values[f] = values
+                    self.field_codes[f] = {value: code for code, value in enumerate(values)}
+                    self.chunk_codes[f] = codes
+                    self.value_chunks[f] = chunks
+                self.fields_complete = snapshot["fields_complete"]
+            else:
+                # Written before filter fields existed
+                for f in FILTER_FIELDS:
+                    self.chunk_codes[f] = array("I", [0]) * len(self.chunk_ids)
+                self.fields_complete = not self.chunk_ids
+
+        # A .pending log is one an interrupted save had moved aside; it is older than the current log
+        for log_path in (self.directory / f"{self.LOG_FILE}.pending", self.directory / self.LOG_FILE):
+            if log_path.exists():
+                self._replay(log_path)
+        logger.info(f"Loaded keyword index from {self.directory} with {self.live_count} chunks")
+
+    def _replay(self, log_path: Path) -> None:
+        with open(log_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn last line from an interrupted write
+                    logger.warning("Skipping corrupt keyword index log entry")
+                    continue
+                if entry["op"] == "add":
+                    self._add(entry["id"], entry["terms"], entry.get("fields"))
+                elif entry["op"] == "tag":
+                    if entry["id"] in self.chunk_numbers:
+                        self._tag(self.chunk_numbers[entry["id"]], entry["fields"])
+                else:
+                    for chunk_id in entry["ids"]:
+                        if chunk_id in self.chunk_numbers:
+                            self._delete(chunk_id)
+                self._logged_ops += 1
+
+
+def _view(values: array) -> np.ndarray:
+    """Wraps a uint32 array without copying it."""
+    if not len(values):
+        return np.zeros(0, dtype=np.uint32)
+    return np.frombuffer(values, dtype=np.uint32)
+
+
+def _positions(numbers: np.ndarray, allowed: np.ndarray) -> np.ndarray:
+    """Positions in a sorted posting of the chunk numbers that are also in the sorted allowed array."""
+    if len(allowed) < len(numbers):
+        # Narrow filter: look each allowed chunk up in the posting
+        positions = np.searchsorted(numbers, allowed)
+        positions = positions[positions < len(numbers)]
+        return positions[numbers[positions] == allowed[:len(positions)]]
+    found = np.searchsorted(allowed, numbers)
+    found[found == len(allowed)] = 0
+    return np.nonzero(allowed[found] == numbers)[0]
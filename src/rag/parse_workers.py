@@ -0,0 +1,52 @@
+# src/rag/parse_workers.py
+import queue
+from typing import List, Optional
+
+from langchain_core.documents import Document
+
+from .document_processor import DocumentProcessor
+
+# Per-process DocumentProcessor used by the parse workers of the ingestion
+# pipeline and the bulk loader
+_worker_processor: Optional[DocumentProcessor] = None
+
+def init_parse_worker(chunk_size: int, chunk_overlap: int, supported_formats: List[str]) -> None:
+    """Initializes the DocumentProcessor inside a parse worker process."""
+    global _worker_processor
+    _worker_processor = DocumentProcessor(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        supported_formats=supported_formats
+    )
+
+def stream_document(file_path: str, batch_size: int, batches, doc_id: Optional[str] = None) -> int:
+    """
+    Sends a document's chunks to the parent in batches, from a parse worker process.
+
+    batches is a bounded multiprocessing queue, so the worker stops parsing
+    while the consumer falls behind. None marks the end of the document,
+    also on failure; the error itself is raised through the future. doc_id
+    saves hashing the file again when the caller already knows it.
+    """
+    count = 0
+    try:
+        for batch in _worker_processor.iter_chunk_batches(file_path, batch_size, doc_id):
+            batches.put(batch)
+            count += len(batch)
+    finally:
+        batches.put(None)
+    return count
+
+def next_batch(relay, future) -> Optional[List[Document]]:
+    """Waits for a worker's next batch; None at the end or if the worker died without sending it."""
+    while True:
+        try:
+            return relay.get(timeout=1.0)
+        except queue.Empty:
+            if future.done():
+                # Whatever the worker sent is queued by the time its future is
+                # done, so a batch that raced the timeout is still there
+                try:
+                    return relay.get_nowait()
+                except queue.Empty:
+                    return None
@@ -1,35 +1,134 @@
 # src/rag/query_engine.py
-import logging
+import asyncio
+import hashlib
 import json
-from typing import Optional, Dict, Any, List
-from datetime import datetime
-from pathlib import Path
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, List, AsyncIterator, Tuple
 
 from .vector_store import VectorStoreManager
+from .answer_cache import AnswerCache
+from .reranker import Reranker, CrossEncoderReranker
+from .context_builder import ContextBuilder
+from .chat_history import ChatHistoryStore
+from .history_compactor import HistoryCompactor, build_history_view
+from .single_flight import SingleFlight
+from .embedding_cache import normalize_text
 from src.core.text_generation import TextGenerationService
 from src.core.config import settings
-from src.core.exceptions import QueryError
+from src.core import metrics
+from src.core.exceptions import QueryError, ModelBusyError
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
 logger = logging.getLogger(__name__)
 
+NO_CONTEXT_RESPONSE = "I couldn't find any relevant information to answer your question."
+SYSTEM_PROMPT = (
+    "You are a helpful AI assistant that answers questions based on the provided context. "
+    "If the context doesn't contain relevant information, say you don't know. "
+    "Always cite your sources by referring to the document names."
+)
+USER_PROMPT = "Context:\n{context}\n\nQuestion:\n{question}"
+SEARCH_MODES = ("vector", "keyword", "hybrid")
+
+@dataclass
+class PreparedQuery:
+    """Everything needed to answer one query, gathered before generation."""
+    query: str
+    model: str
+    k: int
+    filter_dict: Optional[Dict[str, Any]]
+    search_mode: str = "vector"
+    keyword_weight: float = 0.5
+    history_messages: List[Any] = field(default_factory=list)
+    use_cache: bool = False
+    query_embedding: Optional[List[float]] = None
+    relevant_docs: List[Any] = field(default_factory=list)
+    prompt: List[Any] = field(default_factory=list)
+    context_usage: Optional[Dict[str, int]] = None
+    cached: Optional[Dict[str, Any]] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def cache_scope(self) -> Dict[str, Any]:
+        """Everything besides the query text that shapes the answer."""
+        scope = {"filter": self.filter_dict, "model": self.model, "k": self.k, "search_mode": self.search_mode}
+        if self.search_mode == "hybrid":
+            scope["keyword_weight"] = self.keyword_weight
+        return scope
+
+    @property
+    def sources(self) -> List[str]:
+        if self.cached is not None:
+            return self.cached["sources"]
+        return RAGQueryEngine._extract_sources(self.relevant_docs)
+
+
 class RAGQueryEngine:
-    def __init__(self, vector_store: VectorStoreManager, text_generation_service: TextGenerationService):
+    def __init__(
+        self,
+        vector_store: VectorStoreManager,
+        text_generation_service: TextGenerationService,
+        chat_histories_dir: Optional[str] = None
+    ):
         self.vector_store = vector_store
         self.text_generation_service = text_generation_service
         self._initialize_prompt_template()
-        self.chat_histories_dir = Path(settings.chat_histories_dir)
-        self.chat_histories_dir.mkdir(parents=True, exist_ok=True)
+        self.chat_history_store = ChatHistoryStore(
+            chat_histories_dir or settings.chat_histories_dir,
+            cache_size=settings.chat_history.cache_size
+        )
+        self.answer_cache: Optional[AnswerCache] = None
+        if settings.answer_cache.enabled:
+            self.answer_cache = AnswerCache(
+                ttl_seconds=settings.answer_cache.ttl_seconds,
+                max_entries=settings.answer_cache.max_entries,
+                semantic_threshold=settings.answer_cache.semantic_threshold if settings.answer_cache.semantic_enabled else None
+            )
+            self.vector_store.add_change_listener(self.answer_cache.invalidate_documents)
+        self.rerank_enabled = settings.rerank.enabled
+        self.reranker: Reranker = Reranker()
+        if self.rerank_enabled:
+            self.reranker = CrossEncoderReranker(
+                model_name=settings.rerank.model,
+                batch_size=settings.rerank.batch_size,
+                budget_ms=settings.rerank.budget_ms,
+                cache_size=settings.rerank.cache_size
+            )
+        self.context_builder = ContextBuilder(
+            max_prompt_tokens=settings.context.max_prompt_tokens,
+            history_share=settings.context.history_share,
+            duplicate_threshold=settings.context.duplicate_threshold,
+            model_prompt_tokens=settings.context.model_prompt_tokens
+        )
+        self.single_flight = SingleFlight()
+        # Embedding and vector search block, so they run off the event loop
+        self.search_executor = ThreadPoolExecutor(
+            max_workers=settings.retrieval.search_workers,
+            thread_name_prefix="rag-search"
+        )
+        self.history_compactor: Optional[HistoryCompactor] = None
+        if settings.chat_history.compaction_enabled:
+            self.history_compactor = HistoryCompactor(
+                self.chat_history_store,
+                self.text_generation_service,
+                threshold_tokens=settings.chat_history.compaction_threshold_tokens,
+                keep_messages=settings.chat_history.compaction_keep_messages,
+                summary_max_words=settings.chat_history.summary_max_words,
+                model_name=settings.chat_history.summary_model,
+                token_counter=self.context_builder.token_counter
+            )
         logger.info("Initialized RAGQueryEngine with TextGenerationService")
 
     def _initialize_prompt_template(self):
         """Initializes the chat prompt template."""
         self.prompt_template = ChatPromptTemplate.from_messages([
-            ("system", "You are a helpful AI assistant that answers questions based on the provided context. "
-                       "If the context doesn't contain relevant information, say you don't know. "
-                       "Always cite your sources by referring to the document names."),
+            ("system", SYSTEM_PROMPT),
             MessagesPlaceholder(variable_name="chat_history"),
-            ("user", "Context:\n{context}\n\nQuestion:\n{question}")
+            ("user", USER_PROMPT)
         ])
         logger.info("Initialized prompt template")
 
@@ -41,79 +140,419 @@ class RAGQueryEngine:
         filter_dict: Optional[Dict[str, Any]] = None,
         k_documents: int = 6,
         model_name: Optional[str] = None,
-        doc_id: Optional[str] = None
-    ) -> str:
-        """Generates a response using RAG with optional model selection."""
+        doc_id: Optional[str] = None,
+        search_mode: Optional[str] = None,
+        keyword_weight: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Generates a response using RAG with optional model selection.
+
+        Returns a dict with the response text, its sources and the prompt
+        token usage (None when the answer did not need a prompt), plus
+        per-stage timings in milliseconds. Concurrent requests with the same
+        question, settings and conversation content share one retrieval and
+        generation, even across conversations; each still saves its own turn.
+        """
+        started = time.perf_counter()
         try:
-            # --- Combine filter_dict and doc_id filter ---
-            final_filter = {}
-            if filter_dict:
-                final_filter.update(filter_dict)
-            if doc_id:
-                final_filter["doc_id"] = doc_id
-
-            # Retrieve relevant documents
-            relevant_docs = self.vector_store.similarity_search(
-                query,
-                k=k_documents,
-                filter_dict=final_filter if final_filter else None
+            history_messages, history_timings = await self._history_messages(chat_history_id, chat_history)
+            key = self._flight_key(
+                query, history_messages, filter_dict, k_documents, model_name, doc_id, search_mode, keyword_weight
             )
+            result = await self.single_flight.do(key, lambda: self._answer(
+                query, history_messages, filter_dict, k_documents, model_name, doc_id, search_mode, keyword_weight
+            ))
+            if chat_history_id and result["answered"]:
+                await self._save_chat_history(chat_history_id, query, result["response"])
+            timings = {**history_timings, **result["timings"], "total_ms": _elapsed_ms(started)}
+            return {
+                "response": result["response"],
+                "sources": result["sources"],
+                "context_usage": result["context_usage"],
+                "timings": timings
+            }
 
-            if not relevant_docs:
-                logger.warning(f"No relevant documents found for query: {query}")
-                return "I couldn't find any relevant information to answer your question."
-
-            # Format the context
-            context = self._format_context(relevant_docs)
-            
-            # Load chat history if provided
-            history_messages = []
-            if chat_history_id:
-                history_messages = self._load_chat_history(chat_history_id)
-            elif chat_history:
-                history_messages = chat_history
-
-            # Format the prompt
-            formatted_prompt = self.prompt_template.format_messages(
-                context=context,
-                question=query,
-                chat_history=history_messages
-            )
+        except ModelBusyError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in generate_response: {e}", exc_info=True)
+            raise QueryError(f"Failed to generate response: {str(e)}")
 
-            # Generate the response using the TextGenerationService
-            # Use the current model if none is specified
-            response = await self.text_generation_service.generate_text(
-                prompt=formatted_prompt,
-                model_name=model_name or self.text_generation_service.current_model
-            )
+    async def _answer(
+        self,
+        query: str,
+        history_messages: List[Any],
+        filter_dict: Optional[Dict[str, Any]],
+        k_documents: int,
+        model_name: Optional[str],
+        doc_id: Optional[str],
+        search_mode: Optional[str],
+        keyword_weight: Optional[float]
+    ) -> Dict[str, Any]:
+        """Produces the answer for generate_response; runs once per coalesced flight."""
+        # Use the current model if none is specified
+        prepared = await self._prepare_generation(
+            query, history_messages, filter_dict, k_documents, model_name, doc_id, search_mode, keyword_weight
+        )
 
-            # Save chat history if chat_history_id is provided
-            if chat_history_id:
-                self._save_chat_history(
-                    chat_history_id,
-                    query,
-                    response,
-                    history_messages
-                )
+        if prepared.cached is not None:
+            response = prepared.cached["response"]
+            logger.info(f"Answered query from cache: '{query[:50]}...'")
+        elif not prepared.relevant_docs:
+            logger.warning(f"No relevant documents found for query: {query}")
+            return {
+                "response": NO_CONTEXT_RESPONSE,
+                "sources": [],
+                "context_usage": None,
+                "answered": False,
+                "timings": prepared.timings
+            }
+        else:
+            # Generate the response using the TextGenerationService; streamed so TTFT can be measured
+            generation_started = time.perf_counter()
+            parts = []
+            async for token in self.text_generation_service.stream_text(
+                prompt=prepared.prompt,
+                model_name=prepared.model
+            ):
+                if not parts:
+                    prepared.timings["ttft_ms"] = _elapsed_ms(generation_started)
+                parts.append(token)
+            prepared.timings["generation_ms"] = _elapsed_ms(generation_started)
+            response = "".join(parts)
+            self._cache_answer(prepared, response)
+            logger.info(f"Generated response using model: {prepared.model}")
 
-            logger.info(f"Generated response using model: {model_name or self.text_generation_service.current_model}")
-            return response
+        metrics.observe_query_timings(prepared.timings)
+        return {
+            "response": response,
+            "sources": prepared.sources,
+            "context_usage": prepared.context_usage,
+            "answered": True,
+            "timings": prepared.timings
+        }
 
+    async def stream_response(
+        self,
+        query: str,
+        chat_history_id: Optional[str] = None,
+        chat_history: Optional[List[Dict[str, Any]]] = None,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        k_documents: int = 6,
+        model_name: Optional[str] = None,
+        doc_id: Optional[str] = None,
+        search_mode: Optional[str] = None,
+        keyword_weight: Optional[float] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streams a RAG response as a sequence of events.
+
+        Yields a "sources" event once retrieval is done, a "token" event for
+        every chunk produced by the LLM and a final "done" event carrying the
+        same stage timings as generate_response plus end-to-end ones.
+        Requests that generate_response would coalesce subscribe to one
+        shared stream instead. Each request saves its own turn to chat
+        history, and only after generation has completed, so closing the
+        iterator early (e.g. on client disconnect) cancels the upstream
+        generation, once no other subscriber needs it, without persisting a
+        partial answer.
+        """
+        started = time.perf_counter()
+        history_messages, history_timings = await self._history_messages(chat_history_id, chat_history)
+        key = self._flight_key(
+            query, history_messages, filter_dict, k_documents, model_name, doc_id, search_mode, keyword_weight
+        )
+        events = self.single_flight.stream(key, lambda: self._stream_answer(
+            query, history_messages, filter_dict, k_documents, model_name, doc_id, search_mode, keyword_weight
+        ))
+
+        first_token_at = None
+        result = None
+        async with aclosing(events):
+            async for event in events:
+                if event["event"] == "result":
+                    result = event["data"]
+                    continue
+                if event["event"] == "token" and first_token_at is None:
+                    first_token_at = time.perf_counter()
+                yield event
+
+        if chat_history_id and result["answered"]:
+            await self._save_chat_history(chat_history_id, query, result["response"])
+        yield {
+            "event": "done",
+            "data": {
+                "chat_history_id": chat_history_id,
+                "model": result["model"],
+                "cached": result["cached"],
+                "context_usage": result["context_usage"],
+                # Stage timings are the engine's, as on /query; the request_* and
+                # total_ms fields are end to end for this caller
+                "timings": {
+                    **history_timings,
+                    **result["timings"],
+                    "request_ttft_ms": round((first_token_at - started) * 1000, 2) if first_token_at else None,
+                    "total_ms": _elapsed_ms(started)
+                }
+            }
+        }
+
+    async def _stream_answer(
+        self,
+        query: str,
+        history_messages: List[Any],
+        filter_dict: Optional[Dict[str, Any]],
+        k_documents: int,
+        model_name: Optional[str],
+        doc_id: Optional[str],
+        search_mode: Optional[str],
+        keyword_weight: Optional[float]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Produces the shared events for stream_response, ending with an internal "result" event."""
+        try:
+            prepared = await self._prepare_generation(
+                query, history_messages, filter_dict, k_documents, model_name, doc_id, search_mode, keyword_weight
+            )
         except Exception as e:
-            logger.error(f"Error in generate_response: {e}", exc_info=True)
+            logger.error(f"Error in stream_response: {e}", exc_info=True)
             raise QueryError(f"Failed to generate response: {str(e)}")
 
+        yield {"event": "sources", "data": {"sources": prepared.sources}}
+
+        parts = []
+        if prepared.cached is not None:
+            parts.append(prepared.cached["response"])
+            yield {"event": "token", "data": {"token": prepared.cached["response"]}}
+        elif not prepared.relevant_docs:
+            logger.warning(f"No relevant documents found for query: {query}")
+            parts.append(NO_CONTEXT_RESPONSE)
+            yield {"event": "token", "data": {"token": NO_CONTEXT_RESPONSE}}
+        else:
+            generation_started = time.perf_counter()
+            try:
+                async for token in self.text_generation_service.stream_text(
+                    prompt=prepared.prompt,
+                    model_name=prepared.model
+                ):
+                    if not parts:
+                        prepared.timings["ttft_ms"] = _elapsed_ms(generation_started)
+                    parts.append(token)
+                    yield {"event": "token", "data": {"token": token}}
+            except ModelBusyError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in stream_response: {e}", exc_info=True)
+                raise QueryError(f"Failed to generate response: {str(e)}")
+            prepared.timings["generation_ms"] = _elapsed_ms(generation_started)
+            self._cache_answer(prepared, "".join(parts))
+
+        metrics.observe_query_timings(prepared.timings)
+        logger.info(f"Streamed response using model: {prepared.model}")
+        yield {
+            "event": "result",
+            "data": {
+                "response": "".join(parts),
+                "model": prepared.model,
+                "cached": prepared.cached is not None,
+                "context_usage": prepared.context_usage,
+                "answered": prepared.cached is not None or bool(prepared.relevant_docs),
+                "timings": prepared.timings
+            }
+        }
+
+    def _flight_key(
+        self,
+        query: str,
+        history_messages: List[Any],
+        filter_dict: Optional[Dict[str, Any]],
+        k_documents: int,
+        model_name: Optional[str],
+        doc_id: Optional[str],
+        search_mode: Optional[str],
+        keyword_weight: Optional[float]
+    ) -> str:
+        """
+        Identifies requests that would produce the same answer.
+
+        The conversation enters through its content rather than its ID, so
+        the same question asked in conversations with the same history (most
+        often none yet) is answered once.
+        """
+        request = {
+            "query": normalize_text(query).lower(),
+            "history": history_messages,
+            "filter": filter_dict,
+            "doc_id": doc_id,
+            "k": k_documents,
+            "model": model_name or self.text_generation_service.current_model,
+            "search_mode": search_mode or settings.retrieval.search_mode,
+            "keyword_weight": settings.retrieval.keyword_weight if keyword_weight is None else keyword_weight
+        }
+        return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode()).hexdigest()
+
+    async def _prepare_generation(
+        self,
+        query: str,
+        history_messages: List[Any],
+        filter_dict: Optional[Dict[str, Any]],
+        k_documents: int,
+        model_name: Optional[str],
+        doc_id: Optional[str],
+        search_mode: Optional[str],
+        keyword_weight: Optional[float]
+    ) -> PreparedQuery:
+        """
+        Consults the answer cache, retrieves context and formats the prompt.
+
+        Retrieval runs in the search thread pool, and each stage's latency is
+        recorded in prepared.timings.
+        """
+        # --- Combine filter_dict and doc_id filter ---
+        final_filter = {}
+        if filter_dict:
+            final_filter.update(filter_dict)
+        if doc_id:
+            final_filter["doc_id"] = doc_id
+
+        prepared = PreparedQuery(
+            query=query,
+            model=model_name or self.text_generation_service.current_model,
+            k=k_documents,
+            filter_dict=final_filter if final_filter else None,
+            search_mode=search_mode or settings.retrieval.search_mode,
+            keyword_weight=settings.retrieval.keyword_weight if keyword_weight is None else keyword_weight
+        )
+        if prepared.search_mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {prepared.search_mode}")
+
+        prepared.history_messages = history_messages
+        # Answers depend on the conversation, so only stateless queries are cached
+        prepared.use_cache = self.answer_cache is not None and not prepared.history_messages
+        if prepared.use_cache:
+            prepared.cached = self.answer_cache.get(query, prepared.cache_scope)
+            if prepared.cached is not None:
+                return prepared
+        prepared.relevant_docs = await self._run_retrieval(prepared)
+
+        if not prepared.relevant_docs:
+            return prepared
+
+        if prepared.use_cache:
+            prepared.cached = self.answer_cache.get_similar(
+                query, prepared.cache_scope, prepared.query_embedding, self._chunk_ids(prepared.relevant_docs)
+            )
+            if prepared.cached is not None:
+                return prepared
+
+        # Fit history and context into the model's prompt budget
+        prompt_started = time.perf_counter()
+        built = self.context_builder.build(
+            prepared.model,
+            prepared.relevant_docs,
+            prepared.history_messages,
+            SYSTEM_PROMPT + USER_PROMPT.format(context="", question=query),
+            self._format_passage
+        )
+        prepared.context_usage = built.usage
+
+        # Format the prompt
+        prepared.prompt = self.prompt_template.format_messages(
+            context=self._format_context(built.passages),
+            question=query,
+            chat_history=built.history
+        )
+        prepared.timings["prompt_build_ms"] = _elapsed_ms(prompt_started)
+        return prepared
+
+    def _run_retrieval(self, prepared: PreparedQuery) -> "asyncio.Future[List[Any]]":
+        """Starts _retrieve in the search thread pool."""
+        return asyncio.get_running_loop().run_in_executor(self.search_executor, self._retrieve, prepared)
+
+    def _retrieve(self, prepared: PreparedQuery) -> List[Any]:
+        """Retrieves candidates and re-ranks them down to k."""
+        if not self.rerank_enabled:
+            return self._retrieve_candidates(prepared, prepared.k)
+        candidates = self._retrieve_candidates(prepared, max(settings.rerank.candidates, prepared.k))
+        rerank_started = time.perf_counter()
+        documents = self.reranker.rerank(prepared.query, candidates, prepared.k)
+        prepared.timings["rerank_ms"] = _elapsed_ms(rerank_started)
+        return documents
+
+    def _retrieve_candidates(self, prepared: PreparedQuery, k: int) -> List[Any]:
+        """Runs vector, keyword or hybrid retrieval for a prepared query."""
+        if prepared.search_mode == "keyword":
+            search_started = time.perf_counter()
+            documents = self.vector_store.keyword_search(prepared.query, k=k, filter_dict=prepared.filter_dict)
+            prepared.timings["search_ms"] = _elapsed_ms(search_started)
+            return documents
+
+        # Embed once; the vector store and the semantic answer cache share it
+        embed_started = time.perf_counter()
+        prepared.query_embedding = self.vector_store.embed_query(prepared.query)
+        prepared.timings["embed_ms"] = _elapsed_ms(embed_started)
+        search_started = time.perf_counter()
+        if prepared.search_mode == "vector":
+            documents = self.vector_store.similarity_search(
+                prepared.query,
+                k=k,
+                filter_dict=prepared.filter_dict,
+                embedding=prepared.query_embedding
+            )
+            prepared.timings["search_ms"] = _elapsed_ms(search_started)
+            return documents
+
+        depth = max(k * 3, 20)
+        dense = self.vector_store.similarity_search(
+            prepared.query,
+            k=depth,
+            filter_dict=prepared.filter_dict,
+            embedding=prepared.query_embedding
+        )
+        sparse = self.vector_store.keyword_search(prepared.query, k=depth, filter_dict=prepared.filter_dict)
+        documents = self._reciprocal_rank_fusion(
+            [(dense, 1 - prepared.keyword_weight), (sparse, prepared.keyword_weight)]
+        )[:k]
+        prepared.timings["search_ms"] = _elapsed_ms(search_started)
+        return documents
+
+    def _reciprocal_rank_fusion(self, ranked_lists: List[Tuple[List[Any], float]]) -> List[Any]:
+        """Fuses ranked result lists: score(d) = sum(weight / (rrf_k + rank(d)))."""
+        scores: Dict[str, float] = {}
+        documents: Dict[str, Any] = {}
+        for results, weight in ranked_lists:
+            for rank, (chunk_id, doc) in enumerate(zip(self._chunk_ids(results), results), 1):
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + weight / (settings.retrieval.rrf_k + rank)
+                documents.setdefault(chunk_id, doc)
+        return [documents[chunk_id] for chunk_id in sorted(scores, key=scores.get, reverse=True)]
+
+    def _cache_answer(self, prepared: PreparedQuery, response: str) -> None:
+        if not prepared.use_cache:
+            return
+        self.answer_cache.put(
+            prepared.query,
+            prepared.cache_scope,
+            response,
+            prepared.sources,
+            prepared.query_embedding,
+            self._chunk_ids(prepared.relevant_docs),
+            {doc.metadata.get("doc_id") for doc in prepared.relevant_docs}
+        )
+
+    @staticmethod
+    def _chunk_ids(documents: List[Any]) -> List[str]:
+        return [f"{doc.metadata.get('doc_id')}:{doc.metadata.get('chunk_index')}" for doc in documents]
+
     def _format_context(self, documents: List[Any]) -> str:
         """Formats the retrieved documents into a context string."""
-        context_parts = []
-        for i, doc in enumerate(documents, 1):
-            source = doc.metadata.get("source", "Unknown source")
-            file_name = doc.metadata.get("file_name", "Unknown file")
-            context_parts.append(f"[Document {i} from {file_name}]\n{doc.page_content}")
-        
-        return "\n\n".join(context_parts)
+        return "\n\n".join(self._format_passage(i, doc) for i, doc in enumerate(documents, 1))
 
-    def _extract_sources(self, documents: List[Any]) -> List[str]:
+    @staticmethod
+    def _format_passage(index: int, doc: Any) -> str:
+        file_name = doc.metadata.get("file_name", "Unknown file")
+        return f"[Document {index} from {file_name}]\n{doc.page_content}"
+
+    @staticmethod
+    def _extract_sources(documents: List[Any]) -> List[str]:
         """Extracts source information from documents."""
         sources = []
         for doc in documents:
@@ -122,59 +561,47 @@ class RAGQueryEngine:
                 sources.append(source)
         return sources
 
-    def _load_chat_history(self, chat_history_id: str) -> List[Dict[str, Any]]:
-        """Loads chat history from file."""
+    async def _history_messages(
+        self,
+        chat_history_id: Optional[str],
+        chat_history: Optional[List[Dict[str, Any]]]
+    ) -> Tuple[List[Any], Dict[str, float]]:
+        """Returns the conversation so far for the prompt, plus the time spent loading it."""
+        if not chat_history_id:
+            return chat_history or [], {}
+        history_started = time.perf_counter()
+        messages = await self._load_chat_history(chat_history_id)
+        timings = {"history_ms": _elapsed_ms(history_started)}
+        metrics.observe_query_timings(timings)
+        return messages, timings
+
+    async def _load_chat_history(self, chat_history_id: str) -> List[Any]:
+        """Loads chat history in the format expected by the prompt template."""
         try:
-            history_file = self.chat_histories_dir / f"{chat_history_id}.json"
-            if not history_file.exists():
-                logger.info(f"No chat history found for ID: {chat_history_id}")
-                return []
-            
-            with open(history_file, 'r') as f:
-                history_data = json.load(f)
-            
-            # Convert to format expected by prompt template
-            messages = []
-            for entry in history_data:
-                if entry["role"] == "user":
-                    messages.append(("user", entry["content"]))
-                elif entry["role"] == "assistant":
-                    messages.append(("assistant", entry["content"]))
-            
-            logger.info(f"Loaded chat history for ID: {chat_history_id}, {len(messages)} messages")
+            view = build_history_view(await self.chat_history_store.load(chat_history_id))
+            messages = view.to_prompt_messages()
+            logger.info(f"Loaded chat history for ID: {chat_history_id}, {len(view.messages)} messages"
+                        f"{' plus summary' if view.summary else ''}")
             return messages
         except Exception as e:
             logger.error(f"Error loading chat history: {e}", exc_info=True)
             return []
 
-    def _save_chat_history(
-        self,
-        chat_history_id: str,
-        query: str,
-        response: str,
-        previous_history: List[Dict[str, Any]]
-    ) -> None:
-        """Saves chat history to file."""
+    async def _save_chat_history(self, chat_history_id: str, query: str, response: str) -> None:
+        """Appends a question/answer turn to the chat history and compacts it if it grew too long."""
         try:
-            history_file = self.chat_histories_dir / f"{chat_history_id}.json"
-            
-            # Convert previous history to serializable format
-            history_data = []
-            for entry in previous_history:
-                if isinstance(entry, tuple) and len(entry) == 2:
-                    role, content = entry
-                    history_data.append({"role": role, "content": content})
-                elif isinstance(entry, dict) and "role" in entry and "content" in entry:
-                    history_data.append(entry)
-            
-            # Add new messages
-            history_data.append({"role": "user", "content": query})
-            history_data.append({"role": "assistant", "content": response})
-            
-            # Save to file
-            with open(history_file, 'w') as f:
-                json.dump(history_data, f, indent=2)
-            
-            logger.info(f"Saved chat history for ID: {chat_history_id}")
+            await self.chat_history_store.append(chat_history_id, [
+                {"role": "user", "content": query},
+                {"role": "assistant", "content": response}
+            ])
+            if self.history_compactor is not None:
+                self.history_compactor.maybe_compact(
+                    chat_history_id,
+                    await self.chat_history_store.load(chat_history_id)
+                )
         except Exception as e:
-            logger.error(f"Error saving chat history: {e}", exc_info=True)
\ No newline at end of file
+            logger.error(f"Error saving chat history: {e}", exc_info=True)
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
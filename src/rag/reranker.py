@@ -0,0 +1,146 @@
+# src/rag/reranker.py
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+from langchain_core.documents import Document
+
+from .embedding_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+class Reranker:
+    """Base class for re-ranking stages; the default keeps the retrieval order."""
+
+    def rerank(self, query: str, documents: List[Document], top_n: int) -> List[Document]:
+        return documents[:top_n]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class CrossEncoderReranker(Reranker):
+    """
+    Re-ranks retrieved candidates with a local cross-encoder.
+
+    Candidates are scored in batches on the CPU, each sized from the observed
+    time per pair so it fits in what is left of the latency budget. When not
+    even one more pair fits, the stage gives up and keeps the retrieval order,
+    so a slow box degrades to plain vector ranking rather than slower answers.
+    Scores of (query, chunk) pairs are kept in an LRU cache.
+    """
+
+    # Pairs scored to measure the model before the first estimate exists
+    PROBE_PAIRS = 2
+    # Weight of the latest batch in the running time-per-pair estimate
+    PAIR_MS_SMOOTHING = 0.3
+
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int = 16,
+        budget_ms: float = 300,
+        cache_size: int = 50_000
+    ):
+        self.model_name = model_name
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self.cache_size = cache_size
+        self._scores: "OrderedDict[tuple, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.fallbacks = 0
+        self.cache_hits = 0
+        self.pairs_scored = 0
+        self._total_ms = 0.0
+        self._pair_ms: Optional[float] = None
+        logger.info(f"Initialized CrossEncoderReranker with model={model_name}, budget_ms={budget_ms}")
+
+    def rerank(self, query: str, documents: List[Document], top_n: int) -> List[Document]:
+        if len(documents) <= 1:
+            return documents[:top_n]
+
+        started = time.perf_counter()
+        query_key = hashlib.sha256(normalize_text(query).encode()).hexdigest()
+        keys = [(query_key, self._chunk_key(doc)) for doc in documents]
+        scores: List[Optional[float]] = []
+        with self._lock:
+            for key in keys:
+                score = self._scores.get(key)
+                if score is not None:
+                    self._scores.move_to_end(key)
+                    self.cache_hits += 1
+                scores.append(score)
+
+        missing = [i for i, score in enumerate(scores) if score is None]
+        position = 0
+        while position < len(missing):
+            # Size each batch from the observed cost per pair so that no batch
+            # runs past the budget; without an estimate yet, probe with a few pairs
+            remaining_ms = self.budget_ms - (time.perf_counter() - started) * 1000
+            pair_ms = self._pair_ms
+            if pair_ms is None:
+                size = min(self.batch_size, self.PROBE_PAIRS)
+            else:
+                size = min(self.batch_size, int(remaining_ms / pair_ms))
+            if remaining_ms <= 0 or size < 1:
+                elapsed = (time.perf_counter() - started) * 1000
+                logger.warning(f"Re-ranking would exceed budget ({elapsed:.0f}ms spent, "
+                               f"{len(missing) - position} pairs left, {self.budget_ms}ms budget), "
+                               f"keeping retrieval order")
+                self._record(elapsed, fallback=True)
+                return documents[:top_n]
+            batch = missing[position:position + size]
+            position += len(batch)
+            batch_started = time.perf_counter()
+            batch_scores = self.model.predict(
+                [(query, documents[i].page_content) for i in batch],
+                batch_size=len(batch),
+                show_progress_bar=False
+            )
+            observed_ms = (time.perf_counter() - batch_started) * 1000 / len(batch)
+            with self._lock:
+                if self._pair_ms is None:
+                    self._pair_ms = observed_ms
+                else:
+                    self._pair_ms += self.PAIR_MS_SMOOTHING * (observed_ms - self._pair_ms)
+                for i, score in zip(batch, batch_scores):
+                    scores[i] = float(score)
+                    self._scores[keys[i]] = float(score)
+                while len(self._scores) > self.cache_size:
+                    self._scores.popitem(last=False)
+            self.pairs_scored += len(batch)
+
+        order = sorted(range(len(documents)), key=lambda i: scores[i], reverse=True)
+        self._record((time.perf_counter() - started) * 1000, fallback=False)
+        return [documents[i] for i in order[:top_n]]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "calls": self.calls,
+            "fallbacks": self.fallbacks,
+            "pairs_scored": self.pairs_scored,
+            "score_cache_hits": self.cache_hits,
+            "avg_ms": round(self._total_ms / self.calls, 2) if self.calls else 0.0,
+            "pair_ms": round(self._pair_ms, 3) if self._pair_ms is not None else None
+        }
+
+    def _record(self, elapsed_ms: float, fallback: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            self._total_ms += elapsed_ms
+            if fallback:
+                self.fallbacks += 1
+
+    @staticmethod
+    def _chunk_key(doc: Document) -> str:
+        chunk_hash = doc.metadata.get("chunk_hash")
+        if chunk_hash:
+            return chunk_hash
+        return hashlib.sha256(doc.page_content.encode()).hexdigest()
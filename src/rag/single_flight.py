@@ -0,0 +1,113 @@
+# src/rag/single_flight.py
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent work.
+
+    do() runs one call per key at a time; callers that arrive while it is in
+    flight await the same result (or exception). stream() does the same for
+    async iterators: one producer runs per key and every subscriber receives
+    all of its items, including the ones produced before it joined. A shared
+    stream is cancelled once its last subscriber goes away. Keys are released
+    when the work finishes, so later callers start fresh.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+        self._streams: Dict[str, "_SharedStream"] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = self._calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._release(self._calls, key, done))
+            self.leaders += 1
+        else:
+            self.followers += 1
+            logger.info("Coalesced request with an identical in-flight request")
+        # A cancelled caller must not cancel the work the others are waiting on
+        return await asyncio.shield(task)
+
+    def stream(self, key: str, factory: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        shared = self._streams.get(key)
+        if shared is None:
+            shared = self._streams[key] = _SharedStream(factory(), lambda: self._release(self._streams, key, shared))
+            self.leaders += 1
+        else:
+            self.followers += 1
+            logger.info("Coalesced streaming request with an identical in-flight stream")
+        return shared.subscribe()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._calls) + len(self._streams),
+            "leaders": self.leaders,
+            "followers": self.followers
+        }
+
+    @staticmethod
+    def _release(registry: Dict[str, Any], key: str, value: Any) -> None:
+        if registry.get(key) is value:
+            del registry[key]
+        if isinstance(value, asyncio.Future) and not value.cancelled():
+            # Marks the exception as retrieved even if every caller went away
+            value.exception()
+
+
+class _SharedStream:
+    """Fans the items of one async iterator out to any number of subscribers."""
+
+    def __init__(self, source: AsyncIterator[Any], on_done: Callable[[], None]):
+        self._source = source
+        self._on_done = on_done
+        self._items: List[Any] = []
+        self._done = False
+        self._error: Optional[BaseException] = None
+        self._changed = asyncio.Condition()
+        self._subscribers = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        self._subscribers += 1
+        if self._task is None:
+            self._task = asyncio.create_task(self._pump())
+        try:
+            position = 0
+            while True:
+                async with self._changed:
+                    await self._changed.wait_for(lambda: position < len(self._items) or self._done)
+                while position < len(self._items):
+                    item = self._items[position]
+                    position += 1
+                    yield item
+                if self._done:
+                    if self._error is not None:
+                        raise self._error
+                    return
+        finally:
+            self._subscribers -= 1
+            if self._subscribers == 0 and not self._done:
+                self._task.cancel()
+
+    async def _pump(self) -> None:
+        try:
+            async for item in self._source:
+                self._items.append(item)
+                async with self._changed:
+                    self._changed.notify_all()
+        except asyncio.CancelledError:
+            self._error = asyncio.CancelledError()
+        except Exception as e:
+            self._error = e
+        finally:
+            self._done = True
+            self._on_done()
+            async with self._changed:
+                self._changed.notify_all()
@@ -1,17 +1,22 @@
 # src/rag/vector_store.py
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable, Iterable, Tuple
 import logging
 from pathlib import Path
 import shutil
 import os
 import time
+import hashlib
+import uuid
 
 from langchain_core.documents import Document
-from langchain_community.embeddings import SentenceTransformerEmbeddings  # Changed back to SentenceTransformerEmbeddings
-from langchain_chroma import Chroma
 from dotenv import load_dotenv
 from src.core.config import settings
-from src.core.exceptions import VectorStoreError
+from src.core.exceptions import VectorStoreError, DocumentNotFoundError
+from src.core import metrics
+from .embedding_cache import EmbeddingCache, CachedEmbeddings
+from .embedding_engine import EmbeddingEngine
+from .keyword_index import KeywordIndex
+from .document_registry import DocumentRegistry
 
 # Load environment variables
 load_dotenv()
@@ -26,7 +31,8 @@ class VectorStoreManager:
         self,
         persist_directory: str,
         collection_name: str = "rag_documents",
-        distance_metric: str = "cosine"
+        distance_metric: str = "cosine",
+        embedding_cache_path: Optional[str] = None
     ):
         """
         Initialize the vector store manager.
@@ -35,10 +41,15 @@ class VectorStoreManager:
             persist_directory: Directory to persist vector store.
             collection_name: Name of the Chroma collection.
             distance_metric: Metric for similarity search.
+            embedding_cache_path: SQLite file for the embedding cache; defaults to the configured path.
         """
         self.persist_directory = Path(persist_directory)
         self.collection_name = collection_name
         self.distance_metric = distance_metric
+        self.embedding_cache_path = embedding_cache_path or settings.embedding_cache.path
+        self.embedding_cache: Optional[EmbeddingCache] = None
+        self.embedding_engine: Optional[EmbeddingEngine] = None
+        self._change_listeners: List[Callable[[Optional[Iterable[str]]], None]] = []
         self._initialize_embeddings()
         self._initialize_vector_store()
         logger.info(f"Initialized VectorStoreManager with persist_directory={persist_directory}, collection_name={collection_name}")
@@ -46,10 +57,24 @@ class VectorStoreManager:
     def _initialize_embeddings(self):
         """Initialize embedding function with Sentence Transformers."""
         try:
-            self.embedding_function = SentenceTransformerEmbeddings(
+            self.embedding_engine = EmbeddingEngine(
                 model_name=settings.ollama.default_embedding_model,
-                model_kwargs={"trust_remote_code": True}  # ADD THIS
+                batch_size=settings.embedding.batch_size,
+                num_threads=settings.embedding.num_threads,
+                dtype=settings.embedding.dtype
             )
+            self.embedding_function = self.embedding_engine
+            if settings.embedding_cache.enabled:
+                # The cache lives outside persist_directory so it survives clear_collection
+                self.embedding_cache = EmbeddingCache(
+                    self.embedding_cache_path,
+                    max_entries=settings.embedding_cache.max_entries
+                )
+                self.embedding_function = CachedEmbeddings(
+                    self.embedding_function,
+                    self.embedding_cache,
+                    settings.ollama.default_embedding_model
+                )
             logger.info(f"Initialized embedding model: {settings.ollama.default_embedding_model}")
         except Exception as e:
             logger.error(f"Failed to initialize embedding model: {e}", exc_info=True)
@@ -57,6 +82,8 @@ class VectorStoreManager:
 
     def _initialize_vector_store(self):
         """Initialize or load existing vector store."""
+        # Imported here because chromadb is slow to import
+        from langchain_chroma import Chroma
         try:
             if self.persist_directory.exists():
                 self.vector_store = Chroma(
@@ -73,78 +100,374 @@ class VectorStoreManager:
                     collection_name=self.collection_name
                 )
                 logger.info(f"Created new vector store at {self.persist_directory}")
+            self._initialize_keyword_index()
+            self._initialize_document_registry()
         except Exception as e:
             logger.error(f"Error initializing vector store: {e}", exc_info=True)
             raise VectorStoreError(f"Failed to initialize vector store: {str(e)}")
 
-    def add_documents(self, documents: List[Document], batch_size: int = 100) -> None:
-        """Adds documents to the vector store, handling metadata."""
-        logger.info(f"Entering add_documents: {len(documents)} documents") # ADD THIS
+    def _initialize_keyword_index(self):
+        """Loads the BM25 index kept next to the Chroma data, building it if missing."""
+        self.keyword_index = KeywordIndex(str(self.persist_directory / "keyword_index"))
+        collection = self.vector_store._collection
+        count = collection.count()
+        if not count:
+            return
+        if not len(self.keyword_index):
+            logger.info(f"Building keyword index for {count} existing chunks")
+            for offset in range(0, count, 1000):
+                batch = collection.get(include=["documents", "metadatas"], limit=1000, offset=offset)
+                self.keyword_index.add(batch["ids"], batch["documents"], batch["metadatas"])
+        elif not self.keyword_index.fields_complete:
+            logger.info(f"Adding filter fields to the keyword index for {count} existing chunks")
+            for offset in range(0, count, 1000):
+                batch = collection.get(include=["metadatas"], limit=1000, offset=offset)
+                self.keyword_index.tag(batch["ids"], batch["metadatas"])
+            self.keyword_index.fields_complete = True
+        else:
+            return
+        self.keyword_index.save()
+
+    def _initialize_document_registry(self):
+        """Opens the per-document registry, backfilling it from chunk metadata if missing."""
+        self.document_registry = DocumentRegistry(str(self.persist_directory / "documents.sqlite3"))
+        collection = self.vector_store._collection
+        count = collection.count()
+        if len(self.document_registry) or not count:
+            return
+        logger.info(f"Building document registry from {count} existing chunks")
+        chunk_counts: Dict[str, int] = {}
+        first_metadata: Dict[str, Dict[str, Any]] = {}
+        for offset in range(0, count, 1000):
+            batch = collection.get(include=["metadatas"], limit=1000, offset=offset)
+            for metadata in batch["metadatas"]:
+                doc_id = (metadata or {}).get("doc_id")
+                if not doc_id:
+                    continue
+                chunk_counts[doc_id] = chunk_counts.get(doc_id, 0) + 1
+                first_metadata.setdefault(doc_id, metadata)
+        self.document_registry.add_chunks(chunk_counts, first_metadata)
+
+    def add_documents(
+        self,
+        documents: List[Document],
+        batch_size: int = 100,
+        ids: Optional[List[str]] = None,
+        register: bool = True
+    ) -> None:
+        """
+        Adds documents to the vector store, handling metadata.
+
+        All texts are embedded up front in one call so the embedding engine can
+        bucket them by length across the whole set; the precomputed vectors
+        are then written to the collection in batches of batch_size. Unless
+        register is False, the chunks are counted towards their documents in
+        the registry once they are stored.
+        """
         if not documents:
             logger.warning("No documents provided to add_documents")
             return
 
         try:
-            filtered_documents = []
-            for doc in documents:
-                filtered_metadata = {}
-                for key, value in doc.metadata.items():
-                    if isinstance(value, (str, int, float, bool)):
-                        filtered_metadata[key] = value
-                    elif value is None:
-                        filtered_metadata[key] = value
-                    else:
-                        try:
-                            filtered_metadata[key] = str(value)
-                        except Exception:
-                            logger.warning(f"Skipping complex metadata field: {key}")
-
-                filtered_doc = Document(
-                    page_content=doc.page_content,
-                    metadata=filtered_metadata
-                )
-                filtered_documents.append(filtered_doc)
+            texts = [doc.page_content for doc in documents]
+            metadatas = [self._filter_metadata(doc.metadata) for doc in documents]
+            ids = ids or [str(uuid.uuid4()) for _ in documents]
+
+            started = time.perf_counter()
+            embeddings = self.embedding_function.embed_documents(texts)
+            elapsed = time.perf_counter() - started
+            logger.info(f"Embedded {len(texts)} documents in {elapsed:.2f}s "
+                        f"({len(texts) / elapsed if elapsed else 0:.1f} chunks/s)")
 
-            total_batches = (len(filtered_documents) + batch_size - 1) // batch_size
-            logger.info(f"Adding {len(filtered_documents)} documents in {total_batches} batches")
+            collection = self.vector_store._collection
+            total_batches = (len(documents) + batch_size - 1) // batch_size
+            logger.info(f"Adding {len(documents)} documents in {total_batches} batches")
 
-            for i in range(0, len(filtered_documents), batch_size):
-                batch = filtered_documents[i:i + batch_size]
-                logger.info(f"About to call self.vector_store.add_documents for batch {i // batch_size + 1}") # ADD THIS
-                self.vector_store.add_documents(batch)
-                logger.info(f"self.vector_store.add_documents returned for batch {i // batch_size + 1}") # ADD THIS
-                logger.info(f"Added batch of {len(batch)} documents to vector store")
+            for i in range(0, len(documents), batch_size):
+                collection.add(
+                    ids=ids[i:i + batch_size],
+                    embeddings=embeddings[i:i + batch_size],
+                    documents=texts[i:i + batch_size],
+                    metadatas=metadatas[i:i + batch_size]
+                )
+                logger.info(f"Added batch of {len(ids[i:i + batch_size])} documents to vector store")
 
+            self.keyword_index.add(ids, texts, metadatas)
+            if register:
+                self._register_chunks(metadatas)
+            metrics.VECTOR_STORE_ADD_LATENCY.observe(time.perf_counter() - started)
             logger.info(f"Successfully added {len(documents)} documents to vector store")
 
         except Exception as e:
             logger.error(f"Error adding documents to vector store: {e}", exc_info=True)
             raise VectorStoreError(f"Failed to add documents to vector store: {str(e)}")
 
+    def write_document_batch(
+        self,
+        ids: List[str],
+        documents: List[Document],
+        embeddings: Optional[List[List[float]]] = None
+    ) -> Dict[str, List]:
+        """
+        Writes one batch of a document that is being streamed in.
+
+        Only chunks whose ID is not stored yet are embedded (unless embeddings
+        are given) and added. A stored ID belongs to an unchanged chunk of an
+        earlier revision of the same source; it is left as it is, so that
+        revision stays whole until finish_document takes the chunk over.
+        Returns the IDs added, which are what delete_chunks has to remove if
+        the document fails, and the (ID, metadata) pairs to hand to
+        finish_document.
+        """
+        try:
+            collection = self.vector_store._collection
+            existing = set(collection.get(ids=ids, include=[])["ids"])
+            new_positions = [i for i, chunk_id in enumerate(ids) if chunk_id not in existing]
+            kept = [(chunk_id, self._filter_metadata(doc.metadata)) for chunk_id, doc in zip(ids, documents) if chunk_id in existing]
+            added = [ids[i] for i in new_positions]
+            if new_positions:
+                texts = [documents[i].page_content for i in new_positions]
+                if embeddings is None:
+                    started = time.perf_counter()
+                    new_embeddings = self.embedding_function.embed_documents(texts)
+                    metrics.VECTOR_STORE_ADD_LATENCY.observe(time.perf_counter() - started)
+                else:
+                    new_embeddings = [embeddings[i] for i in new_positions]
+                metadatas = [self._filter_metadata(documents[i].metadata) for i in new_positions]
+                collection.add(
+                    ids=added,
+                    embeddings=new_embeddings,
+                    documents=texts,
+                    metadatas=metadatas
+                )
+                self.keyword_index.add(added, texts, metadatas)
+            return {"added": added, "kept": kept}
+        except Exception as e:
+            logger.error(f"Error writing {len(ids)} chunks to vector store: {e}", exc_info=True)
+            raise VectorStoreError(f"Failed to write chunks to vector store: {str(e)}")
+
+    def delete_chunks(self, ids: List[str]) -> None:
+        """Removes chunks by ID, e.g. the ones a failed streamed document had added."""
+        try:
+            collection = self.vector_store._collection
+            for i in range(0, len(ids), 1000):
+                collection.delete(ids=ids[i:i + 1000])
+            self.keyword_index.delete(ids)
+        except Exception as e:
+            logger.error(f"Error deleting {len(ids)} chunks: {e}", exc_info=True)
+            raise VectorStoreError(f"Failed to delete chunks: {str(e)}")
+
+    def finish_document(
+        self,
+        doc_id: str,
+        metadata: Dict[str, Any],
+        chunk_count: int,
+        kept: Optional[List[Tuple[str, Dict[str, Any]]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Registers a document written with write_document_batch.
+
+        The kept chunks are taken over by doc_id first; whatever else is
+        left of earlier revisions of the same source is then deleted. Returns
+        the superseded doc_ids and how many of their chunks were deleted.
+        """
+        try:
+            collection = self.vector_store._collection
+            kept = kept or []
+            for i in range(0, len(kept), 1000):
+                part = kept[i:i + 1000]
+                ids = [chunk_id for chunk_id, _ in part]
+                metadatas = [m for _, m in part]
+                collection.update(ids=ids, metadatas=metadatas)
+                self.keyword_index.tag(ids, metadatas)
+            superseded = [
+                d for d in self.document_registry.doc_ids_for_source(metadata.get("source", ""))
+                if d != doc_id
+            ]
+            deleted = 0
+            for old_doc_id in superseded:
+                try:
+                    deleted += self.delete_document(old_doc_id)["deleted"]
+                except DocumentNotFoundError:
+                    pass
+            self.document_registry.replace(doc_id, self._filter_metadata(metadata), chunk_count)
+            self._notify_change({doc_id})
+            return {"superseded": superseded, "deleted": deleted}
+        except VectorStoreError:
+            raise
+        except Exception as e:
+            logger.error(f"Error finishing document {doc_id}: {e}", exc_info=True)
+            raise VectorStoreError(f"Failed to finish document {doc_id}: {str(e)}")
+
+    def _register_chunks(self, metadatas: List[Dict[str, Any]]) -> None:
+        chunk_counts: Dict[str, int] = {}
+        first_metadata: Dict[str, Dict[str, Any]] = {}
+        for metadata in metadatas:
+            doc_id = metadata.get("doc_id")
+            if doc_id:
+                chunk_counts[doc_id] = chunk_counts.get(doc_id, 0) + 1
+                first_metadata.setdefault(doc_id, metadata)
+        if chunk_counts:
+            self.document_registry.add_chunks(chunk_counts, first_metadata)
+
+    def delete_document(self, doc_id: str) -> Dict[str, Any]:
+        """
+        Deletes all chunks of one document.
+
+        Only the document's own chunk IDs are looked up (by the doc_id
+        metadata filter) and removed from the collection and keyword index,
+        so the cost grows with the document, not the collection. Returns the
+        document's source and the number of chunks deleted.
+        """
+        try:
+            collection = self.vector_store._collection
+            chunk_ids = collection.get(where={"doc_id": doc_id}, include=[])["ids"]
+            record = self.document_registry.get(doc_id)
+            if not chunk_ids and record is None:
+                raise DocumentNotFoundError(f"Document {doc_id} not found")
+            for i in range(0, len(chunk_ids), 1000):
+                collection.delete(ids=chunk_ids[i:i + 1000])
+            self.keyword_index.delete(chunk_ids)
+            self.document_registry.remove([doc_id])
+            self._notify_change({doc_id})
+            logger.info(f"Deleted document {doc_id} ({len(chunk_ids)} chunks)")
+            return {"doc_id": doc_id, "source": record["source"] if record else None, "deleted": len(chunk_ids)}
+        except VectorStoreError:
+            raise
+        except Exception as e:
+            logger.error(f"Error deleting document {doc_id}: {e}", exc_info=True)
+            raise VectorStoreError(f"Failed to delete document {doc_id}: {str(e)}")
+
+    def add_change_listener(self, listener: Callable[[Optional[Iterable[str]]], None]) -> None:
+        """Registers a callback invoked with the affected doc_ids (None for all) after writes."""
+        self._change_listeners.append(listener)
+
+    def _notify_change(self, doc_ids: Optional[Iterable[str]]) -> None:
+        for listener in self._change_listeners:
+            try:
+                listener(doc_ids)
+            except Exception as e:
+                logger.error(f"Vector store change listener failed: {e}", exc_info=True)
+
+    def has_document(self, doc_id: str) -> bool:
+        """Checks whether any chunk of the given document is stored."""
+        try:
+            result = self.vector_store._collection.get(where={"doc_id": doc_id}, limit=1, include=[])
+            return bool(result["ids"])
+        except Exception as e:
+            logger.error(f"Error looking up document {doc_id}: {e}", exc_info=True)
+            raise VectorStoreError(f"Failed to look up document {doc_id}: {str(e)}")
+
+    @staticmethod
+    def _chunk_ids(documents: List[Document], occurrences: Optional[Dict[str, int]] = None) -> List[str]:
+        """
+        Derives stable chunk IDs from source, chunk hash and occurrence.
+
+        Pass the same occurrences dict for every batch when a document's
+        chunks arrive in several batches.
+        """
+        occurrences = {} if occurrences is None else occurrences
+        ids = []
+        for doc in documents:
+            chunk_hash = doc.metadata.get("chunk_hash") or hashlib.sha256(doc.page_content.encode()).hexdigest()
+            key = f"{doc.metadata.get('source', '')}\0{chunk_hash}"
+            occurrence = occurrences.get(key, 0)
+            occurrences[key] = occurrence + 1
+            ids.append(hashlib.sha256(f"{key}\0{occurrence}".encode()).hexdigest())
+        return ids
+
+    @staticmethod
+    def _filter_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Reduces metadata to the scalar types Chroma can store."""
+        filtered_metadata = {}
+        for key, value in metadata.items():
+            if isinstance(value, (str, int, float, bool)):
+                filtered_metadata[key] = value
+            elif value is None:
+                filtered_metadata[key] = value
+            else:
+                try:
+                    filtered_metadata[key] = str(value)
+                except Exception:
+                    logger.warning(f"Skipping complex metadata field: {key}")
+        return filtered_metadata
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embeds a query with the store's embedding function."""
+        try:
+            return self.embedding_function.embed_query(query)
+        except Exception as e:
+            logger.error(f"Error embedding query: {e}", exc_info=True)
+            raise VectorStoreError(f"Failed to embed query: {str(e)}")
+
     def similarity_search(
         self,
         query: str,
         k: int = 4,
-        filter_dict: Optional[Dict[str, Any]] = None
+        filter_dict: Optional[Dict[str, Any]] = None,
+        embedding: Optional[List[float]] = None
     ) -> List[Document]:
-        """Performs similarity search."""
+        """Performs similarity search, reusing a precomputed query embedding if given."""
         try:
             # Only use $and if there are multiple conditions
             where = filter_dict
             logger.info(f"Performing similarity search for query: '{query[:50]}...' with k={k}, filter={where}")
-            
-            documents = self.vector_store.similarity_search(
-                query,
-                k=k,
-                filter=where
-            )
-            
+            started = time.perf_counter()
+            if embedding is not None:
+                documents = self.vector_store.similarity_search_by_vector(
+                    embedding,
+                    k=k,
+                    filter=where
+                )
+            else:
+                documents = self.vector_store.similarity_search(
+                    query,
+                    k=k,
+                    filter=where
+                )
+            metrics.observe_search("vector", k, bool(where), started)
             logger.info(f"Found {len(documents)} documents for query")
             return documents
         except Exception as e:
             logger.error(f"Error performing similarity search: {e}", exc_info=True)
             raise VectorStoreError(f"Failed to perform similarity search: {str(e)}")
 
+    def keyword_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter_dict: Optional[Dict[str, Any]] = None
+    ) -> List[Document]:
+        """Performs BM25 keyword search, applying metadata filters to the candidates."""
+        try:
+            started = time.perf_counter()
+            # Rank only chunks that pass the filter so a narrow filter can't empty the top k;
+            # doc_id and source filters are applied by the index itself
+            if not filter_dict or self.keyword_index.supports_filter(filter_dict):
+                candidates = self.keyword_index.search(query, k, where=filter_dict)
+            else:
+                allowed = self.vector_store._collection.get(where=filter_dict, include=[])["ids"]
+                candidates = self.keyword_index.search(query, k, chunk_ids=allowed)
+            if not candidates:
+                metrics.observe_search("keyword", k, bool(filter_dict), started)
+                return []
+            ids = [chunk_id for chunk_id, _ in candidates]
+            results = self.vector_store._collection.get(
+                ids=ids,
+                include=["documents", "metadatas"]
+            )
+            found = {
+                chunk_id: Document(page_content=text, metadata=metadata or {})
+                for chunk_id, text, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+            }
+            documents = [found[chunk_id] for chunk_id in ids if chunk_id in found][:k]
+            metrics.observe_search("keyword", k, bool(filter_dict), started)
+            logger.info(f"Found {len(documents)} documents for keyword query: '{query[:50]}...'")
+            return documents
+        except Exception as e:
+            logger.error(f"Error performing keyword search: {e}", exc_info=True)
+            raise VectorStoreError(f"Failed to perform keyword search: {str(e)}")
+
     def get_collection_stats(self) -> Dict[str, Any]:
         """Gets statistics about the vector store collection."""
         try:
@@ -154,7 +477,11 @@ class VectorStoreManager:
                 "total_documents": count,  # This is actually total *chunks*
                 "persist_directory": str(self.persist_directory),
                 "collection_name": self.collection_name,
-                "embedding_model": settings.ollama.default_embedding_model
+                "embedding_model": settings.ollama.default_embedding_model,
+                "embedding_cache": self.embedding_cache.get_stats() if self.embedding_cache else None,
+                "embedding_engine": self.embedding_engine.get_stats() if self.embedding_engine else None,
+                "keyword_index_chunks": len(self.keyword_index),
+                "documents": self.document_registry.totals()
             }
             logger.info(f"Retrieved collection stats: {count} total documents")
             return stats
@@ -166,48 +493,32 @@ class VectorStoreManager:
         """Clears all documents from the vector store."""
         try:
             logger.warning("Clearing vector store collection")
+            self.document_registry.close()
             if self.persist_directory.exists():
                 shutil.rmtree(self.persist_directory)
             self._initialize_vector_store()
+            self._notify_change(None)
             logger.info("Successfully cleared vector store collection")
         except Exception as e:
             logger.error(f"Error clearing vector store: {e}", exc_info=True)
             raise VectorStoreError(f"Failed to clear vector store: {str(e)}")
 
-    def list_documents(self) -> List[Dict[str, Any]]:
-        """Gets a list of all documents in the vector store with metadata."""
+    def list_documents(
+        self,
+        offset: int = 0,
+        limit: int = 100,
+        sort_by: str = "processed_at",
+        descending: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Gets one page of stored documents from the document registry."""
         try:
-            collection = self.vector_store._collection
-            documents = collection.get()
-
-            if not documents or not documents.get('documents'):
-                logger.info("No documents found in vector store")
-                return []
-
-            doc_groups = {}
-            for i, doc in enumerate(documents['documents']):
-                metadata = documents['metadatas'][i]
-                doc_id = metadata.get('doc_id', f"unknown_{i}")  # Use doc_id
-                source = metadata.get('source', 'Unknown source')
-
-                if doc_id not in doc_groups:
-                    doc_groups[doc_id] = {
-                        'source': source,
-                        'file_type': metadata.get('file_type', ''),
-                        'file_name': metadata.get('file_name', ''),
-                        'chunk_count': 1,
-                        'added_at': metadata.get('processed_at', ''),  # Use processed_at
-                        'doc_id': doc_id  # Include doc_id in the output
-                    }
-                else:
-                    doc_groups[doc_id]['chunk_count'] += 1
-
-            doc_list = list(doc_groups.values())
-            doc_list.sort(key=lambda x: x['source'])  # Sort by source
-
-            logger.info(f"Listed {len(doc_list)} documents from vector store")
-            return doc_list
-
+            documents = self.document_registry.list_documents(offset, limit, sort_by, descending)
+            for doc in documents:
+                doc["added_at"] = doc.pop("processed_at")
+            logger.info(f"Listed {len(documents)} documents from the document registry")
+            return documents
+        except ValueError:
+            raise
         except Exception as e:
             logger.error(f"Error listing documents: {e}", exc_info=True)
-            raise VectorStoreError(f"Failed to list documents: {str(e)}")
\ No newline at end of file
+            raise VectorStoreError(f"Failed to list documents: {str(e)}")
@@ -0,0 +1,89 @@
+# tests/test_answer_cache.py
+from src.rag.answer_cache import AnswerCache
+
+SCOPE = {"model": "llama2", "filters": None, "k": 4}
+
+
+def _put(cache, query="What is Metis?", embedding=(1.0, 0.0), chunk_ids=("c1", "c2"), doc_ids=("d1",), response="answer"):
+    cache.put(query, SCOPE, response, ["a.txt"], list(embedding), list(chunk_ids), doc_ids)
+
+
+def test_exact_hit_ignores_case_and_whitespace():
+    cache = AnswerCache()
+    _put(cache)
+
+    assert cache.get("  what is   METIS? ", SCOPE) == {"response": "answer", "sources": ["a.txt"]}
+    assert cache.exact_hits == 1
+
+
+def test_exact_miss_for_different_scope():
+    cache = AnswerCache()
+    _put(cache)
+
+    assert cache.get("What is Metis?", {**SCOPE, "model": "mistral"}) is None
+
+
+def test_semantic_hit_needs_same_chunks_and_similar_embedding():
+    cache = AnswerCache(semantic_threshold=0.95)
+    _put(cache)
+
+    assert cache.get_similar("Tell me about Metis", SCOPE, [0.99, 0.05], ["c1", "c2"])["response"] == "answer"
+    assert cache.get_similar("Tell me about Metis", SCOPE, [0.99, 0.05], ["c1", "c3"]) is None
+    assert cache.get_similar("Something else", SCOPE, [0.0, 1.0], ["c1", "c2"]) is None
+    assert (cache.semantic_hits, cache.misses) == (1, 2)
+
+
+def test_semantic_tier_disabled_without_threshold():
+    cache = AnswerCache(semantic_threshold=None)
+    _put(cache)
+
+    assert cache.get_similar("Tell me about Metis", SCOPE, [1.0, 0.0], ["c1", "c2"]) is None
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("src.rag.answer_cache.time.monotonic", lambda: now[0])
+    cache = AnswerCache(ttl_seconds=60)
+    _put(cache)
+
+    now[0] += 61
+    assert cache.get("What is Metis?", SCOPE) is None
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AnswerCache(max_entries=2)
+    _put(cache, query="first")
+    _put(cache, query="second")
+    cache.get("first", SCOPE)
+    _put(cache, query="third")
+
+    assert cache.get("first", SCOPE) is not None
+    assert cache.get("second", SCOPE) is None
+    assert cache.get("third", SCOPE) is not None
+
+
+def test_invalidate_documents_drops_only_affected_entries():
+    cache = AnswerCache()
+    _put(cache, query="from d1", chunk_ids=("c1",), doc_ids=("d1",))
+    _put(cache, query="from d1 and d2", chunk_ids=("c1", "c2"), doc_ids=("d1", "d2"))
+    _put(cache, query="from d3", chunk_ids=("c3",), doc_ids=("d3",))
+
+    cache.invalidate_documents(["d2"])
+
+    assert cache.get("from d1", SCOPE) is not None
+    assert cache.get("from d1 and d2", SCOPE) is None
+    assert cache.get("from d3", SCOPE) is not None
+    # The semantic index forgets invalidated entries too
+    assert cache.get_similar("x", SCOPE, [1.0, 0.0], ["c1", "c2"]) is None
+
+
+def test_invalidate_documents_without_ids_clears_everything():
+    cache = AnswerCache()
+    _put(cache, query="one")
+    _put(cache, query="two", doc_ids=("d2",))
+
+    cache.invalidate_documents()
+
+    assert cache.get_stats()["entries"] == 0
+    assert cache.get_similar("one", SCOPE, [1.0, 0.0], ["c1", "c2"]) is None
@@ -0,0 +1,75 @@
+# tests/test_chat_history.py
+import asyncio
+import json
+
+import pytest
+
+from src.rag.chat_history import ChatHistoryStore
+
+
+@pytest.mark.asyncio
+async def test_concurrent_appends_are_not_interleaved(tmp_path):
+    store = ChatHistoryStore(str(tmp_path))
+
+    async def turn(i):
+        await store.append("conv", [
+            {"role": "user", "content": f"question {i}"},
+            {"role": "assistant", "content": f"answer {i}"}
+        ])
+
+    await asyncio.gather(*(turn(i) for i in range(50)))
+
+    # Read back from disk with a fresh store so the cache can't hide a bad file
+    history = await ChatHistoryStore(str(tmp_path)).load("conv")
+    assert len(history) == 100
+    for question, answer in zip(history[::2], history[1::2]):
+        assert question["role"] == "user" and answer["role"] == "assistant"
+        assert question["content"].split()[1] == answer["content"].split()[1]
+    assert {m["content"] for m in history[::2]} == {f"question {i}" for i in range(50)}
+
+
+@pytest.mark.asyncio
+async def test_locks_are_dropped_when_idle(tmp_path):
+    store = ChatHistoryStore(str(tmp_path), cache_size=2)
+
+    await asyncio.gather(*(
+        store.append(f"conv-{i % 10}", [{"role": "user", "content": str(i)}]) for i in range(40)
+    ))
+    await store.load("conv-3")
+
+    assert store._locks == {}
+    assert store.count() == 10
+
+
+@pytest.mark.asyncio
+async def test_legacy_json_history_is_migrated(tmp_path):
+    legacy = [
+        {"role": "user", "content": "hi", "timestamp": "2024-01-01T00:00:00"},
+        {"role": "assistant", "content": "hello", "timestamp": "2024-01-01T00:00:01"}
+    ]
+    (tmp_path / "old.json").write_text(json.dumps(legacy))
+    store = ChatHistoryStore(str(tmp_path))
+    assert store.count() == 1
+
+    assert await store.load("old") == legacy
+    assert not (tmp_path / "old.json").exists()
+    lines = (tmp_path / "old.jsonl").read_text().splitlines()
+    assert [json.loads(line) for line in lines] == legacy
+
+    await store.append("old", [{"role": "user", "content": "again"}])
+    history = await ChatHistoryStore(str(tmp_path)).load("old")
+    assert [m["content"] for m in history] == ["hi", "hello", "again"]
+    assert store.count() == 1
+
+
+@pytest.mark.asyncio
+async def test_clear_removes_all_conversations(tmp_path):
+    store = ChatHistoryStore(str(tmp_path))
+    await store.append("a", [{"role": "user", "content": "x"}])
+    (tmp_path / "b.json").write_text("[]")
+
+    await store.clear()
+
+    assert store.count() == 0
+    assert list(tmp_path.iterdir()) == []
+    assert await store.load("a") == []
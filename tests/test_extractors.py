@@ -0,0 +1,75 @@
+# tests/test_extractors.py
+import zipfile
+
+import pytest
+
+from src.rag.extractors import DocxXmlExtractor, PythonDocxExtractor, TextExtractor
+
+_W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+
+def _rejoin(blocks, overlap_chars):
+    text = blocks[0]
+    for block in blocks[1:]:
+        overlap = next(n for n in range(min(len(block), overlap_chars), -1, -1) if text.endswith(block[:n]))
+        text += block[overlap:]
+    return text
+
+
+def test_text_is_read_in_overlapping_blocks(tmp_path):
+    text = "".join(f"line {i} of the file.\n" + ("\n" if i % 7 == 0 else "") for i in range(500))
+    path = tmp_path / "big.txt"
+    path.write_text(text)
+
+    blocks = [doc.page_content for doc in TextExtractor(block_chars=1000, overlap_chars=50).lazy_load(path)]
+
+    assert len(blocks) > 5
+    assert all(len(block) <= 1000 for block in blocks)
+    assert all(block.endswith("\n") for block in blocks[:-1])
+    assert all(blocks[i][-10:] in blocks[i + 1][:50] for i in range(len(blocks) - 1))
+    assert _rejoin(blocks, 50) == text
+
+
+def test_empty_text_file_yields_nothing(tmp_path):
+    path = tmp_path / "empty.txt"
+    path.write_text("")
+
+    assert TextExtractor().load(path) == []
+
+
+def test_docx_paragraphs_are_grouped_into_blocks(tmp_path):
+    body = "".join(f"<w:p><w:r><w:t>Paragraph {i}</w:t></w:r></w:p><w:p/>" for i in range(300))
+    path = tmp_path / "a.docx"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("word/document.xml", f"<w:document {_W}><w:body>{body}</w:body></w:document>")
+
+    blocks = [doc.page_content for doc in DocxXmlExtractor(block_chars=500, overlap_chars=20).lazy_load(path)]
+
+    assert len(blocks) > 5
+    assert _rejoin(blocks, 20) == "".join(f"Paragraph {i}\n\n" for i in range(300))
+
+
+def test_docx_tab_stops_are_not_text(tmp_path):
+    paragraph = (
+        '<w:p><w:pPr><w:tabs><w:tab w:val="left" w:pos="720"/></w:tabs></w:pPr>'
+        "<w:r><w:t>name</w:t><w:tab/><w:t>value</w:t></w:r></w:p>"
+    )
+    path = tmp_path / "tabs.docx"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("word/document.xml", f"<w:document {_W}><w:body>{paragraph}</w:body></w:document>")
+
+    assert DocxXmlExtractor().load(path)[0].page_content == "name\tvalue\n\n"
+
+
+def test_python_docx_keeps_tables_in_place(tmp_path):
+    docx = pytest.importorskip("docx")
+    document = docx.Document()
+    document.add_paragraph("before")
+    table = document.add_table(rows=1, cols=2)
+    table.rows[0].cells[0].text = "a"
+    table.rows[0].cells[1].text = "b"
+    document.add_paragraph("after")
+    path = tmp_path / "table.docx"
+    document.save(str(path))
+
+    assert PythonDocxExtractor().load(path)[0].page_content == "before\n\na\tb\n\nafter"
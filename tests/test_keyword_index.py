@@ -0,0 +1,89 @@
+# tests/test_keyword_index.py
+import pickle
+
+from src.rag.keyword_index import KeywordIndex
+
+
+def _add(index, chunk_id, text, doc_id, source="a.txt"):
+    index.add([chunk_id], [text], [{"doc_id": doc_id, "source": source}])
+
+
+def _ids(results):
+    return [chunk_id for chunk_id, _ in results]
+
+
+def test_ranks_by_bm25_across_terms(tmp_path):
+    index = KeywordIndex(str(tmp_path))
+    _add(index, "c1", "error ERR-1042 in the parser", "d1")
+    _add(index, "c2", "parser notes", "d1")
+    _add(index, "c3", "unrelated text", "d2")
+
+    assert _ids(index.search("parser err-1042", 10)) == ["c1", "c2"]
+    assert index.search("missing", 10) == []
+
+
+def test_filters_by_doc_id_and_source(tmp_path):
+    index = KeywordIndex(str(tmp_path))
+    _add(index, "c1", "alpha beta", "d1", "a.txt")
+    _add(index, "c2", "alpha", "d2", "b.txt")
+    _add(index, "c3", "alpha alpha", "d3", "b.txt")
+
+    assert _ids(index.search("alpha", 10, where={"doc_id": "d2"})) == ["c2"]
+    assert set(_ids(index.search("alpha", 10, where={"source": {"$eq": "b.txt"}}))) == {"c2", "c3"}
+    assert set(_ids(index.search("alpha", 10, where={"doc_id": {"$in": ["d1", "d3"]}}))) == {"c1", "c3"}
+    assert _ids(index.search("alpha", 10, where={"$and": [{"source": "b.txt"}, {"doc_id": "d3"}]})) == ["c3"]
+    assert index.search("alpha", 10, where={"doc_id": "nope"}) == []
+    # A narrow filter must not be emptied by better matches elsewhere
+    assert _ids(index.search("alpha", 1, where={"doc_id": "d1"})) == ["c1"]
+
+
+def test_unsupported_filters_are_reported(tmp_path):
+    index = KeywordIndex(str(tmp_path))
+    _add(index, "c1", "alpha", "d1")
+
+    assert index.supports_filter({"doc_id": "d1"})
+    assert not index.supports_filter({"page": 3})
+    assert not index.supports_filter({"doc_id": {"$ne": "d1"}})
+    assert _ids(index.search("alpha", 10, chunk_ids=["c1", "unknown"])) == ["c1"]
+
+
+def test_tag_moves_chunk_to_new_document(tmp_path):
+    index = KeywordIndex(str(tmp_path))
+    _add(index, "c1", "alpha", "old")
+
+    index.tag(["c1"], [{"doc_id": "new", "source": "a.txt"}])
+
+    assert index.search("alpha", 10, where={"doc_id": "old"}) == []
+    assert _ids(index.search("alpha", 10, where={"doc_id": "new"})) == ["c1"]
+
+
+def test_filters_survive_compaction_and_reload(tmp_path):
+    index = KeywordIndex(str(tmp_path))
+    for i in range(8):
+        _add(index, f"c{i}", f"alpha term{i}", f"d{i % 2}")
+    index.tag(["c7"], [{"doc_id": "d0", "source": "a.txt"}])
+    index.delete([f"c{i}" for i in range(4)])  # enough tombstones to compact
+
+    assert len(index.chunk_ids) == 4
+    expected = {"c4", "c6", "c7"}
+    assert set(_ids(index.search("alpha", 10, where={"doc_id": "d0"}))) == expected
+
+    index.save()
+    _add(index, "c8", "alpha", "d0")
+    reloaded = KeywordIndex(str(tmp_path))
+    assert set(_ids(reloaded.search("alpha", 10, where={"doc_id": "d0"}))) == expected | {"c8"}
+
+
+def test_snapshot_without_fields_needs_backfill(tmp_path):
+    index = KeywordIndex(str(tmp_path))
+    _add(index, "c1", "alpha", "d1")
+    index.save()
+    snapshot_path = tmp_path / KeywordIndex.SNAPSHOT_FILE
+    snapshot = pickle.loads(snapshot_path.read_bytes())
+    del snapshot["fields"], snapshot["fields_complete"]
+    snapshot_path.write_bytes(pickle.dumps(snapshot))
+
+    reloaded = KeywordIndex(str(tmp_path))
+    assert not reloaded.fields_complete
+    assert not reloaded.supports_filter({"doc_id": "d1"})
+    assert _ids(reloaded.search("alpha", 10)) == ["c1"]
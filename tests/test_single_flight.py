@@ -0,0 +1,180 @@
+# tests/test_single_flight.py
+import asyncio
+
+import pytest
+
+from src.rag.single_flight import SingleFlight
+
+
+async def _collect(iterator):
+    return [item async for item in iterator]
+
+
+@pytest.mark.asyncio
+async def test_do_runs_once_for_concurrent_callers():
+    flight = SingleFlight()
+    calls = 0
+    release = asyncio.Event()
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "answer"
+
+    callers = [asyncio.create_task(flight.do("key", work)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*callers) == ["answer"] * 3
+    assert calls == 1
+    assert flight.get_stats() == {"in_flight": 0, "leaders": 1, "followers": 2}
+
+
+@pytest.mark.asyncio
+async def test_do_starts_fresh_after_the_flight_lands():
+    flight = SingleFlight()
+    results = iter(["first", "second"])
+
+    async def work():
+        return next(results)
+
+    assert await flight.do("key", work) == "first"
+    assert await flight.do("key", work) == "second"
+
+
+@pytest.mark.asyncio
+async def test_do_error_reaches_every_caller():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def work():
+        await release.wait()
+        raise ValueError("boom")
+
+    callers = [asyncio.create_task(flight.do("key", work)) for _ in range(2)]
+    await asyncio.sleep(0)
+    release.set()
+
+    results = await asyncio.gather(*callers, return_exceptions=True)
+    assert all(isinstance(r, ValueError) and str(r) == "boom" for r in results)
+    assert flight.get_stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_cancel_followers():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def work():
+        await release.wait()
+        return "answer"
+
+    leader = asyncio.create_task(flight.do("key", work))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.do("key", work))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    release.set()
+
+    assert await follower == "answer"
+
+
+@pytest.mark.asyncio
+async def test_late_stream_subscriber_replays_earlier_items():
+    flight = SingleFlight()
+    produced = 0
+    halfway = asyncio.Event()
+    release = asyncio.Event()
+
+    async def source():
+        nonlocal produced
+        for item in range(4):
+            if item == 2:
+                halfway.set()
+                await release.wait()
+            produced += 1
+            yield item
+
+    leader = asyncio.create_task(_collect(flight.stream("key", source)))
+    await halfway.wait()
+    follower = asyncio.create_task(_collect(flight.stream("key", source)))
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await leader == [0, 1, 2, 3]
+    assert await follower == [0, 1, 2, 3]
+    assert produced == 4
+    assert flight.get_stats() == {"in_flight": 0, "leaders": 1, "followers": 1}
+
+
+@pytest.mark.asyncio
+async def test_stream_error_reaches_every_subscriber():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def source():
+        yield "partial"
+        await release.wait()
+        raise ValueError("boom")
+
+    async def consume():
+        items = []
+        with pytest.raises(ValueError, match="boom"):
+            async for item in flight.stream("key", source):
+                items.append(item)
+        return items
+
+    subscribers = [asyncio.create_task(consume()) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    release.set()
+
+    assert await asyncio.gather(*subscribers) == [["partial"], ["partial"]]
+
+
+@pytest.mark.asyncio
+async def test_leaving_subscriber_keeps_stream_alive_for_others():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def source():
+        yield 1
+        await release.wait()
+        yield 2
+
+    first = flight.stream("key", source)
+    assert await first.__anext__() == 1
+    second = asyncio.create_task(_collect(flight.stream("key", source)))
+    await asyncio.sleep(0)
+
+    await first.aclose()
+    release.set()
+
+    assert await second == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_stream_is_cancelled_when_last_subscriber_leaves():
+    flight = SingleFlight()
+    cancelled = asyncio.Event()
+
+    async def source():
+        yield 1
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        yield 2
+
+    subscriber = flight.stream("key", source)
+    assert await subscriber.__anext__() == 1
+    await asyncio.sleep(0)
+    await subscriber.aclose()
+
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    await asyncio.sleep(0)
+    assert flight.get_stats()["in_flight"] == 0